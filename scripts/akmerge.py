@@ -7,7 +7,8 @@ from collections import Counter, OrderedDict
 from datetime import date
 from difflib import SequenceMatcher
 from operator import itemgetter
-from utils import get_data_dir, load_yaml, dump_obj, get_settings, role_is_active
+from utils import (get_data_dir, load_yaml_file, load_lazy_files, dump_obj, get_settings,
+                   role_is_active, FileTransaction)
 from merge import compare_objects, merge_people, ListDifference, ItemDifference
 from retire import retire
 
@@ -26,14 +27,14 @@ class PersonFile(object):
 
     @classmethod
     def from_yaml(cls, filename):
-        with open(filename) as f:
-            data = load_yaml(f)
+        data = load_yaml_file(filename)
         return cls(filename, data)
 
     @classmethod
-    def from_dir(cls, directory):
-        return [PersonFile.from_yaml(filename) for filename in
-                glob.glob(os.path.join(directory, "*.yml"))]
+    def from_dir(cls, directory, jobs=1):
+        # matching is done by name & seat, so only those are parsed up front
+        return [cls(filename, data) for data, filename in
+                load_lazy_files(glob.glob(os.path.join(directory, "*.yml")), jobs=jobs)]
 
     @property
     def retired(self):
@@ -101,8 +102,10 @@ class PersonFile(object):
         self.data = merge_people(self.data, other.data, keep_on_conflict='new',
                                  custom_merges=custom_merges)
 
-    def save(self):
-        dump_obj(self.data, filename=self.filename)
+    def save(self, txn=None):
+        if txn:
+            return txn.write(self.data, self.filename)
+        return dump_obj(self.data, filename=self.filename)
 
 
 def deferred(fn):
@@ -120,6 +123,8 @@ class PersonMerger(object):
         self.defer = defer
         self.save = save
         self.end_date = end_date or date.today().strftime('%Y-%m-%d')
+        # deferred operations are written out together in one FileTransaction
+        self.txn = None
 
     def sort_operations(self):
         def get_seat(op):
@@ -135,9 +140,11 @@ class PersonMerger(object):
 
     def execute_deferred(self):
         self.sort_operations()
-        while self.operations:
-            fn, a, kw = self.operations.pop(0)
-            fn(self, *a, **kw)
+        with FileTransaction() as self.txn:
+            while self.operations:
+                fn, a, kw = self.operations.pop(0)
+                fn(self, *a, **kw)
+        self.txn = None
 
     @deferred
     def create(self, new):
@@ -145,13 +152,13 @@ class PersonMerger(object):
         if self.save:
             assert 'incoming' in new.filename
             new.filename = new.filename.replace('incoming/', 'data/')
-            new.save()
+            new.save(self.txn)
 
     @deferred
     def retire(self, existing):
         click.secho(f"In {existing.seat} retiring {existing.name}.", fg='blue')
         if self.save:
-            retire(self.end_date, existing.filename, None, False)
+            retire(self.end_date, existing.filename, None, False, self.txn)
 
     @deferred
     def update(self, existing, new):
@@ -170,10 +177,10 @@ class PersonMerger(object):
 
         if self.save:
             existing.merge(new)
-            existing.save()
+            existing.save(self.txn)
 
 
-def merge(state, merger):
+def merge(state, merger, jobs=1):
     """
     Merge incoming data for a given state into existing files.
 
@@ -182,11 +189,11 @@ def merge(state, merger):
     create new persons.
     """
     data_dir = get_data_dir(state)
-    existing_people = PersonFile.from_dir(os.path.join(data_dir, 'people')) + \
-        PersonFile.from_dir(os.path.join(data_dir, 'retired'))
+    existing_people = PersonFile.from_dir(os.path.join(data_dir, 'people'), jobs) + \
+        PersonFile.from_dir(os.path.join(data_dir, 'retired'), jobs)
     incoming_dir = data_dir.replace('data', 'incoming')
     assert data_dir != incoming_dir
-    new_people = PersonFile.from_dir(os.path.join(incoming_dir, 'people'))
+    new_people = PersonFile.from_dir(os.path.join(incoming_dir, 'people'), jobs)
 
     handled = set()
 
@@ -238,9 +245,13 @@ def merge(state, merger):
 @click.option('--defer/--no-defer', default=True, help="Defer changes until all are ready.")
 @click.option('--save/--no-save', default=True, help="Save changes.")
 @click.option('--end-date', default=None, help="Default end date for retirements and moves.")
-def entrypoint(state, defer, save, end_date):
+@click.option('-j', '--jobs', default=1,
+              help="Number of processes to parse files with (0 for one per CPU).")
+def entrypoint(state, defer, save, end_date, jobs):
+    if FileTransaction.recover():
+        click.secho('rolled back an interrupted batch of file changes', fg='yellow')
     merger = PersonMerger(defer=defer, save=save, end_date=end_date)
-    merge(state, merger)
+    merge(state, merger, jobs=jobs or None)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+import os
+import time
+import socket
+import threading
+import contextlib
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import click
+from utils import (get_all_abbreviations, iter_objects_parallel, get_cache_dir, read_cache_entry,
+                   write_cache_entry, cache_enabled, CACHE_VERSION)
+
+USER_AGENT = 'people-url-checker (+https://github.com/openstates/people)'
+# servers that don't implement HEAD properly answer these, so they get a GET instead
+RETRY_WITH_GET = (403, 405, 501)
+
+
+def iter_urls(obj):
+    """ yield (field, url) for the image, links & sources of obj """
+    if obj.get('image'):
+        yield 'image', obj['image']
+    for key in ('links', 'sources'):
+        for link in obj.get(key) or []:
+            if link.get('url'):
+                yield key, link['url']
+
+
+def collect_urls(abbreviations, objtypes=('people', 'organizations'), jobs=1):
+    """ map of url -> list of (abbr, path, field) it appears in """
+    urls = OrderedDict()
+    for obj, filename in iter_objects_parallel(abbreviations, objtypes, jobs=jobs):
+        path = '/'.join(filename.split(os.sep)[-3:])
+        abbr = path.split('/')[0]
+        for field, url in iter_urls(obj):
+            urls.setdefault(url, []).append((abbr, path, field))
+    return urls
+
+
+def get_host(url):
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+
+def request_url(url, method, timeout):
+    request = urllib.request.Request(url, method=method, headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            return resp.status, None
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except urllib.error.URLError as e:
+        return None, str(e.reason)
+    except (socket.timeout, OSError, ValueError) as e:
+        return None, str(e) or e.__class__.__name__
+
+
+def check_url(url, timeout=10):
+    """ (status, error) for url, status is None if no response was received """
+    status, error = request_url(url, 'HEAD', timeout)
+    if status in RETRY_WITH_GET:
+        status, error = request_url(url, 'GET', timeout)
+    return status, error
+
+
+def is_dead(result):
+    status = result[0]
+    return status is None or status >= 400
+
+
+class HostThrottle:
+    """
+    limits requests to each host to per_host at a time, with at least delay seconds
+    between the start of two requests to the same host
+    """
+
+    def __init__(self, per_host=2, delay=0.5):
+        self.per_host = per_host
+        self.delay = delay
+        self.lock = threading.Lock()
+        # host -> [semaphore, earliest time the next request may start]
+        self.hosts = {}
+
+    @contextlib.contextmanager
+    def slot(self, host):
+        with self.lock:
+            entry = self.hosts.setdefault(host, [threading.BoundedSemaphore(self.per_host), 0.0])
+        with entry[0]:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, entry[1])
+                entry[1] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def interleave_by_host(urls):
+    """ reorder urls round-robin by host, so that the workers aren't all waiting on one host """
+    by_host = OrderedDict()
+    for url in urls:
+        by_host.setdefault(get_host(url), deque()).append(url)
+    queues = list(by_host.values())
+    while queues:
+        for queue in queues:
+            yield queue.popleft()
+        queues = [queue for queue in queues if queue]
+
+
+class URLCache:
+    """ results of previous checks, on disk, each is rechecked once older than ttl seconds """
+
+    def __init__(self, ttl, path=None):
+        self.ttl = ttl
+        self.path = path or os.path.join(get_cache_dir('urls'), 'results.pickle')
+        entry = read_cache_entry(self.path) if cache_enabled() else None
+        # url -> (status, error, time checked)
+        self.results = entry['results'] if entry else {}
+
+    def get(self, url):
+        result = self.results.get(url)
+        if result and time.time() - result[2] < self.ttl:
+            return result
+        return None
+
+    def put(self, url, result):
+        # failures to connect are often transient, so only actual responses are kept
+        if result[0] is not None:
+            self.results[url] = result
+
+    def save(self):
+        if cache_enabled():
+            write_cache_entry(self.path, {'version': CACHE_VERSION, 'results': self.results})
+
+
+def check_urls(urls, cache, workers=16, per_host=2, delay=0.5, timeout=10):
+    """
+    map of url -> (status, error, time checked) for urls, only urls without a fresh result
+    in cache are requested, returns (results, number requested)
+    """
+    results = {}
+    stale = []
+    for url in urls:
+        cached = cache.get(url)
+        if cached:
+            results[url] = cached
+        else:
+            stale.append(url)
+
+    throttle = HostThrottle(per_host, delay)
+
+    def probe(url):
+        with throttle.slot(get_host(url)):
+            return check_url(url, timeout)
+
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {pool.submit(probe, url): url for url in interleave_by_host(stale)}
+            for future in as_completed(futures):
+                url = futures[future]
+                results[url] = (*future.result(), time.time())
+                cache.put(url, results[url])
+    finally:
+        # whatever was checked before an interrupt is kept for the next run
+        cache.save()
+    return results, len(stale)
+
+
+def dead_by_state(urls, results):
+    """ map of abbr -> list of (url, result, [(path, field), ...]) for dead urls """
+    dead = defaultdict(list)
+    for url, places in urls.items():
+        if is_dead(results[url]):
+            by_abbr = OrderedDict()
+            for abbr, path, field in places:
+                by_abbr.setdefault(abbr, []).append((path, field))
+            for abbr, state_places in by_abbr.items():
+                dead[abbr].append((url, results[url], state_places))
+    return dead
+
+
+@click.command()
+@click.argument('abbreviations', nargs=-1)
+@click.option('--retired', is_flag=True, help='Also check the URLs of retired people.')
+@click.option('--ttl', default=7.0, help='Days before a cached result is checked again.')
+@click.option('-w', '--workers', default=16, help='Number of requests in flight at once.')
+@click.option('--per-host', default=2, help='Number of requests in flight to one host at once.')
+@click.option('--delay', default=0.5,
+              help='Seconds between the start of two requests to the same host.')
+@click.option('--timeout', default=10.0, help='Seconds to wait for a response.')
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to parse files with (0 for one per CPU).')
+def check(abbreviations, retired, ttl, workers, per_host, delay, timeout, jobs):
+    """
+        Check that image, link & source URLs still resolve.
+
+        <ABBR> can be provided to restrict checking to select states.
+    """
+    if not abbreviations:
+        abbreviations = get_all_abbreviations()
+    objtypes = ('people', 'retired', 'organizations') if retired else ('people', 'organizations')
+    urls = collect_urls(abbreviations, objtypes, jobs=jobs or None)
+
+    cache = URLCache(ttl * 24 * 60 * 60)
+    results, requested = check_urls(urls, cache, workers=workers, per_host=per_host,
+                                    delay=delay, timeout=timeout)
+
+    dead = dead_by_state(urls, results)
+    for abbr in abbreviations:
+        if not dead[abbr]:
+            continue
+        click.secho(f'==== {abbr} ====', bold=True)
+        for url, (status, error, _), places in dead[abbr]:
+            click.secho(f'{status or error} {url}', fg='red')
+            for path, field in places:
+                click.secho(f' {path} {field}')
+
+    dead_count = len({url for state in dead.values() for url, _, _ in state})
+    click.secho(f'checked {len(urls)} URLs ({requested} requested, '
+                f'{len(urls) - requested} cached), {dead_count} dead',
+                fg='red' if dead_count else 'green')
+    if dead_count:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    check()
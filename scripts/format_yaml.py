@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+import os
+import glob
+import multiprocessing
+import click
+from utils import get_all_abbreviations, get_data_dir, load_yaml_file, dump_yaml, write_if_changed
+
+
+def format_file(filename, check=False):
+    """ returns True if filename isn't in canonical form (and rewrites it unless check) """
+    with open(filename, 'rb') as f:
+        content = f.read()
+    canonical = dump_yaml(load_yaml_file(filename)).encode('utf8')
+    if canonical == content:
+        return False
+    if not check:
+        write_if_changed(filename, canonical)
+    return True
+
+
+def check_file(filename):
+    return format_file(filename, check=True)
+
+
+def format_files(filenames, check=False, jobs=1, chunksize=32):
+    """ yield (filename, changed) for each of filenames, formatting them in jobs processes """
+    func = check_file if check else format_file
+    if jobs == 1:
+        for filename in filenames:
+            yield filename, func(filename)
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        yield from zip(filenames, pool.imap(func, filenames, chunksize))
+
+
+@click.command()
+@click.argument('abbreviations', nargs=-1)
+@click.option('--check', is_flag=True, help='Only list files that need formatting.')
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to format files with (0 for one per CPU).')
+def format_yaml(abbreviations, check, jobs):
+    """
+        Rewrite data files in the canonical form dump_obj writes.
+
+        <ABBREVIATIONS> can be provided to restrict formatting to select states.
+    """
+    if not abbreviations:
+        abbreviations = get_all_abbreviations()
+    filenames = []
+    for abbr in abbreviations:
+        for objtype in ('people', 'retired', 'organizations'):
+            filenames.extend(sorted(glob.glob(os.path.join(get_data_dir(abbr), objtype, '*.yml'))))
+
+    changed = 0
+    for filename, file_changed in format_files(filenames, check, jobs=jobs or None):
+        if file_changed:
+            changed += 1
+            click.secho(f'{"needs formatting" if check else "formatted"} {filename}',
+                        fg='yellow')
+
+    if check and changed:
+        click.secho(f'{changed} of {len(filenames)} files need formatting', fg='red')
+        raise SystemExit(1)
+    click.secho(f'{len(filenames)} files checked, {changed} changed', fg='green')
+
+
+if __name__ == '__main__':
+    format_yaml()
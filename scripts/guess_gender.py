@@ -4,7 +4,7 @@ import gender_guesser.detector
 import nameparser
 import requests
 from multiprocessing import Pool
-from utils import load_yaml, dump_obj
+from utils import load_yaml_file, dump_obj
 from io import BytesIO
 from PIL import Image
 
@@ -155,7 +155,7 @@ def get_gender(legislator):
 
 
 def update_legislator(legislator_file):
-    legislator = load_yaml(open(legislator_file))
+    legislator = load_yaml_file(legislator_file)
 
     if legislator.get('gender') and not OVERWRITE:
         click.secho(f'{legislator_file} already has a gender, skipping', fg='yellow')
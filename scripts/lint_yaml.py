@@ -2,12 +2,23 @@
 import re
 import os
 import sys
-import datetime
 import glob
+import json
+import pickle
+import sqlite3
+import hashlib
+import datetime
+import functools
+import multiprocessing
+import time
 import click
-from utils import (get_data_dir, get_filename, role_is_active, get_all_abbreviations, load_yaml,
-                   get_districts, get_settings)
-from collections import defaultdict, Counter
+from utils import (get_filename, role_is_active, get_all_abbreviations, iter_objects_parallel,
+                   get_districts, get_settings, get_data_dir, load_yaml_files, get_cache_dir,
+                   cache_enabled, CACHE_VERSION, load_yaml_file, dump_yaml, write_if_changed,
+                   reformat_phone_number, reformat_address)
+from collections import defaultdict, namedtuple, Counter
+from records import to_record, thaw
+from watcher import get_watcher
 
 
 class BadVacancy(Exception):
@@ -199,7 +210,10 @@ PERSON_FIELDS = {
 }
 
 
-def validate_obj(obj, schema, prefix=None):
+def interpret_obj(obj, schema, prefix=None):
+    """
+    validate obj by walking schema, this is the reference for what compile_schema generates
+    """
     errors = []
 
     if prefix:
@@ -226,12 +240,12 @@ def validate_obj(obj, schema, prefix=None):
                         f'{prefix_str}{field} failed validation {validator.__name__}: {value}'
                     )
         elif isinstance(validators, dict):
-            errors.extend(validate_obj(value, validators, [field]))
+            errors.extend(interpret_obj(value, validators, [field]))
         elif isinstance(validators, NestedList):
             if isinstance(validators.subschema, dict):
                 # validate list elements against child schema
                 for index, item in enumerate(value):
-                    errors.extend(validate_obj(item, validators.subschema, [field, str(index)]))
+                    errors.extend(interpret_obj(item, validators.subschema, [field, str(index)]))
             else:
                 # subschema can also be a validation function
                 for index, item in enumerate(value):
@@ -247,6 +261,189 @@ def validate_obj(obj, schema, prefix=None):
     return errors
 
 
+def compile_schema(schema, profiler=None, root='schema'):
+    """
+    generate a function(obj, prefix_str) that returns exactly the errors interpret_obj would,
+    without walking the schema or formatting messages for fields that pass
+
+    with a profiler every validator call is timed under its name and its field's path in
+    the schema (e.g. person.roles[]), otherwise the generated code has no instrumentation
+    """
+    namespace = {'Missing': Missing}
+    source = []
+
+    def ref(value):
+        name = f'_ref{len(namespace)}'
+        namespace[name] = value
+        return name
+
+    def call(validator, arg, path):
+        if profiler is None:
+            return f'{ref(validator)}({arg})'
+        return f'{ref(profiler.timed)}({ref(validator)}, {arg}, {path!r})'
+
+    def add_function(schema, path):
+        name = f'_validate{len(source)}'
+        # reserve this function's place so nested functions are numbered after it
+        source.append(None)
+        position = len(source) - 1
+        lines = [f'def {name}(obj, prefix_str):', '    errors = []']
+        for field, validators in schema.items():
+            lines.append(f'    value = obj.get({field!r}, Missing)')
+            if isinstance(validators, list):
+                checks = [v for v in validators if v is not Required]
+                lines.append('    if value is Missing:')
+                if Required in validators:
+                    lines.append(f'        errors.append(prefix_str + {field + " missing"!r})')
+                else:
+                    lines.append('        pass')
+                if checks:
+                    lines.append('    else:')
+                for validator in checks:
+                    message = f'{field} failed validation {validator.__name__}: '
+                    lines.append(f'        if not {call(validator, "value", path + field)}:')
+                    lines.append(f'            errors.append(prefix_str + {message!r} + '
+                                 'format(value))')
+            elif isinstance(validators, dict):
+                child = add_function(validators, f'{path}{field}.')
+                lines.append('    if value is not Missing:')
+                lines.append(f'        errors.extend({child}(value, {field + "."!r}))')
+            elif isinstance(validators, NestedList):
+                lines.append('    if value is not Missing:')
+                lines.append('        for index, item in enumerate(value):')
+                if isinstance(validators.subschema, dict):
+                    child = add_function(validators.subschema, f'{path}{field}[].')
+                    lines.append(f'            errors.extend({child}(item, {field + "."!r} + '
+                                 'str(index) + "."))')
+                else:
+                    lines.append(f'            item_prefix = {field + "."!r} + str(index) + ": "')
+                    lines.append('            errors.extend([item_prefix + e for e in '
+                                 f'{call(validators.subschema, "item", f"{path}{field}[]")}])')
+            else:   # pragma: no cover
+                raise ValueError('invalid schema {}'.format(validators))
+
+        # the set difference is the same expression interpret_obj uses, so extra keys come
+        # out in the same order
+        keys = ref(frozenset(schema.keys()))
+        lines.append(f'    if not obj.keys() <= {keys}:')
+        lines.append(f'        for key in set(obj.keys()) - {keys}:')
+        lines.append('            errors.append("extra key: " + prefix_str + format(key))')
+        lines.append('    return errors')
+        source[position] = '\n'.join(lines)
+        return name
+
+    name = add_function(schema, f'{root}.')
+    exec(compile('\n\n'.join(source), '<compiled schema>', 'exec'), namespace)
+    return namespace[name]
+
+
+# id(schema) -> (schema, compiled function), holding on to schema keeps its id from being reused
+_compiled_schemas = {}
+
+
+def validate_obj(obj, schema, prefix=None):
+    cached = _compiled_schemas.get(id(schema))
+    if cached is None or cached[0] is not schema:
+        cached = _compiled_schemas[id(schema)] = (schema, compile_schema(schema))
+    return cached[1](obj, '.'.join(prefix) + '.' if prefix else '')
+
+
+SCHEMA_NAMES = {
+    id(PERSON_FIELDS): 'person',
+    id(ORGANIZATION_FIELDS): 'organization',
+    id(LEGISLATIVE_ROLE_FIELDS): 'legislative_role',
+    id(EXECUTIVE_ROLE_FIELDS): 'executive_role',
+}
+
+
+class Profiler:
+    """
+    opt-in instrumentation of lint: install() swaps validate_obj for a version compiled with
+    timed validator calls & wraps the functions & Validator methods listed below, uninstall()
+    puts the originals back so there's no cost at all when profiling is off
+    """
+    FUNCTIONS = ('role_is_active', 'validate_roles', 'compare_districts', 'get_filename',
+                 'get_expected_districts')
+    METHODS = ('validate_person', 'validate_org', 'summarize_person', 'summarize_org',
+               'check_duplicates')
+    TABLES = ('states', 'functions', 'validators', 'fields')
+
+    def __init__(self):
+        # table -> name -> [calls, seconds]
+        self.stats = {table: defaultdict(lambda: [0, 0.0]) for table in self.TABLES}
+        self.compiled = {}
+        self.originals = {}
+
+    def add(self, table, name, elapsed):
+        entry = self.stats[table][name]
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def timed(self, func, value, path):
+        start = time.perf_counter()
+        result = func(value)
+        elapsed = time.perf_counter() - start
+        self.add('validators', func.__name__, elapsed)
+        self.add('fields', path, elapsed)
+        return result
+
+    def wrap(self, func, name):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add('functions', name, time.perf_counter() - start)
+        return wrapper
+
+    def validate_obj(self, obj, schema, prefix=None):
+        cached = self.compiled.get(id(schema))
+        if cached is None or cached[0] is not schema:
+            compiled = compile_schema(schema, self, SCHEMA_NAMES.get(id(schema), 'schema'))
+            cached = self.compiled[id(schema)] = (schema, compiled)
+        return cached[1](obj, '.'.join(prefix) + '.' if prefix else '')
+
+    def install(self):
+        module = globals()
+        self.originals['validate_obj'] = module['validate_obj']
+        module['validate_obj'] = self.wrap(self.validate_obj, 'validate_obj')
+        for name in self.FUNCTIONS:
+            self.originals[name] = module[name]
+            module[name] = self.wrap(module[name], name)
+        for name in self.METHODS:
+            self.originals['Validator.' + name] = Validator.__dict__[name]
+            setattr(Validator, name, self.wrap(Validator.__dict__[name], 'Validator.' + name))
+
+    def uninstall(self):
+        for name, func in self.originals.items():
+            if name.startswith('Validator.'):
+                setattr(Validator, name.split('.', 1)[1], func)
+            else:
+                globals()[name] = func
+        self.originals = {}
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+
+    def to_json(self):
+        return {table: {name: {'calls': calls, 'seconds': seconds}
+                        for name, (calls, seconds) in sorted(stats.items())}
+                for table, stats in self.stats.items()}
+
+    def print_report(self, echo=click.secho, limit=15):
+        for table in self.TABLES:
+            ranked = sorted(self.stats[table].items(), key=lambda item: -item[1][1])
+            echo(f'{table} (top {min(limit, len(ranked))} of {len(ranked)} by time)', bold=True)
+            echo('     calls   total ms  per call us  name')
+            for name, (calls, seconds) in ranked[:limit]:
+                echo(f'{calls:10d} {seconds * 1000:10.1f} {seconds / calls * 1e6:12.2f}  {name}')
+
+
 def validate_roles(person, roles_key, retired=False):
     active = [role for role in person[roles_key] if role_is_active(role)]
     if len(active) == 0 and not retired:
@@ -258,20 +455,19 @@ def validate_roles(person, roles_key, retired=False):
     return []
 
 
-def get_expected_districts(settings):
+def get_expected_districts(settings, echo=click.secho):
     expected = get_districts(settings)
 
     # remove vacancies
     vacancies = settings.get('vacancies', [])
     if vacancies:
-        click.secho(f'Processing {len(vacancies)} vacancies:')
+        echo(f'Processing {len(vacancies)} vacancies:')
     for vacancy in settings.get('vacancies', []):
         if datetime.date.today() < vacancy['vacant_until']:
             expected[vacancy['chamber']][str(vacancy['district'])] -= 1
-            click.secho('\t{chamber}-{district} (until {vacant_until})'.format(**vacancy),
-                        fg='yellow')
+            echo('\t{chamber}-{district} (until {vacant_until})'.format(**vacancy), fg='yellow')
         else:
-            click.secho('\t{chamber}-{district} expired {vacant_until} remove & re-run'.format(
+            echo('\t{chamber}-{district} expired {vacant_until} remove & re-run'.format(
                 **vacancy), fg='red')
             raise BadVacancy()
 
@@ -302,6 +498,23 @@ def compare_districts(expected, actual):
     return errors
 
 
+class PersonRef(namedtuple('PersonRef', 'filename id name')):
+    """
+    what the cross-file checks keep of a person instead of the whole object, supports
+    ref['id'] & ref['name'] so get_filename works on it as it does on the person
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    @classmethod
+    def from_person(cls, person, filename=None):
+        return cls(filename, person.get('id'), person.get('name'))
+
+
 class Validator:
     OPTIONAL_FIELD_SET = set(('sort_name', 'given_name', 'family_name',
                               'gender', 'summary', 'biography',
@@ -309,9 +522,15 @@ class Validator:
                               'links', 'other_names', 'sources',
                               ))
 
-    def __init__(self, abbr, settings):
+    def __init__(self, abbr, settings, echo=click.secho, stream=False, verbose=0):
         self.http_whitelist = tuple(settings.get('http_whitelist', []))
-        self.expected = get_expected_districts(settings[abbr])
+        self.expected = get_expected_districts(settings[abbr], echo)
+        # with stream=True each file's errors are printed as soon as it is validated instead
+        # of being kept for print_validation_report, only their count is kept
+        self.stream = stream
+        self.verbose = verbose
+        self.echo = echo
+        self.streamed_error_count = 0
         self.errors = defaultdict(list)
         self.warnings = defaultdict(list)
         self.person_count = 0
@@ -327,40 +546,56 @@ class Validator:
         self.id_counts = Counter()
         self.optional_fields = Counter()
         self.extra_counts = Counter()
-        # role type -> district -> person
+        # role type -> district -> PersonRef
         self.active_legislators = defaultdict(lambda: defaultdict(list))
-        # field name -> value -> person
+        # field name -> value -> PersonRef
         self.duplicate_values = defaultdict(lambda: defaultdict(list))
 
-    def validate_person(self, person, filename, retired=False):
-        self.errors[filename] = validate_obj(person, PERSON_FIELDS)
+    def validate_person(self, person, filename, retired=False, schema_errors=None):
+        if schema_errors is None:
+            schema_errors = validate_obj(person, PERSON_FIELDS)
+        errors = list(schema_errors)
         uid = person['id'].split('/')[1]
         if uid not in filename:
-            self.errors[filename].append(f'id piece {uid} not in filename')
-        self.errors[filename].extend(validate_roles(person, 'roles', retired))
-        self.errors[filename].extend(validate_roles(person, 'party'))
+            errors.append(f'id piece {uid} not in filename')
+        errors.extend(validate_roles(person, 'roles', retired))
+        errors.extend(validate_roles(person, 'party'))
         # TODO: this was too ambitious, disabling this for now
         # self.warnings[filename] = self.check_https(person)
         self.person_mapping[person['id']] = person['name']
         if retired:
             self.retired_count += 1
         else:
-            self.summarize_person(person)
+            self.summarize_person(person, filename)
+        self.finish_file(filename, errors, [])
 
-    def validate_org(self, org, filename):
-        self.errors[filename] = validate_obj(org, ORGANIZATION_FIELDS)
+    def validate_org(self, org, filename, schema_errors=None):
+        if schema_errors is None:
+            schema_errors = validate_obj(org, ORGANIZATION_FIELDS)
+        errors = list(schema_errors)
+        warnings = []
         uid = org['id'].split('/')[1]
         if uid not in filename:
-            self.errors[filename].append(f'id piece {uid} not in filename')
+            errors.append(f'id piece {uid} not in filename')
         for m in org['memberships']:
             if not m.get('id'):
                 continue
             if m['id'] not in self.person_mapping:
-                self.errors[filename].append(f'invalid person ID {m["id"]}')
+                errors.append(f'invalid person ID {m["id"]}')
             elif self.person_mapping[m['id']] != m['name']:
                 name = self.person_mapping[m['id']]
-                self.warnings[filename].append(f'ID {m["id"]} refers to {name}, not {m["name"]}')
+                warnings.append(f'ID {m["id"]} refers to {name}, not {m["name"]}')
         self.summarize_org(org)
+        self.finish_file(filename, errors, warnings)
+
+    def finish_file(self, filename, errors, warnings):
+        if self.stream:
+            self.streamed_error_count += self.report_file(filename, errors, warnings,
+                                                          self.verbose, self.echo)
+        else:
+            self.errors[filename] = errors
+            if warnings:
+                self.warnings[filename] = warnings
 
     def check_https_url(self, url):
         if url and url.startswith('http://') and not url.startswith(self.http_whitelist):
@@ -381,9 +616,10 @@ class Validator:
                 warnings.append(f'sources.{i} URL {url} should be HTTPS')
         return warnings
 
-    def summarize_person(self, person):
+    def summarize_person(self, person, filename=None):
         role_type = None
         district = None
+        ref = PersonRef.from_person(person, filename)
 
         self.person_count += 1
         self.optional_fields.update(set(person.keys()) & self.OPTIONAL_FIELD_SET)
@@ -394,7 +630,7 @@ class Validator:
                 role_type = role['type']
                 district = role.get('district')
                 break
-        self.active_legislators[role_type][district].append(person)
+        self.active_legislators[role_type][district].append(ref)
 
         for role in person.get('party', []):
             if role_is_active(role):
@@ -407,14 +643,14 @@ class Validator:
                     # currently too aggressive:
                     # plenty of valid cases where legislators share
                     # phone numbers & addresses apparently
-                    # self.duplicate_values[key][value].append(person)
+                    # self.duplicate_values[key][value].append(ref)
 
         for scheme, value in person.get('ids', {}).items():
             self.id_counts[scheme] += 1
-            self.duplicate_values[scheme][value].append(person)
+            self.duplicate_values[scheme][value].append(ref)
         for id in person.get('other_identifiers', []):
             self.id_counts[id['scheme']] += 1
-            self.duplicate_values[id['scheme']][id['identifier']].append(person)
+            self.duplicate_values[id['scheme']][id['identifier']].append(ref)
 
     def summarize_org(self, org):
         self.org_count += 1
@@ -447,40 +683,43 @@ class Validator:
                     errors.append(f'duplicate {key}: "{value}" {instance_str}')
         return errors
 
-    def print_validation_report(self, verbose):     # pragma: no cover
-        error_count = 0
+    @staticmethod
+    def report_file(fn, errors, warnings, verbose, echo=click.secho):
+        if errors or warnings:
+            echo(fn)
+            for err in errors:
+                echo(' ' + err, fg='red')
+            for warning in warnings:
+                echo(' ' + warning, fg='yellow')
+        if not errors and verbose > 0:
+            echo(fn + ' OK!', fg='green')
+        return len(errors)
+
+    def print_validation_report(self, verbose, echo=click.secho):     # pragma: no cover
+        error_count = self.streamed_error_count
 
         for fn, errors in self.errors.items():
-            warnings = self.warnings[fn]
-            if errors or warnings:
-                click.echo(fn)
-                for err in errors:
-                    click.secho(' ' + err, fg='red')
-                    error_count += 1
-                for warning in warnings:
-                    click.secho(' ' + warning, fg='yellow')
-            if not errors and verbose > 0:
-                click.secho(fn + ' OK!', fg='green')
+            error_count += self.report_file(fn, errors, self.warnings.get(fn, []), verbose, echo)
 
         for err in self.check_duplicates():
-            click.secho(err, fg='red')
+            echo(err, fg='red')
             error_count += 1
 
         errors = compare_districts(self.expected, self.active_legislators)
         for err in errors:
-            click.secho(err, fg='red')
+            echo(err, fg='red')
             error_count += 1
 
         return error_count
 
-    def print_summary(self):                        # pragma: no cover
-        click.secho(f'processed {self.person_count} active people, {self.retired_count} retired & '
-                    f'{self.org_count} organizations', bold=True)
+    def print_summary(self, echo=click.secho):                       # pragma: no cover
+        echo(f'processed {self.person_count} active people, {self.retired_count} retired & '
+             f'{self.org_count} organizations', bold=True)
         for role_type in self.active_legislators:
             count = sum([len(v) for v in self.active_legislators[role_type].values()])
-            click.secho(f'{count:4d} {role_type}')
+            echo(f'{count:4d} {role_type}')
 
-        click.secho('Parties', bold=True)
+        echo('Parties', bold=True)
         for party, count in self.parties.items():
             if party == 'Republican':
                 color = 'red'
@@ -488,24 +727,24 @@ class Validator:
                 color = 'blue'
             else:
                 color = 'green'
-            click.secho(f'{count:4d} {party} ', bg=color)
+            echo(f'{count:4d} {party} ', bg=color)
 
         for name, collection in {'Contact Info': self.contact_counts,
                                  'Identifiers': self.id_counts,
                                  'Additional Info': self.optional_fields,
                                  'Extras': self.extra_counts}.items():
             if collection:
-                click.secho(name, bold=True)
+                echo(name, bold=True)
                 for type, count in collection.items():
-                    click.secho(f'{count:4d} {type} ')
+                    echo(f'{count:4d} {type} ')
             else:
-                click.secho(name + ' - none', bold=True)
+                echo(name + ' - none', bold=True)
 
-        click.secho('Committees', bold=True)
+        echo('Committees', bold=True)
         for parent, count in self.parent_types.items():
-            click.secho(f'{count:4d} {parent}')
+            echo(f'{count:4d} {parent}')
         for role, count in self.role_types.items():
-            click.secho(f'{count:4d} {role} roles')
+            echo(f'{count:4d} {role} roles')
 
         # check committee role IDs
         total_roles = sum(self.role_types.values())
@@ -519,42 +758,454 @@ class Validator:
                 color = 'yellow'
             else:
                 color = 'red'
-            click.secho('{:4d} roles missing ID {:.1f}%'.format(
+            echo('{:4d} roles missing ID {:.1f}%'.format(
                 self.missing_person_id, self.missing_person_id_percent), fg=color)
 
 
-def process_dir(abbr, verbose, summary, settings):      # pragma: no cover
-    person_filenames = glob.glob(os.path.join(get_data_dir(abbr), 'people', '*.yml'))
-    retired_filenames = glob.glob(os.path.join(get_data_dir(abbr), 'retired', '*.yml'))
-    org_filenames = glob.glob(os.path.join(get_data_dir(abbr), 'organizations', '*.yml'))
+OBJTYPES = ('people', 'retired', 'organizations')
+# keys Validator reads beyond a key's presence, everything else is reduced to None
+PERSON_SKELETON_KEYS = ('id', 'name', 'roles', 'party', 'ids', 'other_identifiers')
+ORG_SKELETON_KEYS = ('id', 'name', 'parent', 'memberships')
+
+
+def lint_skeleton(obj, objtype):
+    """
+    the parts of obj that Validator needs once schema validation is done, in the same key
+    order so the summary counts come out in the same order
+    """
+    keep = ORG_SKELETON_KEYS if objtype == 'organizations' else PERSON_SKELETON_KEYS
+    skeleton = {}
+    for key, value in obj.items():
+        if key in keep:
+            skeleton[key] = value
+        elif key == 'extras' and isinstance(value, dict):
+            skeleton[key] = dict.fromkeys(value)
+        elif key == 'contact_details' and isinstance(value, list):
+            skeleton[key] = [dict.fromkeys(cd) for cd in value]
+        else:
+            skeleton[key] = None
+    # records (with --compact) are turned back into plain values so they pickle compactly
+    return thaw(skeleton)
+
+
+LINT_CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    objtype TEXT,
+    filename TEXT,
+    sha1 TEXT,
+    entry BLOB,
+    PRIMARY KEY (objtype, filename)
+);
+'''
+
+
+def get_lint_code_hash():
+    """ hash of the code lint results depend on, a change to either invalidates the cache """
+    digest = hashlib.sha1(str(CACHE_VERSION).encode())
+    for module in ('lint_yaml.py', 'utils.py'):
+        with open(os.path.join(os.path.dirname(__file__), module), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class LintCache:
+    """
+    per-state cache of (schema errors, skeleton) for each file, keyed by the file's content
+
+    everything that depends on the date or on other files (active roles, duplicates, seats,
+    membership ids) is recomputed from the skeletons on every run
+
+    entries are kept in an SQLite file and read & written one at a time, so a streaming lint
+    holds no more of them in memory than an uncached one
+    """
+
+    def __init__(self, abbr):
+        self.path = os.path.join(get_cache_dir('lint'), f'{abbr}.sqlite3')
+        self.data_dir = get_data_dir(abbr)
+        self.code_hash = get_lint_code_hash()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path)
+            with self.conn:
+                self.conn.executescript(LINT_CACHE_SCHEMA)
+                row = self.conn.execute("SELECT value FROM meta WHERE key='code'").fetchone()
+                if row is None or row[0] != self.code_hash:
+                    self.conn.execute('DELETE FROM files')
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('code', ?)",
+                                      (self.code_hash,))
+        except (OSError, sqlite3.Error):
+            # the cache is an optimization, a read-only checkout should still work
+            self.conn = None
+
+    def __len__(self):
+        if self.conn is None:
+            return 0
+        return self.conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def has(self, key, sha1):
+        if self.conn is None:
+            return False
+        try:
+            return self.conn.execute(
+                'SELECT 1 FROM files WHERE objtype=? AND filename=? AND sha1=?', (*key, sha1)
+            ).fetchone() is not None
+        except sqlite3.Error:
+            # e.g. locked by another lint of the same state, treat it as a miss
+            return False
+
+    def get(self, key, sha1):
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute(
+                'SELECT entry FROM files WHERE objtype=? AND filename=? AND sha1=?', (*key, sha1)
+            ).fetchone()
+            return pickle.loads(row[0]) if row else None
+        except (sqlite3.Error, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, sha1, schema_errors, skeleton):
+        if self.conn is None:
+            return
+        entry = pickle.dumps((schema_errors, skeleton), protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                              (*key, sha1, entry))
+        except sqlite3.Error:
+            # e.g. a read-only cache file, the file is just linted again next time
+            pass
+
+    def save(self):
+        """ commit what was put and drop the entries for files that are gone """
+        if self.conn is None:
+            return
+        try:
+            gone = [key for key in self.conn.execute('SELECT objtype, filename FROM files')
+                    if not os.path.exists(os.path.join(self.data_dir, *key))]
+            self.conn.executemany('DELETE FROM files WHERE objtype=? AND filename=?', gone)
+            self.conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def lint_file(obj, objtype, compact=False):
+    """ the (schema errors, skeleton) for one file, what LintCache stores """
+    if compact:
+        obj = to_record(obj)
+    schema = ORGANIZATION_FIELDS if objtype == 'organizations' else PERSON_FIELDS
+    return validate_obj(obj, schema), lint_skeleton(obj, objtype)
+
+
+def iter_cached_objects(abbr, cache, jobs=1, compact=False):
+    """
+    yield (skeleton, filename, schema_errors) for abbr's files in lint order, only parsing
+    and validating files whose content isn't in cache (every file if cache is None)
+    """
+    entries = []
+    for objtype in OBJTYPES:
+        for filename in sorted(glob.glob(os.path.join(get_data_dir(abbr), objtype, '*.yml'))):
+            if cache is None:
+                entries.append((filename, objtype, None, None, False))
+                continue
+            with open(filename, 'rb') as f:
+                sha1 = hashlib.sha1(f.read()).hexdigest()
+            key = (objtype, os.path.basename(filename))
+            entries.append((filename, objtype, key, sha1, cache.has(key, sha1)))
+
+    # cached entries are only read as they're yielded, so just one is in memory at a time
+    parsed = load_yaml_files([e[0] for e in entries if not e[4]], jobs=jobs)
+    for filename, objtype, key, sha1, hit in entries:
+        if hit:
+            cached = cache.get(key, sha1)
+            if cached is None:
+                # replaced or unreadable since has(), lint it again but don't cache it: the
+                # file may also have changed since it was hashed
+                cached = lint_file(load_yaml_file(filename), objtype, compact)
+        else:
+            obj, _ = next(parsed)
+            cached = lint_file(obj, objtype, compact)
+            if cache is not None:
+                cache.put(key, sha1, *cached)
+        yield cached[1], filename, cached[0]
+    if cache is not None:
+        cache.save()
+
+
+def validate_objects(validator, objects):
+    """ feed (obj, filename, schema_errors or None) to validator, in lint order """
+    for obj, filename, schema_errors in objects:
+        print_filename = os.path.basename(filename)
+        objtype = os.path.basename(os.path.dirname(filename))
+        if objtype == 'organizations':
+            validator.validate_org(obj, print_filename, schema_errors)
+        else:
+            validator.validate_person(obj, print_filename, retired=(objtype == 'retired'),
+                                      schema_errors=schema_errors)
+
+
+def process_dir(abbr, verbose, summary, settings, jobs=1, compact=False,
+                echo=click.secho, cache=False):                         # pragma: no cover
     try:
-        validator = Validator(abbr, settings)
+        validator = Validator(abbr, settings, echo, stream=True, verbose=verbose)
     except BadVacancy:
         sys.exit(-1)
 
-    for filename in person_filenames:
-        print_filename = os.path.basename(filename)
-        with open(filename) as f:
-            person = load_yaml(f)
-            validator.validate_person(person, print_filename)
+    if cache:
+        objects = iter_cached_objects(abbr, LintCache(abbr), jobs=jobs, compact=compact)
+    else:
+        objects = ((to_record(obj) if compact else obj, filename, None) for obj, filename in
+                   iter_objects_parallel([abbr], OBJTYPES, jobs=jobs))
 
-    for filename in retired_filenames:
-        print_filename = os.path.basename(filename)
-        with open(filename) as f:
-            person = load_yaml(f)
-            validator.validate_person(person, print_filename, retired=True)
+    validate_objects(validator, objects)
+    error_count = validator.print_validation_report(verbose, echo)
 
-    for filename in org_filenames:
-        print_filename = os.path.basename(filename)
-        with open(filename) as f:
-            org = load_yaml(f)
-            validator.validate_org(org, print_filename)
+    if summary:
+        validator.print_summary(echo)
 
-    error_count = validator.print_validation_report(verbose)
+    return error_count
+
+
+def lint_order(filename):
+    objtype = os.path.basename(os.path.dirname(filename))
+    return OBJTYPES.index(objtype), filename
+
+
+def watch_state(abbr, verbose, summary, settings, jobs=1, compact=False, cache=False,
+                echo=click.secho, watcher=None, rounds=None):
+    """
+    lint abbr, then re-lint every time one of its files changes
+
+    the (schema errors, skeleton) for every file stays in memory, so a change only parses &
+    validates the changed files, the cross-file checks are rerun from the skeletons
+    """
+    directories = [os.path.join(get_data_dir(abbr), objtype) for objtype in OBJTYPES]
+    if watcher is None:
+        watcher = get_watcher(directories)
+    entries = {os.path.abspath(filename): (skeleton, schema_errors) for skeleton, filename,
+               schema_errors in iter_cached_objects(abbr, LintCache(abbr) if cache else None,
+                                                    jobs=jobs, compact=compact)}
+    # everything was just validated, from here on only changed files are
+    changed = set()
+    revalidated = len(entries)
+
+    with watcher:
+        while True:
+            start = time.monotonic()
+            parse_errors = []
+            for filename in sorted(changed):
+                objtype = os.path.basename(os.path.dirname(filename))
+                if not os.path.exists(filename):
+                    entries.pop(filename, None)
+                    continue
+                try:
+                    obj = load_yaml_file(filename)
+                    schema_errors, skeleton = lint_file(obj, objtype, compact)
+                    entries[filename] = (skeleton, schema_errors)
+                except Exception as e:
+                    # most likely saved halfway through an edit, skip it until it's fixed
+                    entries.pop(filename, None)
+                    parse_errors.append(f'{os.path.basename(filename)} could not be linted: {e}')
+
+            echo('==== {} ===='.format(abbr), bold=True)
+            try:
+                validator = Validator(abbr, settings, echo)
+            except BadVacancy:
+                sys.exit(-1)
+            validate_objects(validator, ((entries[filename][0], filename, entries[filename][1])
+                                         for filename in sorted(entries, key=lint_order)))
+            error_count = validator.print_validation_report(verbose, echo)
+            for err in parse_errors:
+                echo(err, fg='red')
+            error_count += len(parse_errors)
+            if summary:
+                validator.print_summary(echo)
+            elapsed = (time.monotonic() - start) * 1000
+            echo(f'{error_count} errors, {revalidated} files revalidated in {elapsed:.0f}ms, '
+                 'watching for changes...', fg='red' if error_count else 'green')
+
+            if rounds is not None:
+                rounds -= 1
+                if not rounds:
+                    return error_count
+            changed = {os.path.abspath(filename) for filename in watcher.wait()}
+            revalidated = len(changed)
+
+
+def get_identifiers(person):
+    """ (scheme, value) for everything that should identify just one person """
+    yield 'id', person['id']
+    yield from (person.get('ids') or {}).items()
+    for oid in person.get('other_identifiers') or []:
+        yield oid['scheme'], oid['identifier']
+
+
+def build_identifier_index(abbreviations, jobs=1):
+    """
+    map of (scheme, value) -> path, or list of paths if it appears in more than one file
+
+    only the identifier keys of each file are parsed and nothing but the index is kept, so
+    memory grows with the number of identifiers rather than the number of people
+    """
+    index = {}
+    for person, filename in iter_objects_parallel(abbreviations, ('people', 'retired'),
+                                                  jobs=jobs, lazy=True,
+                                                  keys=('id', 'ids', 'other_identifiers')):
+        path = '/'.join(filename.split(os.sep)[-3:])
+        for key in get_identifiers(person):
+            found = index.setdefault(key, path)
+            if found != path:
+                if isinstance(found, str):
+                    index[key] = [found, path]
+                elif path not in found:
+                    found.append(path)
+    return index
+
+
+def check_nationwide(abbreviations, jobs=1):
+    """ errors for identifiers used by files in more than one state """
+    errors = []
+    for (scheme, value), paths in build_identifier_index(abbreviations, jobs).items():
+        if isinstance(paths, list) and len({path.split('/')[0] for path in paths}) > 1:
+            errors.append(f'duplicate {scheme} across states: "{value}" {", ".join(paths)}')
+    return errors
+
+
+FIX_NAME_KEYS = ('name', 'sort_name', 'given_name', 'family_name')
+# only a value that is one number (& extension) is reformatted, anything else is left to lint
+FIXABLE_PHONE_RE = re.compile(r'''^\s*
+                              (?:\+?1[\s.-]*)?                          # prefix
+                              \(?\d{3}\)?[\s.-]*\d{3}[\s.-]*\d{4}          # main 10 digits
+                              (?:\s*(?:ext|Ext|EXT)\.?\s*\d{1,4})?        # extension
+                              \s*$''', re.VERBOSE)
+
+
+def normalize_whitespace(value):
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+def fix_obj(obj):
+    """
+    apply the normalizations to_yaml makes on import to a hand-edited obj, in place
+
+    returns the number of values changed
+    """
+    fixes = 0
+
+    def fix(container, key, func):
+        nonlocal fixes
+        value = container.get(key) if isinstance(container, dict) else None
+        if isinstance(value, str) and func(value) != value:
+            container[key] = func(value)
+            fixes += 1
+
+    for key in FIX_NAME_KEYS:
+        fix(obj, key, normalize_whitespace)
+    for other in obj.get('other_names') or []:
+        fix(other, 'name', normalize_whitespace)
+    for membership in obj.get('memberships') or []:
+        fix(membership, 'name', normalize_whitespace)
+
+    details = list(obj.get('contact_details') or [])
+    for role in obj.get('roles') or []:
+        if isinstance(role, dict):
+            details.extend(role.get('contact_details') or [])
+    for cd in details:
+        for key in ('voice', 'fax'):
+            value = cd.get(key) if isinstance(cd, dict) else None
+            if is_string(value) and not is_phone(value) and FIXABLE_PHONE_RE.match(value):
+                fix(cd, key, reformat_phone_number)
+        fix(cd, 'address', reformat_address)
+
+    for key in ('links', 'sources'):
+        for link in obj.get(key) or []:
+            if isinstance(link, dict) and 'note' in link and not link['note']:
+                del link['note']
+                fixes += 1
+    return fixes
+
+
+def fix_file(filename):
+    """ fix filename in place, returns the number of fixes, 0 if it didn't need rewriting """
+    obj = load_yaml_file(filename)
+    before = dump_yaml(obj)
+    fixes = fix_obj(obj)
+    if not fixes:
+        return 0
+    after = dump_yaml(obj)
+    if after == before:
+        return 0
+    write_if_changed(filename, after.encode('utf8'))
+    return fixes
+
+
+def fix_files(filenames, jobs=1, chunksize=16):
+    """ yield (filename, fixes) for each of filenames, fixing them in jobs processes """
+    if jobs == 1:
+        for filename in filenames:
+            yield filename, fix_file(filename)
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        yield from zip(filenames, pool.imap(fix_file, filenames, chunksize))
+
+
+def fix_states(abbreviations, verbose, jobs=1):
+    """ fix every file in abbreviations, printing the number of fixes made in each state """
+    filenames = []
+    for abbr in abbreviations:
+        for objtype in OBJTYPES:
+            filenames.extend(sorted(glob.glob(os.path.join(get_data_dir(abbr), objtype,
+                                                           '*.yml'))))
+
+    counts = {abbr: [0, 0] for abbr in abbreviations}
+    for filename, fixes in fix_files(filenames, jobs):
+        if fixes:
+            abbr = os.path.basename(os.path.dirname(os.path.dirname(filename)))
+            counts[abbr][0] += fixes
+            counts[abbr][1] += 1
+            if verbose > 0:
+                click.secho(f'fixed {filename}', fg='yellow')
+    for abbr, (fixes, files) in counts.items():
+        if fixes:
+            click.secho(f'{abbr}: {fixes} fixes in {files} files', fg='yellow')
+    return counts
+
+
+def lint_state(abbr, verbose, summary, settings, compact=False,
+               cache=False):                                            # pragma: no cover
+    """
+    lint one state in a worker process, collecting its output to be replayed by the parent
+
+    returns (output, error count, exit code), output is a list of (message, styles) for
+    click.secho and exit code is set if linting stopped early
+    """
+    output = []
+
+    def echo(message=None, **styles):
+        output.append((message, styles))
+
+    echo('==== {} ===='.format(abbr), bold=True)
+    try:
+        error_count = process_dir(abbr, verbose, summary, settings, compact=compact, echo=echo,
+                                  cache=cache)
+    except SystemExit as e:
+        return output, 0, e.code
+    return output, error_count, None
 
-    if summary:
-        validator.print_summary()
 
+def lint_states(abbreviations, verbose, summary, settings, jobs=None, compact=False,
+                cache=False):                                           # pragma: no cover
+    """ lint states in a pool of jobs processes, output is identical to linting serially """
+    error_count = 0
+    func = functools.partial(lint_state, verbose=verbose, summary=summary, settings=settings,
+                             compact=compact, cache=cache)
+    with multiprocessing.Pool(jobs) as pool:
+        for output, state_errors, exit_code in pool.imap(func, abbreviations):
+            for message, styles in output:
+                click.secho(message, **styles)
+            if exit_code is not None:
+                sys.exit(exit_code)
+            error_count += state_errors
     return error_count
 
 
@@ -563,7 +1214,23 @@ def process_dir(abbr, verbose, summary, settings):      # pragma: no cover
 @click.option('-v', '--verbose', count=True)
 @click.option('--summary/--no-summary', default=False,
               help='Print summary after validation errors.')
-def lint(abbreviations, verbose, summary):
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to lint with (0 for one per CPU).')
+@click.option('--compact/--no-compact', default=False,
+              help='Hold parsed files as compact records to reduce memory use.')
+@click.option('--cache/--no-cache', default=True,
+              help='Reuse results for files whose content has not changed.')
+@click.option('--nationwide', is_flag=True,
+              help='Also check identifiers are unique across the linted states.')
+@click.option('--watch', is_flag=True,
+              help='Keep running, re-linting a single state whenever its files change.')
+@click.option('--profile', 'profile_path', default=None, metavar='FILENAME',
+              help='Time validators, fields, functions & states, printing a ranked table and '
+              'writing a JSON report to FILENAME.')
+@click.option('--fix', is_flag=True,
+              help='Normalize phone numbers, addresses, names & empty link notes before linting.')
+def lint(abbreviations, verbose, summary, jobs, compact, cache, nationwide, watch,
+         profile_path, fix):
     """
         Lint YAML files, optionally also providing a summary of state's data.
 
@@ -574,10 +1241,50 @@ def lint(abbreviations, verbose, summary):
 
     if not abbreviations:
         abbreviations = get_all_abbreviations()
-
-    for abbr in abbreviations:
-        click.secho('==== {} ===='.format(abbr), bold=True)
-        error_count += process_dir(abbr, verbose, summary, settings)
+    cache = cache and cache_enabled()
+
+    if fix:
+        click.secho('==== fixes ====', bold=True)
+        fix_states(abbreviations, verbose, jobs=jobs or None)
+
+    if watch:
+        if len(abbreviations) != 1:
+            raise click.UsageError('--watch needs exactly one state')
+        try:
+            watch_state(abbreviations[0], verbose, summary, settings, jobs=jobs or None,
+                        compact=compact, cache=cache)
+        except KeyboardInterrupt:
+            return
+
+    if profile_path:
+        # every file is validated in this process so that all of it gets measured
+        profiler = Profiler()
+        with profiler:
+            for abbr in abbreviations:
+                click.secho('==== {} ===='.format(abbr), bold=True)
+                start = time.perf_counter()
+                error_count += process_dir(abbr, verbose, summary, settings, jobs=jobs or None,
+                                           compact=compact)
+                profiler.add('states', abbr, time.perf_counter() - start)
+        profiler.print_report()
+        with open(profile_path, 'w') as f:
+            json.dump(profiler.to_json(), f, indent=2)
+    elif len(abbreviations) > 1 and jobs != 1:
+        # each worker lints whole states
+        error_count = lint_states(abbreviations, verbose, summary, settings, jobs=jobs or None,
+                                  compact=compact, cache=cache)
+    else:
+        for abbr in abbreviations:
+            click.secho('==== {} ===='.format(abbr), bold=True)
+            # a single state can still have its files parsed in parallel
+            error_count += process_dir(abbr, verbose, summary, settings, jobs=jobs or None,
+                                       compact=compact, cache=cache)
+
+    if nationwide:
+        click.secho('==== nationwide ====', bold=True)
+        for err in check_nationwide(abbreviations, jobs=jobs or None):
+            click.secho(err, fg='red')
+            error_count += 1
 
     if error_count:
         click.secho(f'exiting with {error_count} errors', fg='red')
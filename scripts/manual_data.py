@@ -2,60 +2,80 @@
 
 import click
 import csv
-import glob
-import os
-from utils import (iter_objects, role_is_active, get_all_abbreviations,
-                   load_yaml, dump_obj, get_data_dir)
+from utils import (iter_objects_parallel, role_is_active, get_all_abbreviations,
+                   scan_metadata, FileTransaction, DataRepository)
 
 
-def generate_template_csv(abbreviations, filename, missing_id=None):
+def generate_template_csv(abbreviations, filename, missing_id=None, jobs=1):
     fields = ('id', 'name', 'chamber', 'district', 'jurisdiction')
 
     with open(filename, 'w') as outfile:
         out = csv.DictWriter(outfile, fields)
         out.writeheader()
 
-        for abbr in abbreviations:
-            for person, filename in iter_objects(abbr, 'people'):
-                skip = False
-
-                if missing_id:
-                    for oid in person.get('other_identifiers', []):
-                        if oid['scheme'] == missing_id:
-                            skip = True
-                            break
-
-                if not skip:
-                    for role in person['roles']:
-                        if role_is_active(role):
-                            break
-                    else:
-                        raise Exception()
-                    out.writerow({
-                        'id': person['id'],
-                        'name': person['name'],
-                        'chamber': role['type'],
-                        'district': role['district'],
-                        'jurisdiction': role['jurisdiction'],
-                    })
-
-
-def find_by_id(id):
-    id = id.split('/')[1]
-    choices = glob.glob(
-        os.path.join(get_data_dir('*'), 'people', f'*-{id}.yml')
-    ) + glob.glob(os.path.join(get_data_dir("*"), "retired", f"*-{id}.yml"))
-    if len(choices) != 1:
+        # only other_identifiers is needed beyond id, name & roles, so don't parse everything
+        for person, filename in iter_objects_parallel(abbreviations, ('people',), jobs=jobs,
+                                                      lazy=True):
+            skip = False
+
+            if missing_id:
+                for oid in person.get('other_identifiers', []):
+                    if oid['scheme'] == missing_id:
+                        skip = True
+                        break
+
+            if not skip:
+                for role in person['roles']:
+                    if role_is_active(role):
+                        break
+                else:
+                    raise Exception()
+                out.writerow({
+                    'id': person['id'],
+                    'name': person['name'],
+                    'chamber': role['type'],
+                    'district': role['district'],
+                    'jurisdiction': role['jurisdiction'],
+                })
+
+
+def get_id_index(objtypes=('people', 'retired')):
+    """ map of id -> filename, built from filenames alone """
+    index = {}
+    for meta in scan_metadata(objtypes=objtypes):
+        if meta.id is None:
+            click.secho(f'{meta.filename} is not named NAME-UUID.yml, skipping', fg='red')
+        elif index.setdefault(meta.id, meta.filename) != meta.filename:
+            raise ValueError(f'{meta.id} in both {index[meta.id]} and {meta.filename}')
+    return index
+
+
+def find_by_id(id, index, repo):
+    """ returns the DataEntry for id, checking the file it is named after really has that id """
+    if id not in index:
         raise ValueError(f'unknown id {id}')
-    return choices[0]
+    filename = index[id]
+    if id not in repo or repo.get(id).filename != filename:
+        raise ValueError(f'{filename} is named after {id} but has another id')
+    return repo.get(id)
 
 
-def update_from_csv(filename, fields, other_identifiers):
+def update_from_csv(filename, fields, other_identifiers, jobs=1):
+    index = get_id_index()
     with open(filename) as f:
-        for line in csv.DictReader(f):
-            yaml_filename = find_by_id(line['id'])
-            with open(yaml_filename) as yf:
-                person = load_yaml(yf)
+        lines = list(csv.DictReader(f))
+    # only the files the CSV refers to are parsed
+    repo = DataRepository(filenames=sorted({index[line['id']] for line in lines
+                                            if line['id'] in index}), jobs=jobs)
+    if repo.duplicates:
+        raise ValueError('; '.join(f'{id} in {", ".join(filenames)}'
+                                   for id, filenames in repo.duplicates.items()))
+
+    updated = 0
+    with FileTransaction() as txn:
+        for line in lines:
+            entry = find_by_id(line['id'], index, repo)
+            person = entry.obj
 
             for field in fields:
                 person[field] = line[field]
@@ -68,7 +88,9 @@ def update_from_csv(filename, fields, other_identifiers):
                     if id:
                         person['other_identifiers'].append({'scheme': scheme,
                                                             'identifier': id})
-            dump_obj(person, filename=yaml_filename)
+            if txn.write(person, entry.filename):
+                updated += 1
+    click.secho(f'updated {updated} files', fg='green')
 
 
 @click.command()
@@ -77,20 +99,25 @@ def update_from_csv(filename, fields, other_identifiers):
 @click.option('--filename')
 @click.option('--fields', multiple=True)
 @click.option('--other-identifiers', multiple=True)
-def manual_data(abbreviations, missing_id, filename, fields, other_identifiers):
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to parse files with (0 for one per CPU).')
+def manual_data(abbreviations, missing_id, filename, fields, other_identifiers, jobs):
     """
         Import & Export Manual Data CSV Files
     """
+    if FileTransaction.recover():
+        click.secho('rolled back an interrupted batch of file changes', fg='yellow')
     if not abbreviations:
         abbreviations = get_all_abbreviations()
 
     if missing_id:
         click.secho(f'generating {filename} with all legislators missing {missing_id}')
-        generate_template_csv(abbreviations, filename, missing_id=missing_id)
+        generate_template_csv(abbreviations, filename, missing_id=missing_id,
+                              jobs=jobs or None)
 
     if fields or other_identifiers:
         click.secho(f'loading {fields} and other_ids{other_identifiers} from {filename}')
-        update_from_csv(filename, fields, other_identifiers)
+        update_from_csv(filename, fields, other_identifiers, jobs=jobs or None)
 
 
 if __name__ == '__main__':
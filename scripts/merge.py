@@ -3,7 +3,8 @@
 import os
 import glob
 import click
-from utils import get_filename, get_data_dir, load_yaml, dump_obj
+from utils import get_filename, get_data_dir, load_yaml_file, load_yaml_files, dump_obj
+from records import to_record, to_dict
 
 
 class ListDifference:
@@ -161,7 +162,7 @@ def directory_merge(abbr, existing_people, new_people, remove_identical, copy_ne
                     keep_on_conflict = 'new'
                 elif ch == 's':
                     continue
-                merged = merge_people(old, new, keep_both_ids=False,
+                merged = merge_people(to_dict(old), to_dict(new), keep_both_ids=False,
                                       keep_on_conflict=keep_on_conflict)
                 dump_obj(merged, filename=oldfname)
                 os.remove(newfname)
@@ -232,6 +233,10 @@ def merge_people(old, new, keep_on_conflict=None, keep_both_ids=False, custom_me
               help='In incoming mode, copy brand new files over.')
 @click.option('--interactive/--no-interactive', default=False,
               help='Do interactive merges.')
+@click.option('-j', '--jobs', default=1,
+              help='In incoming mode, processes to parse files with (0 for one per CPU).')
+@click.option('--compact/--no-compact', default=False,
+              help='In incoming mode, hold people as compact records to reduce memory use.')
 @click.option('--old', default=None,
               help='Operate in merge mode, this is the older of two files & will be kept.')
 @click.option('--new', default=None,
@@ -245,7 +250,8 @@ new
     Keep data in new file if there's conflict.
 
 When omitted, conflicts will raise error.''')
-def entrypoint(incoming, old, new, keep, remove_identical, copy_new, interactive):
+def entrypoint(incoming, old, new, keep, remove_identical, copy_new, interactive, jobs,
+               compact):
     """
         Script to assist with merging legislator files.
 
@@ -258,17 +264,18 @@ def entrypoint(incoming, old, new, keep, remove_identical, copy_new, interactive
     """
     if incoming:
         abbr = incoming
-        existing_people = []
-        for filename in (glob.glob(os.path.join(get_data_dir(abbr), 'people/*.yml')) +
-                         glob.glob(os.path.join(get_data_dir(abbr), 'retired/*.yml'))):
-            with open(filename) as f:
-                existing_people.append(load_yaml(f))
+        jobs = jobs or None
+        convert = to_record if compact else to_dict
+        existing_people = [convert(obj) for obj, _ in load_yaml_files(
+            glob.glob(os.path.join(get_data_dir(abbr), 'people/*.yml')) +
+            glob.glob(os.path.join(get_data_dir(abbr), 'retired/*.yml')),
+            jobs=jobs
+        )]
 
-        new_people = []
         incoming_dir = get_data_dir(abbr).replace('data', 'incoming')
-        for filename in glob.glob(os.path.join(incoming_dir, 'people/*.yml')):
-            with open(filename) as f:
-                new_people.append(load_yaml(f))
+        new_people = [convert(obj) for obj, _ in load_yaml_files(
+            glob.glob(os.path.join(incoming_dir, 'people/*.yml')), jobs=jobs
+        )]
 
         click.secho(
             f'analyzing {len(existing_people)} existing people and {len(new_people)} incoming'
@@ -277,10 +284,8 @@ def entrypoint(incoming, old, new, keep, remove_identical, copy_new, interactive
         directory_merge(abbr, existing_people, new_people, remove_identical, copy_new, interactive)
 
     if old and new:
-        with open(old) as f:
-            old_obj = load_yaml(f)
-        with open(new) as f:
-            new_obj = load_yaml(f)
+        old_obj = load_yaml_file(old)
+        new_obj = load_yaml_file(new)
         if keep not in ('old', 'new'):
             raise ValueError('--keep parameter must be old or new')
         keep_both_ids = True
@@ -0,0 +1,193 @@
+"""
+Compact, read-only record types for people & organizations.
+
+Records hold the same data as the OrderedDicts load_yaml returns, but keep known fields in
+__slots__ and intern every string, so the jurisdiction ids, party names, contact notes and
+key orders repeated across thousands of files are only stored once.
+
+Records implement the Mapping interface, so code that only reads objects (linting, merge
+comparisons, indexing) can use them unchanged; to_dict() converts back losslessly for
+anything that needs to edit or dump them.
+"""
+import sys
+from collections import OrderedDict
+from collections.abc import Mapping
+from utils import OrderedDumper
+
+# key order tuple -> the same tuple, so records with the same key order share one tuple
+_key_orders = {}
+
+
+def intern_key_order(keys):
+    keys = tuple(sys.intern(k) for k in keys)
+    return _key_orders.setdefault(keys, keys)
+
+
+def freeze(value):
+    """ intern all strings within a plain value (anything that isn't a known record) """
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, list):
+        return [freeze(v) for v in value]
+    elif isinstance(value, dict):
+        frozen = type(value)() if isinstance(value, OrderedDict) else {}
+        for k, v in value.items():
+            frozen[freeze(k)] = freeze(v)
+        return frozen
+    return value
+
+
+def thaw(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    elif isinstance(value, list):
+        return [thaw(v) for v in value]
+    elif isinstance(value, dict):
+        thawed = type(value)()
+        for k, v in value.items():
+            thawed[k] = thaw(v)
+        return thawed
+    return value
+
+
+class Record(Mapping):
+    """
+    base class, subclasses list their known keys in __slots__ and map keys holding lists
+    of sub-objects to the record type for those objects in CHILDREN
+    """
+    __slots__ = ('_keys', '_other', '_is_ordered')
+    CHILDREN = {}
+
+    def __init__(self, data):
+        self._keys = intern_key_order(data.keys())
+        self._is_ordered = isinstance(data, OrderedDict)
+        self._other = None
+        fields = self.field_set()
+        for key, value in data.items():
+            child_cls = self.CHILDREN.get(key)
+            if child_cls and isinstance(value, list):
+                value = [child_cls(v) if isinstance(v, dict) else freeze(v) for v in value]
+            else:
+                value = freeze(value)
+            if key in fields:
+                setattr(self, key, value)
+            else:
+                # keys outside the schema still have to survive a round trip
+                if self._other is None:
+                    self._other = {}
+                self._other[sys.intern(key)] = value
+
+    @classmethod
+    def field_set(cls):
+        if '_fields' not in cls.__dict__:
+            cls._fields = frozenset(cls.__slots__)
+        return cls._fields
+
+    def __getitem__(self, key):
+        if key in self.field_set():
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._other is not None and key in self._other:
+            return self._other[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __repr__(self):
+        # look just like the dict this stands in for, e.g. in merge.py's difference output
+        return repr(self.to_dict())
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.all_slots() if hasattr(self, k)}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def all_slots(cls):
+        return [slot for klass in cls.__mro__ for slot in getattr(klass, '__slots__', ())]
+
+    def to_dict(self):
+        result = OrderedDict() if self._is_ordered else {}
+        for key in self._keys:
+            result[key] = thaw(self[key])
+        return result
+
+
+class Link(Record):
+    __slots__ = ('url', 'note')
+
+
+class ContactDetail(Record):
+    __slots__ = ('note', 'address', 'email', 'voice', 'fax')
+
+
+class Party(Record):
+    __slots__ = ('name', 'start_date', 'end_date')
+
+
+class Role(Record):
+    __slots__ = ('type', 'district', 'jurisdiction', 'start_date', 'end_date', 'end_reason',
+                 'contact_details')
+    CHILDREN = {'contact_details': ContactDetail}
+
+
+class Membership(Record):
+    __slots__ = ('id', 'name', 'role', 'start_date', 'end_date')
+
+
+class Person(Record):
+    __slots__ = ('id', 'name', 'sort_name', 'given_name', 'family_name', 'gender', 'summary',
+                 'biography', 'birth_date', 'death_date', 'image', 'contact_details', 'links',
+                 'ids', 'other_identifiers', 'other_names', 'sources', 'party', 'roles',
+                 'extras')
+    CHILDREN = {
+        'contact_details': ContactDetail,
+        'links': Link,
+        'sources': Link,
+        'party': Party,
+        'roles': Role,
+    }
+
+
+class Organization(Record):
+    __slots__ = ('id', 'name', 'jurisdiction', 'parent', 'classification', 'founding_date',
+                 'dissolution_date', 'memberships', 'sources', 'links')
+    CHILDREN = {
+        'memberships': Membership,
+        'links': Link,
+        'sources': Link,
+    }
+
+
+def to_record(obj):
+    """ Person or Organization record for a loaded object, based on its id """
+    if str(obj.get('id', '')).startswith('ocd-organization/'):
+        return Organization(obj)
+    return Person(obj)
+
+
+def to_dict(obj):
+    """ the dict form of obj, whether it is a record or already a dict """
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    return obj
+
+
+def represent_record(dumper, record):
+    if record._is_ordered:
+        return dumper.represent_mapping('tag:yaml.org,2002:map', record.items())
+    return dumper.represent_dict(dict(record.items()))
+
+
+OrderedDumper.add_multi_representer(Record, represent_record)
@@ -2,7 +2,7 @@
 import os
 import glob
 import click
-from utils import load_yaml, dump_obj, role_is_active
+from utils import role_is_active, FileTransaction
 
 
 def retire_from_committee(committee, person_id, end_date):
@@ -29,33 +29,39 @@ def retire_person(person, end_date, reason=None, death=False):
     return person, num
 
 
-def move_file(filename):        # pragma: no cover
+def move_file(filename, txn):
     new_filename = filename.replace('/people/', '/retired/')
     click.secho(f'moved from {filename} to {new_filename}')
-    os.renames(filename, new_filename)
+    txn.move(filename, new_filename)
 
 
-def retire(end_date, filename, reason, death):
+def retire(end_date, filename, reason, death, txn=None):
     """
     Retire a legislator, given END_DATE and FILENAME.
 
     Will set end_date on active roles & committee memberships.
+
+    All changes are made through txn, if none is given they're committed together at the end.
     """
+    if txn is None:
+        with FileTransaction() as txn:
+            return retire(end_date, filename, reason, death, txn)
+
     # end the person's active roles & re-save
-    with open(filename) as f:
-        person = load_yaml(f)
+    person = txn.load(filename)
     if death:
         reason = "Deceased"
     person, num = retire_person(person, end_date, reason, death)
-    dump_obj(person, filename=filename)
+    txn.write(person, filename)
 
     # same for their committees
     committee_glob = os.path.join(os.path.dirname(filename), '../organizations/*.yml')
+    committees_updated = 0
     for com_filename in glob.glob(committee_glob):
-        with open(com_filename) as f:
-            committee = load_yaml(f)
+        committee = txn.load(com_filename)
         committee, num_roles = retire_from_committee(committee, person['id'], end_date)
-        dump_obj(committee, filename=com_filename)
+        if txn.write(committee, com_filename):
+            committees_updated += 1
         num += num_roles
 
     if num == 0:
@@ -64,8 +70,10 @@ def retire(end_date, filename, reason, death):
         click.secho(f'retired person')
     else:
         click.secho(f'retired person from {num} roles')
+    if committees_updated:
+        click.secho(f'updated {committees_updated} committee files')
 
-    move_file(filename)
+    move_file(filename, txn)
 
 @click.command()
 @click.argument('end_date')
@@ -73,6 +81,8 @@ def retire(end_date, filename, reason, death):
 @click.option('--reason', default=None)
 @click.option('--death', is_flag=True)
 def entrypoint(end_date, filename, reason, death):
+    if FileTransaction.recover():
+        click.secho('rolled back an interrupted batch of file changes', fg='yellow')
     return retire(end_date, filename, reason, death)
 
 if __name__ == '__main__':
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+import os
+import mmap
+import struct
+import pickle
+import hashlib
+import click
+from utils import (load_yaml_files, write_if_changed, dump_yaml, get_default_data_dir,
+                   scan_data_dir)
+
+# file layout:
+#   header: MAGIC, version, object count, offset of the index, sha1 of the source tree
+#   records: pickled (path, obj) for each object
+#   index: one fixed-width (id, offset, length) entry per object, sorted by id
+MAGIC = b'PEOPLESNAP'
+VERSION = 1
+HEADER = struct.Struct(f'>{len(MAGIC)}sIIQ20s')
+INDEX_ENTRY = struct.Struct('>64sQI')
+
+
+def get_default_snapshot_path():
+    return os.path.join(os.path.dirname(__file__), '../data.snapshot')
+
+
+def get_source_digest(data_dir):
+    """ sha1 over the path & content of every file in data_dir, returns (digest, paths) """
+    paths = sorted(scan_data_dir(data_dir))
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(os.path.join(data_dir, path), 'rb') as f:
+            content = f.read()
+        digest.update(path.encode('utf8') + b'\0' + hashlib.sha1(content).digest())
+    return digest.digest(), paths
+
+
+def build_snapshot(path=None, data_dir=None, jobs=1):
+    """ pack every object in data_dir into the snapshot at path, returns (count, written) """
+    path = path or get_default_snapshot_path()
+    data_dir = data_dir or get_default_data_dir()
+    digest, paths = get_source_digest(data_dir)
+
+    records = []
+    index = []
+    offset = HEADER.size
+    filenames = [os.path.join(data_dir, p) for p in paths]
+    for (obj, _), rel_path in zip(load_yaml_files(filenames, jobs=jobs), paths):
+        record = pickle.dumps((rel_path, obj), protocol=pickle.HIGHEST_PROTOCOL)
+        key = obj['id'].encode('utf8')
+        if len(key) > INDEX_ENTRY.size - 12:
+            raise ValueError(f'id {obj["id"]} is too long to index')
+        index.append((key, offset, len(record)))
+        records.append(record)
+        offset += len(record)
+
+    index.sort()
+    for prev, cur in zip(index, index[1:]):
+        if prev[0] == cur[0]:
+            raise ValueError(f'duplicate id {cur[0].decode()}')
+
+    content = b''.join([HEADER.pack(MAGIC, VERSION, len(index), offset, digest), *records,
+                        *(INDEX_ENTRY.pack(*entry) for entry in index)])
+    return len(index), write_if_changed(path, content)
+
+
+class Snapshot:
+    """
+    read-only random access to a snapshot built by build_snapshot
+
+    the file is mmap-ed, so opening it is cheap, its pages are shared between processes and
+    only the objects that are looked up are ever decoded
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_default_snapshot_path()
+        with open(self.path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.count, self.index_offset, self.digest = \
+                HEADER.unpack_from(self.mmap)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a version {VERSION} snapshot, rebuild it')
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        key, offset, length = INDEX_ENTRY.unpack_from(
+            self.mmap, self.index_offset + i * INDEX_ENTRY.size)
+        return key.rstrip(b'\0'), offset, length
+
+    def _find(self, id):
+        key = id.encode('utf8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            entry = self._entry(lo)
+            if entry[0] == key:
+                return entry
+        return None
+
+    def _decode(self, offset, length):
+        return pickle.loads(self.mmap[offset:offset + length])
+
+    def __contains__(self, id):
+        return self._find(id) is not None
+
+    def get_entry(self, id):
+        """ (path relative to data/, obj) for id, or None """
+        entry = self._find(id)
+        return self._decode(*entry[1:]) if entry else None
+
+    def get(self, id):
+        entry = self.get_entry(id)
+        return entry[1] if entry else None
+
+    def ids(self):
+        for i in range(self.count):
+            yield self._entry(i)[0].decode('utf8')
+
+    def __iter__(self):
+        """ yield (path, obj) for every object, in id order """
+        for i in range(self.count):
+            yield self._decode(*self._entry(i)[1:])
+
+
+def check_snapshot(path=None, data_dir=None, full=False):
+    """
+    compare the snapshot at path to data_dir, returns a list of problems (empty if up to date)
+
+    by default only the digest of the source files is compared, with full=True every object
+    is also decoded and compared to its YAML
+    """
+    data_dir = data_dir or get_default_data_dir()
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError) as e:
+        return [str(e)]
+
+    with snapshot:
+        digest, paths = get_source_digest(data_dir)
+        if digest != snapshot.digest:
+            return [f'{snapshot.path} is out of date with {data_dir}']
+        if not full:
+            return []
+
+        problems = []
+        by_path = {p: obj for p, obj in snapshot}
+        filenames = [os.path.join(data_dir, p) for p in paths]
+        for (obj, _), rel_path in zip(load_yaml_files(filenames), paths):
+            if by_path.pop(rel_path, None) != obj:
+                problems.append(f'{rel_path} differs from snapshot')
+        problems.extend(f'{p} only in snapshot' for p in sorted(by_path))
+        return problems
+
+
+@click.command()
+@click.option('--check', is_flag=True,
+              help='Check the snapshot is up to date instead of building it.')
+@click.option('--full', is_flag=True, help='With --check, compare every object to its YAML.')
+@click.option('--id', 'id_', default=None, help='Print the object with this id from the snapshot.')
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to parse files with (0 for one per CPU).')
+def snapshot(check, full, id_, jobs):
+    """
+        Build a single-file, memory-mapped snapshot of data/ for fast random access.
+    """
+    if id_:
+        try:
+            snap = Snapshot()
+        except (OSError, ValueError) as e:
+            click.secho(str(e), fg='red')
+            raise SystemExit(1)
+        with snap:
+            entry = snap.get_entry(id_)
+        if not entry:
+            click.secho(f'{id_} not in snapshot', fg='red')
+            raise SystemExit(1)
+        click.secho(entry[0], fg='yellow')
+        click.echo(dump_yaml(entry[1]), nl=False)
+    elif check:
+        problems = check_snapshot(full=full)
+        for problem in problems:
+            click.secho(problem, fg='red')
+        if problems:
+            raise SystemExit(1)
+        click.secho('snapshot is up to date', fg='green')
+    else:
+        try:
+            count, written = build_snapshot(jobs=jobs or None)
+        except ValueError as e:
+            click.secho(str(e), fg='red')
+            raise SystemExit(1)
+        if written:
+            click.secho(f'wrote {count} objects to snapshot', fg='green')
+        else:
+            click.secho(f'snapshot of {count} objects already up to date', fg='yellow')
+
+
+if __name__ == '__main__':
+    snapshot()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+import os
+import sqlite3
+import datetime
+import click
+from utils import (get_file_stamp, get_jurisdiction_id, load_yaml_files, normalize_name,
+                   get_default_data_dir, scan_data_dir)
+
+# bump this whenever the tables change, an index with another version is rebuilt from scratch
+SCHEMA_VERSION = 3
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha1 TEXT);
+CREATE TABLE objects (
+    path TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    abbr TEXT NOT NULL,
+    objtype TEXT NOT NULL,
+    name TEXT NOT NULL,
+    normalized_name TEXT NOT NULL
+);
+CREATE TABLE roles (
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    jurisdiction TEXT,
+    chamber TEXT,
+    district TEXT,
+    end_date TEXT
+);
+CREATE TABLE parties (path TEXT NOT NULL, position INTEGER NOT NULL, name TEXT, end_date TEXT);
+CREATE TABLE identifiers (scheme TEXT, identifier TEXT, path TEXT);
+CREATE INDEX objects_id ON objects (id);
+CREATE INDEX objects_name ON objects (normalized_name);
+CREATE INDEX roles_path ON roles (path);
+CREATE INDEX roles_seat ON roles (jurisdiction, chamber, district);
+CREATE INDEX parties_path ON parties (path);
+CREATE INDEX identifiers_value ON identifiers (scheme, identifier);
+CREATE INDEX identifiers_path ON identifiers (path);
+'''
+
+# roles & parties are stored with their end dates and the active ones are picked when queried,
+# so a role that ends after its file was indexed stops being active without a re-parse.
+# as in role_is_active, the first role without an end_date or ending after today is the active
+# one, today() is the date the query runs on
+ACTIVE = 'end_date IS NULL OR end_date > today()'
+SELECT_OBJECTS = f'''
+SELECT objects.*, seat.jurisdiction, seat.chamber, seat.district,
+    (SELECT name FROM parties WHERE parties.path=objects.path AND ({ACTIVE})
+     ORDER BY position LIMIT 1) AS party
+FROM objects LEFT JOIN roles AS seat ON seat.path=objects.path AND seat.position=(
+    SELECT MIN(position) FROM roles WHERE roles.path=objects.path AND ({ACTIVE}))
+'''
+
+
+def today():
+    return datetime.datetime.utcnow().date().isoformat()
+
+
+def get_default_index_path():
+    return os.path.join(os.path.dirname(__file__), '../data.sqlite3')
+
+
+def get_end_date(role):
+    end_date = role.get('end_date')
+    return None if end_date is None else str(end_date)
+
+
+def get_object_row(obj, path):
+    abbr, objtype, _ = path.split('/')
+    return (path, obj['id'], abbr, objtype, obj['name'], normalize_name(obj['name']))
+
+
+def get_role_rows(obj, path):
+    return [(path, position, role.get('jurisdiction'), role.get('type'), role.get('district'),
+             get_end_date(role)) for position, role in enumerate(obj.get('roles', []))]
+
+
+def get_party_rows(obj, path):
+    return [(path, position, role.get('name'), get_end_date(role))
+            for position, role in enumerate(obj.get('party', []))]
+
+
+def get_identifier_rows(obj, path):
+    rows = [(scheme, value, path) for scheme, value in obj.get('ids', {}).items()]
+    rows += [(oid['scheme'], oid['identifier'], path)
+             for oid in obj.get('other_identifiers', [])]
+    return rows
+
+
+class SQLiteIndex:
+    """
+    on-disk index of the data tree: id -> filename, name, state, active seat, party & identifiers
+
+    the active seat & party are worked out from the stored role dates when queried, so they
+    follow the calendar without the files being re-parsed
+
+    the index is refreshed incrementally on open: only files whose mtime or size changed
+    are hashed, and only files whose content actually changed are re-parsed
+
+    objects are keyed by path, so two files with the same id are both kept and reported by
+    find_duplicate_ids rather than one silently replacing the other
+    """
+
+    def __init__(self, path=None, data_dir=None, refresh=True, jobs=1):
+        self.path = path or get_default_index_path()
+        self.data_dir = data_dir or get_default_data_dir()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function('today', 0, lambda: today())
+        self.ensure_schema()
+        if refresh:
+            self.refresh(jobs=jobs)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def ensure_schema(self):
+        try:
+            version = self.conn.execute(
+                "SELECT value FROM meta WHERE key='schema_version'").fetchone()[0]
+        except (sqlite3.DatabaseError, TypeError):
+            version = None
+        if version != str(SCHEMA_VERSION):
+            self.rebuild_schema()
+
+    def rebuild_schema(self):
+        with self.conn:
+            for table in ('meta', 'files', 'objects', 'roles', 'parties', 'identifiers'):
+                self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT INTO meta VALUES ('schema_version', ?)",
+                              (str(SCHEMA_VERSION),))
+
+    def remove_path(self, path):
+        self.conn.execute('DELETE FROM identifiers WHERE path=?', (path,))
+        self.conn.execute('DELETE FROM roles WHERE path=?', (path,))
+        self.conn.execute('DELETE FROM parties WHERE path=?', (path,))
+        self.conn.execute('DELETE FROM objects WHERE path=?', (path,))
+        self.conn.execute('DELETE FROM files WHERE path=?', (path,))
+
+    def refresh(self, jobs=1):
+        """ bring the index up to date with data_dir, returns (changed, removed) counts """
+        on_disk = scan_data_dir(self.data_dir)
+        indexed = {row['path']: row for row in self.conn.execute('SELECT * FROM files')}
+
+        to_parse = {}
+        touched = []
+        for path, (mtime_ns, size) in on_disk.items():
+            row = indexed.get(path)
+            if row and (row['mtime_ns'], row['size']) == (mtime_ns, size):
+                continue
+            with open(os.path.join(self.data_dir, path), 'rb') as f:
+                stamp = get_file_stamp(f.name, f.read())
+            if row and row['sha1'] == stamp[2]:
+                # touched but not modified, just remember the new mtime
+                touched.append((stamp[0], stamp[1], path))
+            else:
+                to_parse[path] = stamp
+        removed = indexed.keys() - on_disk.keys()
+
+        with self.conn:
+            self.conn.executemany('UPDATE files SET mtime_ns=?, size=? WHERE path=?', touched)
+            for path in removed:
+                self.remove_path(path)
+            filenames = [os.path.join(self.data_dir, path) for path in sorted(to_parse)]
+            for obj, filename in load_yaml_files(filenames, jobs=jobs):
+                path = os.path.relpath(filename, self.data_dir).replace(os.sep, '/')
+                self.remove_path(path)
+                self.conn.execute('INSERT INTO objects VALUES (?,?,?,?,?,?)',
+                                  get_object_row(obj, path))
+                self.conn.executemany('INSERT INTO roles VALUES (?,?,?,?,?,?)',
+                                      get_role_rows(obj, path))
+                self.conn.executemany('INSERT INTO parties VALUES (?,?,?,?)',
+                                      get_party_rows(obj, path))
+                self.conn.executemany('INSERT INTO identifiers VALUES (?,?,?)',
+                                      get_identifier_rows(obj, path))
+                self.conn.execute('INSERT INTO files VALUES (?,?,?,?)', (path, *to_parse[path]))
+
+        return len(to_parse), len(removed)
+
+    def get_filename(self, path):
+        return os.path.normpath(os.path.join(self.data_dir, path))
+
+    def lookup_id(self, id):
+        """ the object with id, the first by path if more than one file has it """
+        return self.conn.execute(SELECT_OBJECTS + 'WHERE objects.id=? ORDER BY objects.path',
+                                 (id,)).fetchone()
+
+    def find_duplicate_ids(self):
+        """ map of id -> paths for every id that is in more than one file """
+        duplicates = {}
+        for row in self.conn.execute(
+                'SELECT id, path FROM objects WHERE id IN '
+                '(SELECT id FROM objects GROUP BY id HAVING COUNT(*) > 1) ORDER BY id, path'):
+            duplicates.setdefault(row['id'], []).append(row['path'])
+        return duplicates
+
+    def find_by_name(self, name):
+        return self.conn.execute(
+            SELECT_OBJECTS + 'WHERE objects.normalized_name=? ORDER BY objects.path',
+            (normalize_name(name),)
+        ).fetchall()
+
+    def find_by_seat(self, jurisdiction, chamber, district):
+        if not jurisdiction.startswith('ocd-jurisdiction/'):
+            jurisdiction = get_jurisdiction_id(jurisdiction)
+        return self.conn.execute(
+            SELECT_OBJECTS + 'WHERE seat.jurisdiction=? AND seat.chamber=? AND seat.district=? '
+            'ORDER BY objects.path', (jurisdiction, chamber, str(district))
+        ).fetchall()
+
+    def find_by_identifier(self, scheme, identifier):
+        return self.conn.execute(
+            SELECT_OBJECTS + 'JOIN identifiers ON identifiers.path=objects.path '
+            'WHERE scheme=? AND identifier=? ORDER BY objects.path', (scheme, identifier)
+        ).fetchall()
+
+
+def echo_rows(index, rows):
+    if not rows:
+        click.secho('no matches', fg='red')
+    for row in rows:
+        seat = f" {row['chamber']} {row['district']}" if row['chamber'] else ''
+        click.echo(f"{row['id']} {row['name']} ({row['abbr']} {row['objtype']}{seat}) "
+                   f"{index.get_filename(row['path'])}")
+
+
+@click.command()
+@click.option('--id', 'id_', default=None, help='Look up an ocd-person or ocd-organization id.')
+@click.option('--name', default=None, help='Look up people & organizations by name.')
+@click.option('--seat', nargs=3, default=None, help='Look up holders of ABBR CHAMBER DISTRICT.')
+@click.option('--identifier', nargs=2, default=None, help='Look up SCHEME IDENTIFIER.')
+@click.option('--rebuild', is_flag=True, help='Discard the index and rebuild it.')
+@click.option('-j', '--jobs', default=1,
+              help='Number of processes to parse changed files with (0 for one per CPU).')
+def sqlite_index(id_, name, seat, identifier, rebuild, jobs):
+    """
+        Query the SQLite index of data/, updating it first if any files changed.
+    """
+    with SQLiteIndex(refresh=False) as index:
+        if rebuild:
+            index.rebuild_schema()
+        changed, removed = index.refresh(jobs=jobs or None)
+        if changed or removed:
+            click.secho(f'indexed {changed} changed files, removed {removed}', fg='yellow')
+        for dup_id, paths in index.find_duplicate_ids().items():
+            click.secho(f'duplicate id {dup_id} in {", ".join(paths)}', fg='red')
+
+        if id_:
+            row = index.lookup_id(id_)
+            echo_rows(index, [row] if row else [])
+        if name:
+            echo_rows(index, index.find_by_name(name))
+        if seat:
+            echo_rows(index, index.find_by_seat(*seat))
+        if identifier:
+            echo_rows(index, index.find_by_identifier(*identifier))
+
+
+if __name__ == '__main__':
+    sqlite_index()
@@ -7,7 +7,7 @@ import boto3
 from PIL import Image
 from botocore.exceptions import ClientError
 import requests
-from utils import get_all_abbreviations, iter_objects
+from utils import get_all_abbreviations, iter_objects_parallel
 
 
 ALLOWED_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/jpg')
@@ -82,8 +82,8 @@ def resize_image(img_bytes, size):
     return output.read(), 'image/jpeg'
 
 
-def download_state_images(abbr, skip_existing):
-    for person, _ in iter_objects(abbr, 'people'):
+def download_state_images(abbr, skip_existing, jobs=1):
+    for person, _ in iter_objects_parallel([abbr], ('people',), jobs=jobs):
         url = person.get('image')
         person_id = person['id']
         if not url:
@@ -115,7 +115,9 @@ def download_state_images(abbr, skip_existing):
 @click.argument('abbreviations', nargs=-1)
 @click.option('--skip-existing/--no-skip-existing',
               help="Skip processing for files that already exist on S3. (default: true)")
-def sync_images(abbreviations, skip_existing):
+@click.option('-j', '--jobs', default=1,
+              help="Number of processes to parse files with (0 for one per CPU).")
+def sync_images(abbreviations, skip_existing, jobs):
     """
         Download images and sync them to S3.
 
@@ -125,7 +127,7 @@ def sync_images(abbreviations, skip_existing):
         abbreviations = get_all_abbreviations()
 
     for abbr in abbreviations:
-        download_state_images(abbr, skip_existing)
+        download_state_images(abbr, skip_existing, jobs=jobs or None)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,159 @@
+import threading
+import time
+import socketserver
+from collections import Counter
+from urllib.parse import urlsplit
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from check_urls import (check_url, check_urls, HostThrottle, URLCache, interleave_by_host,
+                        collect_urls, dead_by_state, is_dead)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = Counter()
+    lock = threading.Lock()
+
+    def respond(self):
+        with StubHandler.lock:
+            StubHandler.requests[(self.command, self.path)] += 1
+        path = urlsplit(self.path).path
+        if path == '/slow':
+            time.sleep(0.05)
+        if path == '/missing':
+            status = 404
+        elif path == '/no-head' and self.command == 'HEAD':
+            status = 405
+        elif path == '/moved':
+            status = 301
+        else:
+            status = 200
+        self.send_response(status)
+        if status == 301:
+            self.send_header('Location', '/ok')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    StubHandler.requests.clear()
+    httpd = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_check_url(server):
+    assert check_url(server + '/ok') == (200, None)
+    assert check_url(server + '/missing') == (404, None)
+    assert check_url(server + '/moved') == (200, None)
+    # HEAD isn't allowed, GET is
+    assert check_url(server + '/no-head') == (200, None)
+    assert StubHandler.requests[('GET', '/no-head')] == 1
+    assert check_url(server.rsplit(':', 1)[0] + ':1/refused')[0] is None
+    assert is_dead(check_url(server + '/missing'))
+
+
+def test_check_urls_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path))
+    urls = [server + '/ok', server + '/missing']
+
+    results, requested = check_urls(urls, URLCache(60), delay=0)
+    assert requested == 2
+    assert [results[url][0] for url in urls] == [200, 404]
+
+    # fresh results come from the cache on disk
+    results, requested = check_urls(urls, URLCache(60), delay=0)
+    assert requested == 0
+    assert results[urls[1]][0] == 404
+    assert StubHandler.requests[('HEAD', '/ok')] == 1
+
+    # stale ones are checked again
+    results, requested = check_urls(urls, URLCache(0), delay=0)
+    assert requested == 2
+    assert StubHandler.requests[('HEAD', '/ok')] == 2
+
+
+def test_per_host_limit(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    # count requests in flight on the client, inside the throttle's slots
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def counting_check_url(url, timeout=10):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        try:
+            return check_url(url, timeout)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr('check_urls.check_url', counting_check_url)
+    urls = [f'{server}/slow?{n}' for n in range(8)]
+    results, requested = check_urls(urls, URLCache(60), workers=8, per_host=2, delay=0)
+    assert requested == 8
+    assert all(result[0] == 200 for result in results.values())
+    # the slow responses overlap, but never more than two at a time
+    assert in_flight[1] == 2
+
+
+def test_host_throttle_delay():
+    throttle = HostThrottle(per_host=4, delay=0.05)
+    starts = []
+    for _ in range(3):
+        with throttle.slot('example.com'):
+            starts.append(time.monotonic())
+        # other hosts aren't held up
+        with throttle.slot('example.org'):
+            pass
+    assert starts[2] - starts[0] >= 0.099
+
+
+def test_interleave_by_host():
+    urls = ['http://a/1', 'http://a/2', 'http://a/3', 'http://b/1', 'http://c/1', 'http://b/2']
+    assert list(interleave_by_host(urls)) == ['http://a/1', 'http://b/1', 'http://c/1',
+                                              'http://a/2', 'http://b/2', 'http://a/3']
+
+
+def test_dead_by_state(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    monkeypatch.setattr('utils.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    for abbr in ('nc', 'sc'):
+        (tmp_path / abbr / 'people').mkdir(parents=True)
+        (tmp_path / abbr / 'people' / 'a.yml').write_text(
+            f'id: ocd-person/{abbr}\nname: A\nimage: https://{abbr}.gov/a.jpg\n'
+            'links:\n- url: https://dead.example.com\nsources:\n- url: https://ok.example.com\n')
+
+    urls = collect_urls(['nc', 'sc'])
+    assert urls['https://dead.example.com'] == [('nc', 'nc/people/a.yml', 'links'),
+                                                ('sc', 'sc/people/a.yml', 'links')]
+    results = {url: (200, None, 0) for url in urls}
+    results['https://dead.example.com'] = (404, None, 0)
+    results['https://sc.gov/a.jpg'] = (None, 'timed out', 0)
+
+    dead = dead_by_state(urls, results)
+    assert dead['nc'] == [('https://dead.example.com', (404, None, 0),
+                           [('nc/people/a.yml', 'links')])]
+    assert [url for url, _, _ in dead['sc']] == ['https://dead.example.com',
+                                                 'https://sc.gov/a.jpg']
+
+
+def test_connection_errors_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path))
+    url = 'http://127.0.0.1:1/refused'
+    results, requested = check_urls([url], URLCache(60), delay=0)
+    assert results[url][0] is None
+    assert check_urls([url], URLCache(60), delay=0)[1] == 1
@@ -0,0 +1,21 @@
+import os
+from format_yaml import format_file, format_files
+
+
+def test_format_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    canonical = str(tmp_path / 'canonical.yml')
+    messy = str(tmp_path / 'messy.yml')
+    with open(canonical, 'w') as f:
+        f.write("id: 1\nname: Jane\nroles:\n- district: '12'\n  type: lower\n")
+    with open(messy, 'w') as f:
+        f.write('id:    1\nname: "Jane"\nroles:\n  - {district: "12", type: lower}\n')
+    os.utime(canonical, ns=(1, 1))
+
+    assert list(format_files([canonical, messy], check=True)) == [(canonical, False),
+                                                                  (messy, True)]
+    assert format_file(messy) is True
+    assert format_file(messy) is False
+    with open(canonical) as f, open(messy) as g:
+        assert f.read() == g.read()
+    assert os.stat(canonical).st_mtime_ns == 1
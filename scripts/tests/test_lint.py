@@ -1,10 +1,20 @@
+import os
+import glob
+import hashlib
+import sqlite3
 import pytest
 import datetime
+from click.testing import CliRunner
 from lint_yaml import (is_url, is_social, is_fuzzy_date, is_phone,
                        is_ocd_person, is_legacy_openstates, no_bad_comma,
                        validate_obj, PERSON_FIELDS, validate_roles,
                        get_expected_districts, compare_districts, Validator,
-                       BadVacancy) # noqa
+                       BadVacancy, process_dir, lint_states, interpret_obj,
+                       ORGANIZATION_FIELDS, LintCache, lint_skeleton, check_nationwide,
+                       build_identifier_index, watch_state, Profiler, PersonRef, fix_obj,
+                       fix_states, lint_file, iter_cached_objects) # noqa
+import lint_yaml
+from utils import get_settings, load_yaml_files, get_filename
 
 
 def test_is_url():
@@ -388,3 +398,385 @@ def test_validate_org_memberships():
     v.validate_org(org, org_filename)
     assert len(v.warnings[org_filename]) == 1
     assert v.warnings[org_filename]
+
+
+def test_lint_states_matches_serial(capsys):
+    settings = get_settings()
+    serial_errors = 0
+    for abbr in ('ak', 'hi'):
+        print(f'==== {abbr} ====')
+        serial_errors += process_dir(abbr, 0, True, settings)
+    serial = capsys.readouterr().out
+
+    assert lint_states(['ak', 'hi'], 0, True, settings, jobs=2) == serial_errors
+    assert capsys.readouterr().out == serial
+
+
+BROKEN_PERSON = {
+    'id': 'ocd-person/nope',
+    'name': 'Smith, Jane, Jr.',
+    'image': 'example.com/x.jpg',
+    'ids': {'twitter': '@jane', 'myspace': 'jane'},
+    'links': [{'url': 'example.com', 'extra': 1}, {'note': 'no url'}],
+    'roles': [
+        {'type': 'lower', 'jurisdiction': 'ocd-jurisdiction/country:us/state:nc/government',
+         'contact_details': [{'voice': '555', 'fax': '555-555-5555', 'bad': 1}], 'x': 1},
+        {'type': 'gov', 'district': '1'},
+        {'type': 'mayor'},
+    ],
+    'party': [{'start_date': '2020-1-1'}],
+    'extras': [],
+    'unknown': 'value',
+    'unknown_too': 'value',
+}
+
+
+def interpreted(obj, schema):
+    """ interpret_obj, including the nested validate_obj calls made by is_role """
+    lint_yaml.validate_obj = interpret_obj
+    try:
+        return interpret_obj(obj, schema)
+    finally:
+        lint_yaml.validate_obj = validate_obj
+
+
+def test_compiled_schema_matches_interpreter():
+    assert validate_obj(BROKEN_PERSON, PERSON_FIELDS) == interpreted(BROKEN_PERSON,
+                                                                     PERSON_FIELDS)
+    assert validate_obj(BROKEN_PERSON, PERSON_FIELDS, ['a', 'b']) == \
+        interpret_obj(BROKEN_PERSON, PERSON_FIELDS, ['a', 'b'])
+
+
+def test_compiled_schema_matches_interpreter_on_data():
+    data_dir = os.path.join(os.path.dirname(__file__), '../../data')
+    filenames = sorted(glob.glob(os.path.join(data_dir, '*/*/*.yml')))
+    assert filenames
+    for obj, filename in load_yaml_files(filenames):
+        schema = ORGANIZATION_FIELDS if '/organizations/' in filename else PERSON_FIELDS
+        assert validate_obj(obj, schema) == interpreted(obj, schema), filename
+
+
+def test_lint_cache_matches_cold_run(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path))
+    settings = get_settings()
+    errors = process_dir('nc', 1, True, settings)
+    cold = capsys.readouterr().out
+
+    # first run fills the cache, second one is served from it
+    for _ in range(2):
+        assert process_dir('nc', 1, True, settings, cache=True) == errors
+        assert capsys.readouterr().out == cold
+    cache = LintCache('nc')
+    filenames = sorted(glob.glob(os.path.join(os.path.dirname(__file__),
+                                              '../../data/nc/people/*.yml')))
+    assert len(cache) == len(glob.glob(os.path.join(
+        os.path.dirname(__file__), '../../data/nc/*/*.yml')))
+
+    # a changed file is a miss, entries from other versions of the code are ignored
+    key = ('people', os.path.basename(filenames[0]))
+    with open(filenames[0], 'rb') as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    obj, _ = next(load_yaml_files(filenames[:1]))
+    assert cache.has(key, sha1)
+    assert cache.get(key, sha1) == lint_file(obj, 'people')
+    assert cache.get(key, 'changed') is None
+    monkeypatch.setattr('lint_yaml.get_lint_code_hash', lambda: 'other')
+    assert len(LintCache('nc')) == 0
+
+
+def test_lint_cache_drops_gone_files(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    os.makedirs(str(tmp_path / 'xx' / 'people'))
+    open(str(tmp_path / 'xx' / 'people' / 'kept.yml'), 'w').close()
+    cache = LintCache('xx')
+    cache.put(('people', 'kept.yml'), 'a', [], {})
+    cache.put(('people', 'gone.yml'), 'b', [], {})
+    cache.save()
+
+    cache = LintCache('xx')
+    assert len(cache) == 1
+    assert cache.get(('people', 'kept.yml'), 'a') == ([], {})
+
+
+class LockedConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_lint_cache_errors_are_misses(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    os.makedirs(str(tmp_path / 'xx' / 'people'))
+    uuid = '12345678-0000-1111-2222-123456789001'
+    filename = str(tmp_path / 'xx' / 'people' / f'Person-{uuid}.yml')
+    with open(filename, 'w') as f:
+        f.write(f"id: ocd-person/{uuid}\nname: Person 1\n")
+    expected = list(iter_cached_objects('xx', None))
+
+    # filled on the first run, then read back
+    assert list(iter_cached_objects('xx', LintCache('xx'))) == expected
+    cache = LintCache('xx')
+    assert len(cache) == 1
+    assert list(iter_cached_objects('xx', cache)) == expected
+
+    # an entry that is gone by the time it is read is linted again
+    cache = LintCache('xx')
+    monkeypatch.setattr(cache, 'get', lambda key, sha1: None)
+    assert list(iter_cached_objects('xx', cache)) == expected
+
+    # a locked database is a miss
+    cache = LintCache('xx')
+    cache.conn = LockedConnection()
+    assert not cache.has(('people', os.path.basename(filename)), 'sha1')
+    assert cache.get(('people', os.path.basename(filename)), 'sha1') is None
+    assert list(iter_cached_objects('xx', cache)) == expected
+
+
+def test_lint_skeleton():
+    person = {'id': EXAMPLE_OCD_PERSON_ID, 'name': 'Jane', 'biography': 'long',
+              'contact_details': [{'note': 'Office', 'voice': '555-555-5555'}],
+              'extras': {'a': 'b'}, 'roles': []}
+    assert lint_skeleton(person, 'people') == {
+        'id': EXAMPLE_OCD_PERSON_ID, 'name': 'Jane', 'biography': None,
+        'contact_details': [{'note': None, 'voice': None}], 'extras': {'a': None}, 'roles': []
+    }
+    assert list(lint_skeleton(person, 'people')) == list(person)
+
+
+def test_check_nationwide(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    monkeypatch.setattr('utils.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    people = [
+        ('nc', 'people', 'ocd-person/1', 'ids:\n  twitter: same\n'),
+        ('nc', 'retired', 'ocd-person/2', 'ids:\n  twitter: nc-only\n'),
+        ('nc', 'people', 'ocd-person/3', 'ids:\n  twitter: nc-only\n'),
+        ('sc', 'people', 'ocd-person/4', 'ids:\n  twitter: same\n'
+         'other_identifiers:\n- identifier: x\n  scheme: twitter\n'),
+        ('sc', 'retired', 'ocd-person/1', ''),
+    ]
+    for n, (abbr, objtype, id, rest) in enumerate(people):
+        os.makedirs(str(tmp_path / abbr / objtype), exist_ok=True)
+        with open(str(tmp_path / abbr / objtype / f'{n}.yml'), 'w') as f:
+            f.write(f'id: {id}\nname: Person {n}\n{rest}')
+
+    index = build_identifier_index(['nc', 'sc'])
+    assert index[('twitter', 'x')] == 'sc/people/3.yml'
+    assert index[('twitter', 'nc-only')] == ['nc/people/2.yml', 'nc/retired/1.yml']
+    # same-state duplicates are left to the per-state check
+    assert check_nationwide(['nc', 'sc']) == [
+        'duplicate id across states: "ocd-person/1" nc/people/0.yml, sc/retired/4.yml',
+        'duplicate twitter across states: "same" nc/people/0.yml, sc/people/3.yml',
+    ]
+
+
+def test_lint_nationwide_checks_given_states(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    monkeypatch.setattr('utils.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    for n, abbr in enumerate(('ak', 'az', 'co')):
+        os.makedirs(str(tmp_path / abbr / 'people'))
+        with open(str(tmp_path / abbr / 'people' / f'{n}.yml'), 'w') as f:
+            f.write(f'id: ocd-person/{n}\nname: Person {n}\nids:\n  twitter: same\n'
+                    'party: []\nroles: []\n')
+
+    result = CliRunner().invoke(lint_yaml.lint, ['ak', 'az', '--nationwide'])
+    nationwide = result.output.split('==== nationwide ====\n')[1]
+    assert 'duplicate twitter across states: "same" ak/people/0.yml, az/people/1.yml' \
+        in nationwide
+    assert 'co/' not in nationwide
+
+
+class StepWatcher:
+    """ stands in for a Watcher: each wait() makes a change to the files and reports it """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def wait(self):
+        step, changed = self.steps.pop(0)
+        step()
+        return changed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('cache,compact', [(False, False), (True, True)])
+def test_watch_state(tmp_path, monkeypatch, cache, compact):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    os.makedirs(str(tmp_path / 'xx' / 'people'))
+    filenames = []
+    for district in ('1', '2'):
+        uuid = f'12345678-0000-1111-2222-12345678900{district}'
+        filename = str(tmp_path / 'xx' / 'people' / f'Person-{uuid}.yml')
+        with open(filename, 'w') as f:
+            f.write(f"id: ocd-person/{uuid}\nname: Person {district}\nparty:\n- name: Green\n"
+                    f"roles:\n- district: '{district}'\n"
+                    "  jurisdiction: ocd-jurisdiction/country:us/state:xx/government\n"
+                    "  type: lower\n")
+        filenames.append(filename)
+
+    # break one file, delete the other, then fix the first
+    with open(filenames[0]) as f:
+        original = f.read()
+    steps = [(lambda: open(filenames[0], 'a').write('bad: key\n'), {filenames[0]}),
+             (lambda: os.remove(filenames[1]), {filenames[1]}),
+             (lambda: open(filenames[0], 'w').write(original), {filenames[0]})]
+    output = []
+
+    def echo(message=None, **styles):
+        output.append(message)
+
+    errors = watch_state('xx', 0, False, {'xx': {'lower_seats': 2}}, compact=compact,
+                         cache=cache, echo=echo, watcher=StepWatcher(steps), rounds=4)
+    assert errors == 1
+    assert os.path.exists(str(tmp_path / 'cache' / 'lint' / 'xx.sqlite3')) == cache
+    rounds = '\n'.join(output).split('==== xx ====\n')[1:]
+    assert rounds[0].startswith('0 errors, 2 files')
+    assert ' extra key: bad' in rounds[1]
+    assert 'missing legislator for lower 2' in rounds[2]
+    assert ' extra key: bad' in rounds[2]
+    assert rounds[3].startswith('missing legislator for lower 2\n1 errors, 1 files')
+
+
+def test_watch_state_vacancies(tmp_path, monkeypatch):
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    os.makedirs(str(tmp_path / 'xx' / 'people'))
+    uuid = '12345678-0000-1111-2222-123456789001'
+    filename = str(tmp_path / 'xx' / 'people' / f'Person-{uuid}.yml')
+    with open(filename, 'w') as f:
+        f.write(f"id: ocd-person/{uuid}\nname: Person 1\nparty:\n- name: Green\n"
+                "roles:\n- district: '1'\n"
+                "  jurisdiction: ocd-jurisdiction/country:us/state:xx/government\n"
+                "  type: lower\n")
+    settings = {'xx': {'lower_seats': {'1': 1, '2': 1},
+                       'vacancies': [{'chamber': 'lower', 'district': '2',
+                                      'vacant_until': datetime.date(2100, 1, 1)}]}}
+    output = []
+
+    def echo(message=None, **styles):
+        output.append(message)
+
+    # a save that changes nothing must not count the vacancy again
+    steps = [(lambda: None, {filename}), (lambda: None, {filename})]
+    errors = watch_state('xx', 0, False, settings, echo=echo, watcher=StepWatcher(steps),
+                         rounds=3)
+    assert errors == 0
+    assert len([line for line in output if line.startswith('0 errors')]) == 3
+    assert settings['xx']['lower_seats'] == {'1': 1, '2': 1}
+
+
+def test_profiler(capsys):
+    settings = get_settings()
+    process_dir('ak', 0, False, settings)
+    plain = capsys.readouterr().out
+
+    profiler = Profiler()
+    with profiler:
+        assert lint_yaml.validate_obj is not validate_obj
+        process_dir('ak', 0, False, settings)
+    assert capsys.readouterr().out == plain
+    # everything is put back once profiling is over
+    assert lint_yaml.validate_obj is validate_obj
+    assert not hasattr(lint_yaml.role_is_active, '__wrapped__')
+    assert not hasattr(Validator.validate_person, '__wrapped__')
+
+    report = profiler.to_json()
+    assert report['functions']['Validator.validate_person']['calls'] > 0
+    assert report['validators']['is_role']['calls'] > 0
+    assert report['fields']['person.roles[]']['calls'] == report['validators']['is_role']['calls']
+    assert report['fields']['legislative_role.jurisdiction']['seconds'] > 0
+    profiler.print_report(echo=lambda message, **styles: print(message))
+    assert 'validators' in capsys.readouterr().out
+
+
+def test_streaming_validator():
+    person = {'id': EXAMPLE_OCD_PERSON_ID,
+              'name': 'Jane Smith',
+              'roles': [{'type': 'upper', 'district': '1',
+                         'jurisdiction': 'ocd-jurisdiction/country:us/government'}],
+              'party': [{'name': 'Democratic'}],
+              'ids': {'twitter': 'jane'},
+              }
+    settings = {'us': {'upper_seats': 100, 'lower_seats': 435}}
+    output = []
+    v = Validator('us', settings, echo=lambda message, **styles: output.append(message),
+                  stream=True, verbose=1)
+
+    v.validate_person(person, 'bad-filename')
+    # printed right away & not kept
+    assert output[0] == 'bad-filename'
+    assert 'not in filename' in output[1]
+    assert not v.errors
+    v.validate_person(person, get_filename(person))
+    assert output[-1].endswith('OK!')
+
+    # only compact references are kept for the cross-file checks
+    ref = v.active_legislators['upper']['1'][0]
+    assert ref == PersonRef('bad-filename', EXAMPLE_OCD_PERSON_ID, 'Jane Smith')
+    assert v.duplicate_values['twitter']['jane'][1].filename.startswith('Jane-Smith')
+    assert v.check_duplicates() == [
+        f'duplicate twitter: "jane" {get_filename(person)}, {get_filename(person)}']
+
+    output.clear()
+    # the bad filename, the duplicate twitter id & the missing lower chamber
+    assert v.print_validation_report(0, v.echo) == 3
+
+
+def test_fix_obj():
+    person = {
+        'id': EXAMPLE_OCD_PERSON_ID,
+        'name': ' Jane  Smith',
+        'family_name': 'Smith ',
+        'contact_details': [{'note': 'District Office', 'voice': '(919) 555-1234',
+                             'address': '123 Main St.\n  Raleigh, NC'}],
+        'roles': [{'type': 'upper', 'contact_details': [{'fax': '919.555.9876 Ext 12'}]}],
+        'links': [{'url': 'https://example.com', 'note': ''}, {'url': 'https://example.org'}],
+    }
+    assert fix_obj(person) == 6
+    assert person['name'] == 'Jane Smith'
+    assert person['family_name'] == 'Smith'
+    assert person['contact_details'][0]['voice'] == '919-555-1234'
+    assert person['contact_details'][0]['address'] == '123 Main St.;Raleigh, NC'
+    assert person['roles'][0]['contact_details'][0]['fax'] == '919-555-9876 ext. 12'
+    assert person['links'] == [{'url': 'https://example.com'}, {'url': 'https://example.org'}]
+    # already fixed
+    assert fix_obj(person) == 0
+
+
+def test_fix_obj_phone_not_single_number():
+    person = {'id': EXAMPLE_OCD_PERSON_ID, 'name': 'Jane Smith',
+              'contact_details': [{'voice': '919-555-1234 or 919-555-5678',
+                                   'fax': '+1 (919) 555-9876'}]}
+    assert fix_obj(person) == 1
+    # left for lint to report rather than losing the second number
+    assert person['contact_details'][0]['voice'] == '919-555-1234 or 919-555-5678'
+    assert person['contact_details'][0]['fax'] == '1-919-555-9876'
+
+
+def test_fix_states(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    monkeypatch.setattr('lint_yaml.get_data_dir', lambda abbr: str(tmp_path / abbr))
+    files = {
+        'nc/people/a.yml': 'id: ocd-person/1\nname: Jane  Smith\n',
+        # not in canonical form, but nothing to fix, so left alone
+        'nc/people/b.yml': "id: ocd-person/2\nname: 'John Smith'\n",
+        'sc/organizations/c.yml': 'id: ocd-organization/3\nname: Finance\nmemberships:\n'
+                                  '- name: Jane  Smith\n- name: John   Smith\n',
+    }
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(str(tmp_path / path)), exist_ok=True)
+        with open(str(tmp_path / path), 'w') as f:
+            f.write(content)
+
+    assert fix_states(['nc', 'sc'], 0) == {'nc': [1, 1], 'sc': [2, 1]}
+    with open(str(tmp_path / 'nc/people/a.yml')) as f:
+        assert f.read() == 'id: ocd-person/1\nname: Jane Smith\n'
+    with open(str(tmp_path / 'nc/people/b.yml')) as f:
+        assert f.read() == files['nc/people/b.yml']
+    assert fix_states(['nc', 'sc'], 0, jobs=2) == {'nc': [0, 0], 'sc': [0, 0]}
@@ -0,0 +1,57 @@
+import os
+import pytest
+from manual_data import update_from_csv
+from utils import load_yaml_file
+
+UUID1 = '11111111-2222-3333-4444-555555555555'
+UUID2 = '66666666-7777-8888-9999-000000000000'
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr('utils.get_data_dir', lambda abbr: str(tmp_path / 'data' / abbr))
+    monkeypatch.setattr('utils.get_all_abbreviations', lambda: ['nc'])
+    os.makedirs(str(tmp_path / 'data' / 'nc' / 'people'))
+    return tmp_path / 'data' / 'nc' / 'people'
+
+
+def write_file(directory, name, uuid, id=None):
+    filename = str(directory / f'{name}-{uuid}.yml')
+    with open(filename, 'w') as f:
+        f.write(f'id: ocd-person/{id or uuid}\nname: {name}\n')
+    return filename
+
+
+def write_csv(tmp_path, *ids):
+    filename = str(tmp_path / 'update.csv')
+    with open(filename, 'w') as f:
+        f.write('id,email,twitter\n')
+        for id in ids:
+            f.write(f'ocd-person/{id},someone@example.com,a;b\n')
+    return filename
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_update_from_csv(tmp_path, data_dir, jobs):
+    jane = write_file(data_dir, 'Jane', UUID1)
+    john = write_file(data_dir, 'John', UUID2)
+
+    update_from_csv(write_csv(tmp_path, UUID1), ['email'], ['twitter'], jobs=jobs)
+    assert load_yaml_file(jane) == {
+        'id': f'ocd-person/{UUID1}', 'name': 'Jane', 'email': 'someone@example.com',
+        'other_identifiers': [{'scheme': 'twitter', 'identifier': 'a'},
+                              {'scheme': 'twitter', 'identifier': 'b'}],
+    }
+    assert load_yaml_file(john) == {'id': f'ocd-person/{UUID2}', 'name': 'John'}
+
+
+def test_update_from_csv_bad_ids(tmp_path, data_dir):
+    # named after one id but holding another
+    write_file(data_dir, 'Jane', UUID1, id=UUID2)
+
+    with pytest.raises(ValueError, match='is named after'):
+        update_from_csv(write_csv(tmp_path, UUID1), ['email'], [])
+    with pytest.raises(ValueError, match='unknown id'):
+        update_from_csv(write_csv(tmp_path, UUID2), ['email'], [])
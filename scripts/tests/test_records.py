@@ -0,0 +1,74 @@
+import pickle
+from collections import OrderedDict
+from utils import load_yaml, dump_yaml
+from records import Person, Organization, ContactDetail, to_record, to_dict
+
+PERSON = '''id: ocd-person/11111111-2222-3333-4444-555555555555
+name: Jane Smith
+party:
+- name: Democratic
+roles:
+- district: '12'
+  jurisdiction: ocd-jurisdiction/country:us/state:ny/government
+  type: lower
+  contact_details:
+  - note: Capitol Office
+    voice: 555-555-5555
+contact_details:
+- note: District Office
+  address: 123 Main St.
+ids:
+  twitter: janesmith
+extras:
+  nickname: Janie
+custom_field: value
+'''
+
+
+def test_record_round_trip():
+    obj = load_yaml(PERSON)
+    record = to_record(obj)
+    assert isinstance(record, Person)
+    assert record == obj
+    assert to_dict(record) == obj
+    assert isinstance(to_dict(record), OrderedDict)
+    assert list(record) == list(obj)
+    assert dump_yaml(record) == dump_yaml(obj) == PERSON
+
+
+def test_record_mapping_access():
+    record = to_record(load_yaml(PERSON))
+    assert record['name'] == 'Jane Smith'
+    assert record.get('birth_date') is None
+    assert 'birth_date' not in record
+    assert record['custom_field'] == 'value'
+    assert isinstance(record['contact_details'][0], ContactDetail)
+    assert record['roles'][0]['contact_details'][0]['voice'] == '555-555-5555'
+    assert record['ids'] == {'twitter': 'janesmith'}
+    assert repr(record) == repr(load_yaml(PERSON))
+
+
+def test_record_strings_interned():
+    one = to_record(load_yaml(PERSON))
+    two = to_record(load_yaml(PERSON))
+    assert one['roles'][0]['jurisdiction'] is two['roles'][0]['jurisdiction']
+    assert one._keys is two._keys
+
+
+def test_record_pickle():
+    record = to_record(load_yaml(PERSON))
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_organization_record():
+    obj = load_yaml('''id: ocd-organization/11111111-2222-3333-4444-555555555555
+name: Finance Committee
+memberships:
+- id: ocd-person/11111111-2222-3333-4444-555555555555
+  name: Jane Smith
+  role: chair
+''')
+    record = to_record(obj)
+    assert isinstance(record, Organization)
+    assert record['memberships'][0]['role'] == 'chair'
+    assert to_dict(record) == obj
@@ -1,5 +1,6 @@
-# import pytest
-from retire import retire_person, retire_from_committee
+import os
+from utils import dump_obj, load_yaml_file, FileTransaction
+from retire import retire_person, retire_from_committee, retire, move_file
 
 
 def test_retire_person():
@@ -35,3 +36,42 @@ def test_retire_from_committee():
     assert committee['memberships'][1]['end_date'] == '2018-10-01'
     assert committee['memberships'][2]['end_date'] == '2018-10-01'
     assert committee['memberships'][3].get('end_date') is None
+
+
+def test_retire(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    for d in ('people', 'organizations'):
+        (tmp_path / d).mkdir()
+    filename = str(tmp_path / 'people' / 'Jane-Smith-123.yml')
+    dump_obj({'id': '123', 'name': 'Jane Smith', 'roles': [{'type': 'lower'}]},
+             filename=filename)
+    dump_obj({'memberships': [{'id': '123'}]},
+             filename=str(tmp_path / 'organizations' / 'a.yml'))
+    dump_obj({'memberships': [{'id': '456'}]},
+             filename=str(tmp_path / 'organizations' / 'b.yml'))
+    mtime = os.stat(str(tmp_path / 'organizations' / 'b.yml')).st_mtime_ns
+
+    retire('2018-10-01', filename, None, False)
+
+    assert not os.path.exists(filename)
+    person = load_yaml_file(str(tmp_path / 'retired' / 'Jane-Smith-123.yml'))
+    assert person['roles'][0]['end_date'] == '2018-10-01'
+    committee = load_yaml_file(str(tmp_path / 'organizations' / 'a.yml'))
+    assert committee['memberships'][0]['end_date'] == '2018-10-01'
+    # untouched committee isn't rewritten
+    assert os.stat(str(tmp_path / 'organizations' / 'b.yml')).st_mtime_ns == mtime
+
+
+def test_move_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    (tmp_path / 'people').mkdir()
+    filename = str(tmp_path / 'people' / 'Jane-Smith-123.yml')
+    dump_obj({'id': '123', 'name': 'Jane Smith'}, filename=filename)
+
+    with FileTransaction() as txn:
+        move_file(filename, txn)
+        assert not txn.exists(filename)
+        assert os.path.exists(filename)
+    assert not os.path.exists(filename)
+    assert load_yaml_file(str(tmp_path / 'retired' / 'Jane-Smith-123.yml')) == {
+        'id': '123', 'name': 'Jane Smith'}
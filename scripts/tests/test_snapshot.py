@@ -0,0 +1,86 @@
+import os
+import pytest
+from click.testing import CliRunner
+from snapshot import build_snapshot, check_snapshot, Snapshot, snapshot
+from utils import load_yaml
+
+PERSON = '''id: ocd-person/{uuid}
+name: {name}
+roles:
+- district: '12'
+  jurisdiction: ocd-jurisdiction/country:us/state:ny/government
+  type: lower
+'''
+UUIDS = ['11111111-2222-3333-4444-555555555555', '66666666-2222-3333-4444-555555555555',
+         '33333333-2222-3333-4444-555555555555']
+
+
+def write_people(data_dir):
+    os.makedirs(os.path.join(data_dir, 'ny', 'people'))
+    filenames = []
+    for n, uuid in enumerate(UUIDS):
+        filename = os.path.join(data_dir, 'ny', 'people', f'Person-{n}-{uuid}.yml')
+        with open(filename, 'w') as f:
+            f.write(PERSON.format(uuid=uuid, name=f'Person {n}'))
+        filenames.append(filename)
+    return filenames
+
+
+def test_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    data_dir = str(tmp_path / 'data')
+    path = str(tmp_path / 'data.snapshot')
+    filenames = write_people(data_dir)
+
+    assert build_snapshot(path, data_dir) == (3, True)
+    # rebuilding an up to date snapshot doesn't rewrite it
+    assert build_snapshot(path, data_dir) == (3, False)
+    assert check_snapshot(path, data_dir, full=True) == []
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert list(snapshot.ids()) == sorted(f'ocd-person/{uuid}' for uuid in UUIDS)
+        rel_path, obj = snapshot.get_entry(f'ocd-person/{UUIDS[1]}')
+        assert rel_path == f'ny/people/Person-1-{UUIDS[1]}.yml'
+        with open(filenames[1]) as f:
+            assert obj == load_yaml(f.read())
+        assert f'ocd-person/{UUIDS[2]}' in snapshot
+        assert snapshot.get('ocd-person/00000000-2222-3333-4444-555555555555') is None
+        assert snapshot.get('ocd-person/ffffffff-2222-3333-4444-555555555555') is None
+
+    with open(filenames[0], 'a') as f:
+        f.write('gender: Female\n')
+    assert check_snapshot(path, data_dir) == [f'{path} is out of date with {data_dir}']
+
+
+def test_snapshot_bad_file(tmp_path):
+    path = str(tmp_path / 'data.snapshot')
+    with open(path, 'wb') as f:
+        f.write(b'not a snapshot')
+    with pytest.raises(ValueError):
+        Snapshot(path)
+
+
+def test_snapshot_cli_errors(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    data_dir = str(tmp_path / 'data')
+    path = str(tmp_path / 'data.snapshot')
+    monkeypatch.setattr('snapshot.get_default_data_dir', lambda: data_dir)
+    monkeypatch.setattr('snapshot.get_default_snapshot_path', lambda: path)
+    filenames = write_people(data_dir)
+    runner = CliRunner()
+
+    # no snapshot built yet
+    result = runner.invoke(snapshot, ['--id', f'ocd-person/{UUIDS[0]}'])
+    assert result.exit_code == 1
+    assert 'data.snapshot' in result.output
+
+    # two files with the same id
+    with open(filenames[0]) as f:
+        content = f.read()
+    os.makedirs(os.path.join(data_dir, 'ny', 'retired'))
+    with open(filenames[0].replace('people', 'retired'), 'w') as f:
+        f.write(content)
+    result = runner.invoke(snapshot, [])
+    assert result.exit_code == 1
+    assert result.output == f'duplicate id ocd-person/{UUIDS[0]}\n'
@@ -0,0 +1,120 @@
+import os
+from sqlite_index import SQLiteIndex, SCHEMA_VERSION
+
+PERSON = '''id: ocd-person/{uuid}
+name: {name}
+party:
+- name: Democratic
+roles:
+- district: '12'
+  jurisdiction: ocd-jurisdiction/country:us/state:ny/government
+  type: lower
+other_identifiers:
+- identifier: NYL000001
+  scheme: legacy_openstates
+'''
+UUID1 = '11111111-2222-3333-4444-555555555555'
+UUID2 = '66666666-2222-3333-4444-555555555555'
+
+
+def write_person(data_dir, objtype, name, uuid):
+    os.makedirs(os.path.join(data_dir, 'ny', objtype), exist_ok=True)
+    filename = os.path.join(data_dir, 'ny', objtype, f'{name.replace(" ", "-")}-{uuid}.yml')
+    with open(filename, 'w') as f:
+        f.write(PERSON.format(uuid=uuid, name=name))
+    return filename
+
+
+def test_sqlite_index(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    data_dir = str(tmp_path / 'data')
+    db_path = str(tmp_path / 'index.sqlite3')
+    filename = write_person(data_dir, 'people', 'Jane Smith', UUID1)
+
+    with SQLiteIndex(db_path, data_dir) as index:
+        row = index.lookup_id(f'ocd-person/{UUID1}')
+        assert index.get_filename(row['path']) == filename
+        assert row['abbr'] == 'ny'
+        assert row['party'] == 'Democratic'
+        assert [r['name'] for r in index.find_by_seat('ny', 'lower', 12)] == ['Jane Smith']
+        assert [r['name'] for r in index.find_by_name('jane smith')] == ['Jane Smith']
+        assert len(index.find_by_identifier('legacy_openstates', 'NYL000001')) == 1
+        # nothing changed, nothing to do
+        assert index.refresh() == (0, 0)
+
+    # touching a file doesn't reparse it, changing or removing it does
+    os.utime(filename, ns=(1, 1))
+    other = write_person(data_dir, 'retired', 'John Doe', UUID2)
+    with SQLiteIndex(db_path, data_dir, refresh=False) as index:
+        assert index.refresh() == (1, 0)
+        assert index.lookup_id(f'ocd-person/{UUID2}')['objtype'] == 'retired'
+        assert len(index.find_by_identifier('legacy_openstates', 'NYL000001')) == 2
+
+        os.remove(other)
+        assert index.refresh() == (0, 1)
+        assert index.lookup_id(f'ocd-person/{UUID2}') is None
+        assert len(index.find_by_identifier('legacy_openstates', 'NYL000001')) == 1
+
+    # an index from another schema version is rebuilt from scratch
+    with SQLiteIndex(db_path, data_dir, refresh=False) as index:
+        with index.conn:
+            index.conn.execute("UPDATE meta SET value=? WHERE key='schema_version'",
+                               (str(SCHEMA_VERSION + 1),))
+    with SQLiteIndex(db_path, data_dir) as index:
+        assert index.lookup_id(f'ocd-person/{UUID1}')['name'] == 'Jane Smith'
+
+
+def test_sqlite_index_duplicate_ids(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    data_dir = str(tmp_path / 'data')
+    db_path = str(tmp_path / 'index.sqlite3')
+    write_person(data_dir, 'people', 'Jane Smith', UUID1)
+    # a copy left behind in retired/ with the same id
+    copy = write_person(data_dir, 'retired', 'Jane Smith', UUID1)
+
+    with SQLiteIndex(db_path, data_dir) as index:
+        assert index.find_duplicate_ids() == {f'ocd-person/{UUID1}': [
+            f'ny/people/Jane-Smith-{UUID1}.yml', f'ny/retired/Jane-Smith-{UUID1}.yml']}
+        assert index.lookup_id(f'ocd-person/{UUID1}')['objtype'] == 'people'
+        assert len(index.find_by_identifier('legacy_openstates', 'NYL000001')) == 2
+
+        # removing one copy leaves the other fully indexed
+        os.remove(copy)
+        assert index.refresh() == (0, 1)
+        assert index.find_duplicate_ids() == {}
+        assert index.lookup_id(f'ocd-person/{UUID1}')['objtype'] == 'people'
+        assert len(index.find_by_identifier('legacy_openstates', 'NYL000001')) == 1
+
+
+def test_sqlite_index_role_ends_after_build(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE', '0')
+    data_dir = str(tmp_path / 'data')
+    db_path = str(tmp_path / 'index.sqlite3')
+    os.makedirs(os.path.join(data_dir, 'ny', 'people'))
+    with open(os.path.join(data_dir, 'ny', 'people', f'Jane-Smith-{UUID1}.yml'), 'w') as f:
+        f.write(f'''id: ocd-person/{UUID1}
+name: Jane Smith
+party:
+- name: Democratic
+  end_date: '2030-01-01'
+- name: Independent
+roles:
+- district: '12'
+  jurisdiction: ocd-jurisdiction/country:us/state:ny/government
+  type: lower
+  end_date: '2030-01-01'
+''')
+
+    monkeypatch.setattr('sqlite_index.today', lambda: '2029-12-31')
+    with SQLiteIndex(db_path, data_dir) as index:
+        assert index.lookup_id(f'ocd-person/{UUID1}')['party'] == 'Democratic'
+        assert [r['name'] for r in index.find_by_seat('ny', 'lower', 12)] == ['Jane Smith']
+
+    # the file is untouched, but the role & party have ended by the time of the query
+    monkeypatch.setattr('sqlite_index.today', lambda: '2030-01-02')
+    with SQLiteIndex(db_path, data_dir) as index:
+        assert index.refresh() == (0, 0)
+        row = index.lookup_id(f'ocd-person/{UUID1}')
+        assert row['party'] == 'Independent'
+        assert row['chamber'] is None
+        assert index.find_by_seat('ny', 'lower', 12) == []
@@ -1,7 +1,12 @@
+import os
 import pytest
-import yaml
-from opencivicdata.core.models import Person, Organization, Jurisdiction, Division, Post
-from to_database import load_person, load_org, create_posts
+from opencivicdata.core.models import (Person, Organization, Jurisdiction, Division, Post,
+                                       PersonLink)
+from utils import load_yaml
+from to_database import (load_person, load_org, load_people, create_posts, sort_organizations,
+                         parse_name_status, diff_subobjects, get_subobject_fields,
+                         load_directory, get_sync_hashes, record_sync_hashes,
+                         CancelTransaction)
 
 
 def setup():
@@ -18,7 +23,7 @@ def setup():
 
 @pytest.mark.django_db
 def test_basic_person_creation():
-    data = yaml.load("""
+    data = load_yaml("""
     id: abcdefab-0000-1111-2222-1234567890ab
     name: Jane Smith
     image: https://example.com/image
@@ -44,7 +49,7 @@ def test_basic_person_updates():
     extras:
         something: special
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -82,7 +87,7 @@ def test_basic_person_subobjects():
     other_names:
         - name: J. Smith
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -103,7 +108,7 @@ def test_subobject_update():
         - url: https://example.com/extra
           note: some additional data
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -138,6 +143,40 @@ def test_subobject_update():
     assert p.updated_at > updated_at
 
 
+def test_diff_subobjects():
+    fields = get_subobject_fields(PersonLink, 'person')
+    assert [f.name for f in fields] == ['note', 'url']
+    rows = [PersonLink(url='https://a'), PersonLink(url='https://a'),
+            PersonLink(url='https://b', note='b')]
+    objects = [{'url': 'https://a'}, {'url': 'https://b'}, {'url': 'https://c'}]
+    to_delete, to_create = diff_subobjects(rows, objects, fields)
+    assert to_delete == [rows[0], rows[2]]
+    assert to_create == [{'url': 'https://b'}, {'url': 'https://c'}]
+    assert diff_subobjects(rows, [{'url': 'https://b', 'note': 'b'}, {'url': 'https://a'},
+                                  {'url': 'https://a', 'note': ''}], fields) == ([], [])
+
+
+@pytest.mark.django_db
+def test_subobject_update_is_minimal():
+    data = load_yaml("""
+    id: abcdefab-0000-1111-2222-1234567890ab
+    name: Jane Smith
+    links:
+        - url: https://example.com/jane
+        - url: https://example.com/extra
+    """)
+    load_person(data)
+    p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
+    kept = p.links.get(url='https://example.com/jane').id
+
+    data['links'][1]['url'] = 'https://example.com/changed'
+    created, updated = load_person(data)
+    assert updated is True
+    assert p.links.get(url='https://example.com/jane').id == kept
+    assert set(p.links.values_list('url', flat=True)) == {'https://example.com/jane',
+                                                          'https://example.com/changed'}
+
+
 @pytest.mark.django_db
 def test_subobject_duplicate():
     # this shouldn't actually be allowed most places (lint should catch)
@@ -149,7 +188,7 @@ def test_subobject_duplicate():
         - url: https://example.com/jane
         - url: https://example.com/jane
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     # load twice, but second time no update should occur
     created, updated = load_person(data)
@@ -172,7 +211,7 @@ def test_person_identifiers():
         - scheme: old_openstates
           identifier: AR000002
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -196,7 +235,7 @@ def test_person_contact_details():
         - note: home
           voice: 333-333-3333
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -213,7 +252,7 @@ def test_person_party():
     party:
         - name: Democratic
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
 
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
@@ -239,7 +278,7 @@ def test_person_legislative_roles():
           district: 3
           jurisdiction: ocd-jurisdiction/country:us/state:nc
     """
-    data = yaml.load(yaml_text)
+    data = load_yaml(yaml_text)
     created, updated = load_person(data)
     p = Person.objects.get(pk='abcdefab-0000-1111-2222-1234567890ab')
 
@@ -248,12 +287,86 @@ def test_person_legislative_roles():
     assert p.memberships.get().post.label == '3'
 
 
+@pytest.mark.django_db
+def test_load_people():
+    jane = load_yaml("""
+    id: abcdefab-0000-1111-2222-1234567890ab
+    name: Jane Smith
+    party:
+        - name: Democratic
+    roles:
+        - type: lower
+          district: 3
+          jurisdiction: ocd-jurisdiction/country:us/state:nc
+    links:
+        - url: https://example.com/jane
+    ids:
+        twitter: jane
+    """)
+    john = load_yaml("""
+    id: abcdefab-0000-1111-2222-1234567890cd
+    name: John Smith
+    """)
+    assert load_people([(jane, 'jane.yml'), (john, 'john.yml')]) == [(True, True),
+                                                                     (True, False)]
+    p = Person.objects.get(pk=jane['id'])
+    assert p.memberships.count() == 2
+    assert p.memberships.get(post__label='3').organization.name == 'House'
+    assert p.links.get().url == 'https://example.com/jane'
+    assert p.identifiers.get().identifier == 'jane'
+    updated_at = p.updated_at
+
+    # nothing changed
+    assert load_people([(jane, 'jane.yml'), (john, 'john.yml')]) == [(False, False),
+                                                                     (False, False)]
+    assert Person.objects.get(pk=jane['id']).updated_at == updated_at
+
+    # same results as load_person
+    jane['links'].append({'url': 'https://example.com/extra', 'note': 'extra'})
+    john['given_name'] = 'John'
+    assert load_people([(jane, 'jane.yml'), (john, 'john.yml')]) == [(False, True),
+                                                                     (False, True)]
+    p = Person.objects.get(pk=jane['id'])
+    assert p.links.count() == 2
+    assert p.updated_at > updated_at
+    assert Person.objects.get(pk=john['id']).given_name == 'John'
+    assert load_person(jane) == (False, False)
+    assert load_person(john) == (False, False)
+
+
+@pytest.mark.django_db
+def test_load_people_duplicate_ids(capsys):
+    jane = {'id': '123', 'name': 'Jane Smith'}
+    with pytest.raises(CancelTransaction):
+        load_people([(jane, 'people/a.yml'), (dict(jane, name='Jane'), 'retired/a.yml')])
+    assert 'duplicate id 123 in people/a.yml, retired/a.yml' in capsys.readouterr().out
+    assert not Person.objects.filter(pk='123').exists()
+
+
+@pytest.mark.django_db
+def test_load_people_keeps_committee_memberships():
+    person_data = {'id': '123', 'name': 'Jane Smith'}
+    load_people([(person_data, 'jane.yml')])
+    load_org(load_yaml("""
+    id: ocd-organization/00000000-1111-2222-3333-444455556666
+    name: Finance
+    parent: lower
+    jurisdiction: ocd-jurisdiction/country:us/state:nc
+    classification: committee
+    memberships:
+        - id: 123
+          name: Jane Smith
+    """))
+    assert load_people([(person_data, 'jane.yml')]) == [(False, False)]
+    assert Organization.objects.get(pk=EXAMPLE_ORG_ID).memberships.count() == 1
+
+
 EXAMPLE_ORG_ID = 'ocd-organization/00000000-1111-2222-3333-444455556666'
 
 
 @pytest.mark.django_db
 def test_basic_organization():
-    data = yaml.load("""
+    data = load_yaml("""
     id: ocd-organization/00000000-1111-2222-3333-444455556666
     name: Finance
     parent: lower
@@ -272,7 +385,7 @@ def test_basic_organization():
 
 @pytest.mark.django_db
 def test_basic_organization_updates():
-    data = yaml.load("""
+    data = load_yaml("""
     id: ocd-organization/00000000-1111-2222-3333-444455556666
     name: Finance
     parent: lower
@@ -304,7 +417,7 @@ def test_basic_organization_updates():
 
 @pytest.mark.django_db
 def test_organization_memberships():
-    data = yaml.load("""
+    data = load_yaml("""
     id: ocd-organization/00000000-1111-2222-3333-444455556666
     name: Finance
     parent: lower
@@ -339,7 +452,7 @@ def test_organization_memberships():
 def test_org_person_membership_interaction():
     # this test ensure that committee memberships don't mess up person loading
     person_data = {'id': '123', 'name': 'Jane Smith'}
-    com_data = yaml.load("""
+    com_data = load_yaml("""
     id: ocd-organization/00000000-1111-2222-3333-444455556666
     name: Finance
     parent: lower
@@ -386,6 +499,13 @@ def test_create_posts_simple():
     assert Post.objects.filter(role='Senator').count() == 35
     assert Post.objects.filter(role='Representative').count() == 105
 
+    # unchanged posts are left alone
+    post_ids = set(Post.objects.values_list('id', flat=True))
+    settings['upper_seats'] = 34
+    create_posts(j.id, settings)
+    assert Post.objects.filter(role='Senator').count() == 34
+    assert set(Post.objects.values_list('id', flat=True)) < post_ids
+
 
 @pytest.mark.django_db
 def test_create_top_level_unicameral():
@@ -397,7 +517,7 @@ def test_create_top_level_unicameral():
         Division.objects.create(id=f'ocd-division/country:us/district:dc/ward:{n}',
                                 name=f'Ward {n}')
 
-    settings = yaml.load("""
+    settings = load_yaml("""
 legislature_seats: {'Ward 1': 1, 'Ward 2': 1, 'Ward 3': 1, 'Ward 4': 1, 'Ward 5': 1,
                     'Ward 6': 1, 'Ward 7': 1, 'Ward 8': 1, 'Chairman': 1, 'At-Large': 4}
 legislature_name: Council of the District of Columbia
@@ -417,3 +537,109 @@ legislature_division_ids:
     create_posts(j.id, settings)
     assert org.posts.all().count() == 10
     assert Post.objects.filter(division_id='ocd-division/country:us/district:dc').count() == 2
+
+
+def test_sort_organizations_external_parent():
+    orgs = [({'id': 'ocd-organization/2', 'parent': 'ocd-organization/1'}, 'b.yml'),
+            ({'id': 'ocd-organization/3', 'parent': 'ocd-organization/2'}, 'c.yml')]
+    # ocd-organization/1 isn't being loaded, it must already be in the database
+    order = sort_organizations(list(orgs))
+    assert [o['id'] for o, _ in order] == ['ocd-organization/2', 'ocd-organization/3']
+
+
+def test_parse_name_status():
+    output = '\0'.join([
+        'M', 'data/nc/people/A.yml',
+        'A', 'data/nc/people/B.yml',
+        'D', 'data/nc/people/C.yml',
+        'R100', 'data/nc/people/D.yml', 'data/nc/retired/D.yml',
+    ]) + '\0'
+    changes = parse_name_status(output)
+    assert changes.changed == ['data/nc/people/A.yml', 'data/nc/people/B.yml',
+                               'data/nc/retired/D.yml']
+    assert changes.deleted == ['data/nc/people/C.yml', 'data/nc/people/D.yml']
+
+
+JANE_SMITH_YAML = '''id: ocd-person/1234
+name: Jane Smith
+roles:
+- type: lower
+  district: 3
+  jurisdiction: ocd-jurisdiction/country:us/state:nc
+'''
+
+
+@pytest.mark.django_db
+def test_load_directory_skips_unchanged(tmp_path, capsys):
+    jurisdiction_id = 'ocd-jurisdiction/country:us/state:nc'
+    os.makedirs(str(tmp_path / 'people'))
+    filename = str(tmp_path / 'people' / 'Jane-Smith-1234.yml')
+    with open(filename, 'w') as f:
+        f.write(JANE_SMITH_YAML)
+
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert 'created person' in capsys.readouterr().out
+    assert Jurisdiction.objects.get(pk=jurisdiction_id).extras['people_sync_hashes'][
+        'person']['people/Jane-Smith-1234.yml'][1] == 'ocd-person/1234'
+
+    # an unchanged file isn't compared to the database at all
+    Person.objects.filter(pk='ocd-person/1234').update(name='Changed')
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert '0 updated, 1 unchanged' in capsys.readouterr().out
+    assert Person.objects.get(pk='ocd-person/1234').name == 'Changed'
+
+    load_directory([filename], 'person', jurisdiction_id, purge=False, force=True)
+    assert 'updated person' in capsys.readouterr().out
+    assert Person.objects.get(pk='ocd-person/1234').name == 'Jane Smith'
+
+    with open(filename, 'w') as f:
+        f.write(JANE_SMITH_YAML.replace('Jane Smith', 'Jane Q. Smith'))
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert '1 updated, 0 unchanged' in capsys.readouterr().out
+
+    # a file whose person is gone from the database is loaded again
+    Person.objects.filter(pk='ocd-person/1234').delete()
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert 'created person' in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_load_directory_reloads_after_posts_change(tmp_path, capsys):
+    jurisdiction_id = 'ocd-jurisdiction/country:us/state:nc'
+    os.makedirs(str(tmp_path / 'people'))
+    filename = str(tmp_path / 'people' / 'Jane-Smith-1234.yml')
+    with open(filename, 'w') as f:
+        f.write(JANE_SMITH_YAML)
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert '0 updated, 1 unchanged' in capsys.readouterr().out
+
+    # the posts are replaced, taking the post off Jane's membership
+    for n in range(1, 4):
+        Division.objects.create(id=f'ocd-division/country:us/state:nc/sldl:{n}', name=str(n))
+    assert create_posts(jurisdiction_id, {'lower_seats': 3}) is True
+    membership = Person.objects.get(pk='ocd-person/1234').memberships.get(
+        organization__classification='lower')
+    assert membership.post is None
+    assert create_posts(jurisdiction_id, {'lower_seats': 3}) is False
+
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    assert '1 updated, 0 unchanged' in capsys.readouterr().out
+    membership.refresh_from_db()
+    assert membership.post.label == '3'
+
+
+@pytest.mark.django_db
+def test_load_directory_purge_drops_hashes(tmp_path, capsys):
+    jurisdiction_id = 'ocd-jurisdiction/country:us/state:nc'
+    os.makedirs(str(tmp_path / 'people'))
+    filename = str(tmp_path / 'people' / 'Jane-Smith-1234.yml')
+    with open(filename, 'w') as f:
+        f.write(JANE_SMITH_YAML)
+    load_directory([filename], 'person', jurisdiction_id, purge=False)
+    record_sync_hashes(jurisdiction_id, 'organization', {'organizations/x.yml': ['abc', 'x']})
+
+    load_directory([], 'person', jurisdiction_id, purge=True)
+    assert '1 purged' in capsys.readouterr().out
+    assert get_sync_hashes(jurisdiction_id, 'organization') == {}
+    assert get_sync_hashes(jurisdiction_id, 'person') == {}
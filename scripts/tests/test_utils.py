@@ -1,5 +1,15 @@
+import os
+import glob
+import yaml
+import pickle
 import pytest
-from utils import reformat_phone_number, reformat_address, role_is_active
+from collections import OrderedDict
+from utils import (reformat_phone_number, reformat_address, role_is_active, load_yaml,
+                   load_yaml_file, get_cache_entry_path, dump_yaml, load_yaml_files,
+                   normalize_name, DataRepository, dump_obj, FileTransaction, LazyPerson,
+                   split_top_level, get_filename, parse_filename, scan_metadata,
+                   fast_dump_yaml, OrderedDumper, get_jurisdiction_id)
+from yaml_cache import prune_cache
 
 
 @pytest.mark.parametrize("input,output", [
@@ -35,3 +45,362 @@ def test_reformat_address(input, output):
 ])
 def test_role_is_active(role, expected):
     assert role_is_active(role) == expected
+
+
+def test_load_yaml_file_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    filename = str(tmp_path / 'person.yml')
+    with open(filename, 'w') as f:
+        f.write('name: Jane\nid: 123\n')
+
+    assert load_yaml_file(filename) == {'name': 'Jane', 'id': 123}
+    assert list(load_yaml_file(filename).keys()) == ['name', 'id']
+    assert os.path.exists(get_cache_entry_path(filename))
+    with open(filename) as f:
+        assert load_yaml(f) == {'name': 'Jane', 'id': 123}
+
+    # same size & mtime, different content: must not be served from the cache
+    stat = os.stat(filename)
+    with open(filename, 'w') as f:
+        f.write('name: Jill\nid: 456\n')
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_yaml_file(filename) == {'name': 'Jill', 'id': 456}
+
+    os.remove(filename)
+    assert prune_cache() == 1
+    assert not os.path.exists(get_cache_entry_path(filename))
+
+
+def test_load_yaml_files_parallel(tmp_path):
+    filenames = []
+    for n in range(40):
+        filename = str(tmp_path / f'{n}.yml')
+        with open(filename, 'w') as f:
+            f.write(f'n: {n}\n')
+        filenames.append(filename)
+
+    serial = list(load_yaml_files(filenames))
+    parallel = list(load_yaml_files(filenames, jobs=3, chunksize=4))
+    assert serial == parallel
+    assert [obj['n'] for obj, _ in parallel] == list(range(40))
+    assert [filename for _, filename in parallel] == filenames
+
+
+def test_normalize_name():
+    assert normalize_name('John  Smith, Jr.') == 'john smith jr'
+    assert normalize_name('john smith jr') == 'john smith jr'
+
+
+def test_data_repository():
+    repo = DataRepository(['nc'])
+    person_id = 'ocd-person/a87535b2-5607-48d5-9d11-f20cc1d0d4ee'
+    entry = repo.get(person_id)
+    assert entry.obj['name'] == 'Allen McNeill'
+    assert entry.abbr == 'nc' and entry.objtype == 'people'
+    assert entry.filename.endswith('Allen-McNeill-a87535b2-5607-48d5-9d11-f20cc1d0d4ee.yml')
+    assert person_id in repo
+
+    assert entry in repo.find_by_name('allen mcneill')
+    assert repo.find_by_seat('nc', 'lower', 78) == [entry]
+    assert repo.find_by_seat('ocd-jurisdiction/country:us/state:nc/government',
+                             'lower', '78') == [entry]
+    assert repo.find_by_identifier('legacy_openstates', 'NCL000243') == [entry]
+    assert repo.find_by_identifier('legacy_openstates', 'nope') == []
+
+    assert entry in repo.people('nc', retired=False)
+    assert entry not in repo.people('nc', retired=True)
+    orgs = list(repo.organizations('nc'))
+    assert orgs and all(e.obj['id'].startswith('ocd-organization/') for e in orgs)
+    assert len(repo) == len(list(repo.people())) + len(orgs)
+    assert list(repo.filter(predicate=lambda o: o['name'] == 'Allen McNeill')) == [entry]
+
+    other = entry.filename.replace('/people/', '/retired/')
+    assert repo.add(entry.obj, other) is None
+    assert repo.add(entry.obj, other + '.copy') is None
+    assert repo.duplicates == {person_id: [entry.filename, other, other + '.copy']}
+    assert repo.get(person_id) == entry
+
+
+def test_data_repository_seat_district_type():
+    repo = DataRepository([])
+    role = {'type': 'lower', 'district': 12, 'jurisdiction': get_jurisdiction_id('nc')}
+    entry = repo.add({'id': 'ocd-person/1', 'name': 'Jane Smith', 'roles': [role]},
+                     'data/nc/people/Jane-Smith-1.yml')
+    assert repo.find_by_seat('nc', 'lower', 12) == [entry]
+    assert repo.find_by_seat('nc', 'lower', '12') == [entry]
+
+
+LAZY_PERSON = """id: ocd-person/11111111-2222-3333-4444-555555555555
+name: Jane Smith
+biography: A very long biography that does not fit on a single line and so is wrapped
+  onto a second one.
+roles:
+- district: '12'
+  jurisdiction: ocd-jurisdiction/country:us/state:ny/government
+  type: lower
+
+links:
+- url: https://example.com
+"""
+
+
+def test_split_top_level():
+    segments = split_top_level(LAZY_PERSON)
+    assert list(segments) == ['id', 'name', 'biography', 'roles', 'links']
+    assert segments['biography'].endswith('second one.\n')
+    assert split_top_level('# comment\nid: 1\n') is None
+    assert split_top_level('id: 1\nid: 2\n') is None
+
+
+def test_lazy_person(tmp_path):
+    filename = str(tmp_path / 'person.yml')
+    with open(filename, 'w') as f:
+        f.write(LAZY_PERSON)
+    full = load_yaml(LAZY_PERSON)
+
+    person = LazyPerson(filename)
+    assert list(person) == list(full)
+    assert person['roles'] == full['roles']
+    assert person.get('sources') is None
+    assert set(person._parsed) == {'roles'}
+    assert not person.is_loaded
+    assert dict(person) == dict(full)
+    assert dump_yaml(person) == LAZY_PERSON.replace('\n\n', '\n')
+
+    # changes to values that were already handed out survive loading the rest
+    person['roles'][0]['end_date'] = '2020-01-01'
+    person['gender'] = 'Female'
+    assert person.is_loaded
+    assert person['roles'][0]['end_date'] == '2020-01-01'
+    assert list(person)[-1] == 'gender'
+
+
+def test_lazy_person_pending_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    filename = str(tmp_path / 'person.yml')
+    with open(filename, 'w') as f:
+        f.write(LAZY_PERSON)
+    person = LazyPerson(filename)
+    person['roles']
+    # the text of unparsed keys isn't pickled, so crossing a process boundary drops it
+    sent = pickle.loads(pickle.dumps(person))
+    assert sent['roles'] == person['roles']
+    assert b'second one' not in pickle.dumps(person)
+
+    with FileTransaction() as txn:
+        changed = load_yaml(LAZY_PERSON)
+        changed['biography'] = 'Changed.'
+        txn.write(changed, filename)
+        # parsed from the text it was loaded from, not whatever is on disk now
+        assert person.to_dict() == load_yaml(LAZY_PERSON)
+        # and one without its text reads the file as the transaction would write it
+        assert sent['biography'] == 'Changed.'
+
+
+def test_parse_filename():
+    obj = {'id': 'ocd-person/a87535b2-5607-48d5-9d11-f20cc1d0d4ee', 'name': 'Allen McNeill'}
+    assert parse_filename(get_filename(obj)) == (obj['id'], obj['name'])
+    assert parse_filename('data/nc/organizations/Aging-76165874-e527-4818-8ddb-6cfa3ba04800.yml',
+                          'organizations') == (
+        'ocd-organization/76165874-e527-4818-8ddb-6cfa3ba04800', 'Aging')
+    with pytest.raises(ValueError):
+        parse_filename('Allen-McNeill.yml')
+
+
+def test_scan_metadata():
+    found = {meta.id: meta for meta in scan_metadata(['nc'], ('people',))}
+    meta = found['ocd-person/a87535b2-5607-48d5-9d11-f20cc1d0d4ee']
+    assert (meta.name, meta.abbr, meta.objtype) == ('Allen McNeill', 'nc', 'people')
+    # names match ids everywhere
+    for meta in found.values():
+        assert load_yaml_file(meta.filename)['id'] == meta.id
+
+
+def test_dump_obj_only_if_changed(tmp_path):
+    filename = str(tmp_path / 'obj.yml')
+    obj = OrderedDict([('name', 'Jane'), ('id', 1)])
+    assert dump_obj(obj, filename=filename) is True
+    os.chmod(filename, 0o600)
+    os.utime(filename, ns=(1, 1))
+
+    # identical output leaves the file alone
+    assert dump_obj(obj, filename=filename) is False
+    assert os.stat(filename).st_mtime_ns == 1
+
+    obj['id'] = 2
+    assert dump_obj(obj, filename=filename) is True
+    with open(filename) as f:
+        assert f.read() == 'name: Jane\nid: 2\n'
+    assert os.stat(filename).st_mode & 0o777 == 0o600
+    assert os.listdir(str(tmp_path)) == ['obj.yml']
+
+
+def test_file_transaction(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    people = tmp_path / 'people'
+    people.mkdir()
+    a, b = str(people / 'a.yml'), str(people / 'b.yml')
+    dump_obj({'name': 'A'}, filename=a)
+    dump_obj({'name': 'B'}, filename=b)
+    moved = str(tmp_path / 'retired' / 'a.yml')
+
+    with FileTransaction() as txn:
+        assert txn.write({'name': 'A2'}, a) is True
+        assert txn.write({'name': 'B'}, b) is False
+        txn.move(a, moved)
+        # reads see pending changes, disk doesn't until commit
+        assert txn.load(moved) == {'name': 'A2'}
+        assert not txn.exists(a)
+        assert os.path.exists(a)
+        txn.remove(b)
+    assert not os.path.exists(a) and not os.path.exists(b)
+    assert load_yaml_file(moved) == {'name': 'A2'}
+    assert os.listdir(str(people)) == []
+
+    # an exception discards everything
+    with pytest.raises(RuntimeError):
+        with FileTransaction() as txn:
+            txn.write({'name': 'A3'}, moved)
+            raise RuntimeError()
+    assert load_yaml_file(moved) == {'name': 'A2'}
+
+
+def test_file_transaction_failed_commit(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    a, b = str(tmp_path / 'a.yml'), str(tmp_path / 'b.yml')
+    dump_obj({'name': 'A'}, filename=a)
+
+    real_replace = os.replace
+
+    def flaky_replace(src, dst):
+        if dst == b:
+            raise OSError('disk full')
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', flaky_replace)
+    txn = FileTransaction()
+    txn.write({'name': 'A2'}, a)
+    txn.write({'name': 'B'}, b)
+    with pytest.raises(OSError):
+        txn.commit()
+    monkeypatch.setattr(os, 'replace', real_replace)
+
+    # first file was put back, second never appeared, nothing left behind
+    assert load_yaml_file(a) == {'name': 'A'}
+    assert sorted(os.listdir(str(tmp_path))) == ['a.yml', 'cache']
+    assert os.listdir(FileTransaction.get_journal_dir()) == []
+
+
+def test_file_transaction_recover(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    a, b = str(tmp_path / 'a.yml'), str(tmp_path / 'b.yml')
+    dump_obj({'name': 'A'}, filename=a)
+
+    # simulate a crash just before the journal was removed
+    real_remove = os.remove
+
+    def crash(path):
+        if path.endswith('.json'):
+            raise KeyboardInterrupt()
+        real_remove(path)
+
+    txn = FileTransaction()
+    txn.write({'name': 'A2'}, a)
+    txn.write({'name': 'B'}, b)
+    monkeypatch.setattr(os, 'remove', crash)
+    with pytest.raises(KeyboardInterrupt):
+        txn.commit()
+    monkeypatch.setattr(os, 'remove', real_remove)
+    assert load_yaml_file(a) == {'name': 'A2'}
+
+    assert FileTransaction.recover() == 1
+    assert load_yaml_file(a) == {'name': 'A'}
+    assert not os.path.exists(b)
+    assert sorted(os.listdir(str(tmp_path))) == ['a.yml', 'cache']
+    assert FileTransaction.recover() == 0
+
+
+def test_file_transaction_recover_while_staging(tmp_path, monkeypatch):
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    a, b = str(tmp_path / 'a.yml'), str(tmp_path / 'b.yml')
+    dump_obj({'name': 'A'}, filename=a)
+
+    # simulate a crash after the .tmp files were written, before any backup was made
+    def crash(src, dst):
+        raise KeyboardInterrupt()
+
+    txn = FileTransaction()
+    txn.write({'name': 'A2'}, a)
+    txn.write({'name': 'B'}, b)
+    monkeypatch.setattr(os, 'link', crash)
+    monkeypatch.setattr(FileTransaction, 'undo', staticmethod(lambda entries: None))
+    monkeypatch.setattr(os, 'remove', lambda path: None)
+    with pytest.raises(KeyboardInterrupt):
+        txn.commit()
+    monkeypatch.undo()
+    monkeypatch.setenv('PEOPLE_CACHE_DIR', str(tmp_path / 'cache'))
+    assert any(name.endswith('.tmp') for name in os.listdir(str(tmp_path)))
+
+    # the journal was already written, so the staged files aren't left behind
+    assert FileTransaction.recover() == 1
+    assert load_yaml_file(a) == {'name': 'A'}
+    assert sorted(os.listdir(str(tmp_path))) == ['a.yml', 'cache']
+
+
+def test_load_yaml_reads_stream(tmp_path):
+    filename = str(tmp_path / 'person.yml')
+    with open(filename, 'w') as f:
+        f.write('name: Jane\nid: 123\n')
+    # parsed from where the stream is, not re-read from the file
+    with open(filename) as f:
+        f.readline()
+        assert load_yaml(f) == {'id': 123}
+
+
+def test_load_yaml_ordered():
+    obj = load_yaml('b: 1\na:\n  d: x\n  c: y\n')
+    assert isinstance(obj, OrderedDict)
+    assert list(obj.keys()) == ['b', 'a']
+    assert list(obj['a'].keys()) == ['d', 'c']
+    assert dump_yaml(obj) == 'b: 1\na:\n  d: x\n  c: y\n'
+
+
+def test_data_round_trip():
+    data_dir = os.path.join(os.path.dirname(__file__), '../../data')
+    filenames = sorted(glob.glob(os.path.join(data_dir, '*/*/*.yml')))
+    assert filenames
+    for filename in filenames:
+        with open(filename) as f:
+            text = f.read()
+        assert dump_yaml(load_yaml(text)) == text, filename
+
+
+LONG = ('a long string with spaces that is going to have to be folded over more than one '
+        'line by the emitter because it is well past eighty columns wide')
+FAST_DUMP_OBJECTS = [
+    OrderedDict([('name', 'Jane'), ('district', '12'), ('age', 12), ('active', True),
+                 ('note', None), ('empty', ''), ('quote', "it's"), ('colon', 'a: b'),
+                 ('yes', 'yes'), ('url', 'https://example.com/#top')]),
+    OrderedDict([('biography', LONG), ('quoted', "'" + LONG + "'"),
+                 ('spaces', LONG.replace(' ', '  ')), ('nested', {'b': LONG, 'a': 1})]),
+    OrderedDict([('roles', [OrderedDict([('type', 'lower'), ('contact_details', [
+        OrderedDict([('note', 'Capitol'), ('address', LONG)])])]), {}]),
+        ('ids', {}), ('links', []), ('other_names', ['Janie', LONG, '1999'])]),
+]
+
+
+@pytest.mark.parametrize('obj', FAST_DUMP_OBJECTS)
+def test_fast_dump_yaml(obj):
+    assert fast_dump_yaml(obj) == yaml.dump(obj, default_flow_style=False, Dumper=OrderedDumper)
+
+
+@pytest.mark.parametrize('obj', [
+    {'name': 'Jos\u00e9'},
+    {'biography': 'two\nlines'},
+    {'date': __import__('datetime').date(2020, 1, 1)},
+    {'a': [[1, 2]]},
+    {'a': FAST_DUMP_OBJECTS[0], 'b': FAST_DUMP_OBJECTS[0]},
+])
+def test_fast_dump_yaml_fallback(obj):
+    assert fast_dump_yaml(obj) is None
+    assert dump_yaml(obj) == yaml.dump(obj, default_flow_style=False, Dumper=OrderedDumper)
@@ -0,0 +1,22 @@
+import os
+import pytest
+from watcher import InotifyWatcher, PollingWatcher
+
+
+@pytest.mark.parametrize('watcher_class', [InotifyWatcher, PollingWatcher])
+def test_watcher(tmp_path, watcher_class):
+    if watcher_class is InotifyWatcher and not os.path.exists('/proc/sys/fs/inotify'):
+        pytest.skip('inotify not available')
+    existing = tmp_path / 'existing.yml'
+    existing.write_text('id: 1\n')
+
+    with watcher_class([str(tmp_path)]) as watcher:
+        assert watcher.wait(timeout=0.1) == set()
+
+        (tmp_path / 'new.yml').write_text('id: 2\n')
+        (tmp_path / 'ignored.swp').write_text('')
+        existing.write_text('id: 3\n')
+        assert watcher.wait(timeout=2) == {str(tmp_path / 'new.yml'), str(existing)}
+
+        existing.unlink()
+        assert watcher.wait(timeout=2) == {str(existing)}
@@ -1,18 +1,24 @@
 #!/usr/bin/env python
 import os
 import glob
-import yaml
+import hashlib
+import subprocess
+from collections import namedtuple, defaultdict
 from functools import lru_cache
 import django
 from django import conf
 from django.db import transaction
 import click
 from utils import (get_data_dir, get_jurisdiction_id, get_all_abbreviations, get_districts,
-                   get_settings)
-try:
-    from yaml import CLoader as Loader
-except ImportError:
-    from yaml import Loader as Loader
+                   get_settings, load_yaml, load_yaml_files)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# key in Jurisdiction.extras holding the last commit synced for that jurisdiction
+SYNC_COMMIT_KEY = 'people_sync_commit'
+# key in Jurisdiction.extras holding {type: {path: [sha1, id]}} for every file loaded
+SYNC_HASHES_KEY = 'people_sync_hashes'
+
+GitChanges = namedtuple('GitChanges', 'changed deleted')
 
 
 class CancelTransaction(Exception):
@@ -24,42 +30,99 @@ def cached_lookup(ModelCls, **kwargs):
     return ModelCls.objects.get(**kwargs)
 
 
-def update_subobjects(person, fieldname, objects, read_manager=None):
-    """ returns True if there are any updates """
+# OCDBase bookkeeping that isn't part of a subobject's data
+SUBOBJECT_IGNORED_FIELDS = ('created_at', 'updated_at', 'extras', 'locked_fields')
+
+
+def get_subobject_fields(Model, parent):
+    """ the fields of Model compared to decide whether a subobject changed """
+    return [field for field in Model._meta.concrete_fields
+            if not field.primary_key and field.name != parent and
+            field.name not in SUBOBJECT_IGNORED_FIELDS]
+
+
+def subobject_key(obj, fields):
+    """
+    comparable tuple for a subobject, either a dict as passed to create() or an existing row
+
+    anything a dict leaves out is compared against the field's default, which is what create()
+    would have stored for it
+    """
+    if not isinstance(obj, dict):
+        return tuple(getattr(obj, field.attname) for field in fields)
+    values = []
+    for field in fields:
+        if field.name in obj:
+            value = obj[field.name]
+            if field.is_relation:
+                value = None if value is None else value.pk
+            else:
+                value = field.to_python(value)
+        elif field.attname in obj:
+            value = obj[field.attname]
+        else:
+            value = field.get_default()
+        values.append(value)
+    return tuple(values)
+
+
+def diff_subobjects(rows, objects, fields):
+    """
+    (rows to delete, objects to create) to turn rows into objects, compared as multisets so
+    rows that are already right are left alone
+    """
+    remaining = defaultdict(list)
+    for row in rows:
+        remaining[subobject_key(row, fields)].append(row)
+    to_create = []
+    for obj in objects:
+        matches = remaining.get(subobject_key(obj, fields))
+        if matches:
+            matches.pop()
+        else:
+            to_create.append(obj)
+    to_delete = [row for matches in remaining.values() for row in matches]
+    return to_delete, to_create
+
+
+def update_subobjects(parent, fieldname, objects, read_manager=None):
+    """
+    returns True if there are any updates
+
+    the current rows are fetched once and compared in memory, then only the rows that differ
+    are deleted & created, the caller is responsible for bumping parent's updated_at
+    """
     # we need the default manager for this field in case we need to do updates
-    manager = getattr(person, fieldname)
+    manager = getattr(parent, fieldname)
 
     # if a read_manager is passed, we'll use that for all read operations
     # this is used for Person.memberships to ensure we don't wipe out committee memberships
     if read_manager is None:
-        read_manager = manager
+        read_manager = manager.all()
 
-    current_count = read_manager.count()
-    updated = False
+    Model = manager.model
+    parent_field = manager.field.name
+    to_delete, to_create = diff_subobjects(list(read_manager), objects,
+                                           get_subobject_fields(Model, parent_field))
+    if to_delete:
+        Model.objects.filter(id__in=[row.id for row in to_delete]).delete()
+    if to_create:
+        Model.objects.bulk_create([Model(**{parent_field: parent}, **obj) for obj in to_create])
+    return bool(to_delete or to_create)
 
-    # if counts differ, we need to do an update for sure
-    if current_count != len(objects):
-        updated = True
 
-    # check if all objects exist
-    if not updated:
-        qs = read_manager
-        for obj in objects:
-            qs = qs.exclude(**obj)
+def bump_updated_at(obj):
+    obj.save(update_fields=['updated_at'])
 
-        if qs.exists():
-            updated = True
 
-    # if there's been an update, wipe the old & insert the new
-    if updated:
-        if current_count:
-            read_manager.all().delete()
-        for obj in objects:
-            manager.create(**obj)
-        # save to bump updated_at timestamp
-        person.save()
-
-    return updated
+def set_changed_fields(obj, data):
+    """ set each of data's fields that differs on obj, returns the names of those fields """
+    changed = set()
+    for field, value in data.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed.add(field)
+    return changed
 
 
 def get_update_or_create(ModelCls, data, lookup_keys):
@@ -67,10 +130,7 @@ def get_update_or_create(ModelCls, data, lookup_keys):
     kwargs = {k: data[k] for k in lookup_keys}
     try:
         obj = ModelCls.objects.get(**kwargs)
-        for field, value in data.items():
-            if getattr(obj, field) != value:
-                setattr(obj, field, value)
-                updated = True
+        updated = bool(set_changed_fields(obj, data))
         if updated:
             obj.save()
     except ModelCls.DoesNotExist:
@@ -79,33 +139,33 @@ def get_update_or_create(ModelCls, data, lookup_keys):
     return obj, created, updated
 
 
-def load_person(data):
-    # import has to be here so that Django is set up
-    from opencivicdata.core.models import Person, Organization, Post
-
-    fields = dict(id=data['id'],
-                  name=data['name'],
-                  given_name=data.get('given_name', ''),
-                  family_name=data.get('family_name', ''),
-                  gender=data.get('gender', ''),
-                  biography=data.get('biography', ''),
-                  birth_date=data.get('birth_date', ''),
-                  death_date=data.get('death_date', ''),
-                  image=data.get('image', ''),
-                  extras=data.get('extras', {}),
-                  )
-    person, created, updated = get_update_or_create(Person, fields, ['id'])
-
-    updated |= update_subobjects(person, 'other_names', data.get('other_names', []))
-    updated |= update_subobjects(person, 'links', data.get('links', []))
-    updated |= update_subobjects(person, 'sources', data.get('sources', []))
+def get_person_fields(data):
+    return dict(id=data['id'],
+                name=data['name'],
+                given_name=data.get('given_name', ''),
+                family_name=data.get('family_name', ''),
+                gender=data.get('gender', ''),
+                biography=data.get('biography', ''),
+                birth_date=data.get('birth_date', ''),
+                death_date=data.get('death_date', ''),
+                image=data.get('image', ''),
+                extras=data.get('extras', {}),
+                )
+
+
+def get_post(org, label):
+    return org.posts.get(label=label)
+
+
+def get_person_subobjects(data, get_post=get_post):
+    """ map of subobject field -> list of dicts to create for data, in PERSON_SUBOBJECTS order """
+    from opencivicdata.core.models import Organization, Post
 
     identifiers = []
     for scheme, value in data.get('ids', {}).items():
         identifiers.append({'scheme': scheme, 'identifier': value})
     for identifier in data.get('other_identifiers', []):
         identifiers.append(identifier)
-    updated |= update_subobjects(person, 'identifiers', identifiers)
 
     contact_details = []
     for cd in data.get('contact_details', []):
@@ -114,7 +174,6 @@ def load_person(data):
                 contact_details.append({'note': cd.get('note', ''),
                                         'type': type,
                                         'value': cd[type]})
-    updated |= update_subobjects(person, 'contact_details', contact_details)
 
     memberships = []
     for party in data.get('party', []):
@@ -131,7 +190,7 @@ def load_person(data):
             try:
                 org = cached_lookup(Organization, classification=role['type'],
                                     jurisdiction_id=role['jurisdiction'])
-                post = org.posts.get(label=role['district'])
+                post = get_post(org, role['district'])
             except Organization.DoesNotExist:
                 click.secho(f"no such organization {role['jurisdiction']} {role['type']}",
                             fg='red')
@@ -146,13 +205,137 @@ def load_person(data):
                             'start_date': role.get('start_date', ''),
                             'end_date': role.get('end_date', '')})
 
-    # note that we don't manager committee memberships here
-    updated |= update_subobjects(
-        person, 'memberships', memberships,
-        read_manager=person.memberships.exclude(organization__classification='committee')
-    )
+    return {
+        'other_names': data.get('other_names', []),
+        'links': data.get('links', []),
+        'sources': data.get('sources', []),
+        'identifiers': identifiers,
+        'contact_details': contact_details,
+        'memberships': memberships,
+    }
+
+
+def get_person_membership_rows(manager):
+    # note that we don't manage committee memberships here
+    return manager.exclude(organization__classification='committee')
+
+
+def load_person(data):
+    # import has to be here so that Django is set up
+    from opencivicdata.core.models import Person
+
+    person, created, updated = get_update_or_create(Person, get_person_fields(data), ['id'])
+
+    subobjects_updated = False
+    for fieldname, objects in get_person_subobjects(data).items():
+        read_manager = None
+        if fieldname == 'memberships':
+            read_manager = get_person_membership_rows(person.memberships)
+        subobjects_updated |= update_subobjects(person, fieldname, objects,
+                                                read_manager=read_manager)
+
+    # saving the person's own fields already bumped updated_at
+    if subobjects_updated and not (created or updated):
+        bump_updated_at(person)
+    return created, updated or subobjects_updated
+
+
+PERSON_SUBOBJECTS = ('other_names', 'links', 'sources', 'identifiers', 'contact_details',
+                     'memberships')
+
+
+def load_people(all_data):
+    """
+    load_person for many people at once, returns (created, updated) for each of all_data
+
+    existing people and their subobjects are fetched up front in one query per table,
+    compared in memory like update_subobjects does and written back with bulk_create,
+    bulk_update & one delete per table
+    """
+    from django.utils import timezone
+    from opencivicdata.core.models import Person, Post
+
+    ids = [data['id'] for data, _ in all_data]
+    # each id is created or updated once, a second file with the same id would be lost
+    filenames = defaultdict(list)
+    for data, filename in all_data:
+        filenames[data['id']].append(filename)
+    duplicates = {id: names for id, names in filenames.items() if len(names) > 1}
+    if duplicates:
+        for id, names in duplicates.items():
+            click.secho(f"duplicate id {id} in {', '.join(names)}", fg='red')
+        raise CancelTransaction()
+    existing = Person.objects.in_bulk(ids)
+
+    models = {fieldname: getattr(Person, fieldname).rel.related_model
+              for fieldname in PERSON_SUBOBJECTS}
+    subobject_fields = {fieldname: get_subobject_fields(Model, 'person')
+                        for fieldname, Model in models.items()}
+    current = {}
+    for fieldname, Model in models.items():
+        rows = Model.objects.filter(person_id__in=ids)
+        if fieldname == 'memberships':
+            rows = get_person_membership_rows(rows)
+        by_person = defaultdict(list)
+        for row in rows:
+            by_person[row.person_id].append(row)
+        current[fieldname] = by_person
+
+    # posts for every chamber seen so far, so roles don't need a query each
+    posts = {}
+
+    def get_cached_post(org, label):
+        if org.id not in posts:
+            posts[org.id] = {post.label: post for post in Post.objects.filter(organization=org)}
+        try:
+            return posts[org.id][str(label)]
+        except KeyError:
+            raise Post.DoesNotExist()
+
+    now = timezone.now()
+    results = []
+    to_create = []
+    to_update = []
+    update_fields = {'updated_at'}
+    delete_ids = defaultdict(list)
+    create_rows = defaultdict(list)
+
+    for data, _ in all_data:
+        fields = get_person_fields(data)
+        person = existing.get(data['id'])
+        created = updated = False
+        if person is None:
+            person = Person(**fields)
+            to_create.append(person)
+            created = True
+        else:
+            changed = set_changed_fields(person, fields)
+            update_fields |= changed
+            updated = bool(changed)
+
+        for fieldname, objects in get_person_subobjects(data, get_cached_post).items():
+            to_delete, to_add = diff_subobjects(current[fieldname].get(person.id, []), objects,
+                                                subobject_fields[fieldname])
+            if to_delete or to_add:
+                delete_ids[fieldname].extend(row.id for row in to_delete)
+                create_rows[fieldname].extend((person.id, obj) for obj in to_add)
+                updated = True
 
-    return created, updated
+        if updated and not created:
+            person.updated_at = now
+            to_update.append(person)
+        results.append((created, updated))
+
+    Person.objects.bulk_create(to_create)
+    if to_update:
+        Person.objects.bulk_update(to_update, sorted(update_fields))
+    for fieldname, Model in models.items():
+        if delete_ids[fieldname]:
+            Model.objects.filter(id__in=delete_ids[fieldname]).delete()
+        Model.objects.bulk_create([Model(person_id=person_id, **obj)
+                                   for person_id, obj in create_rows[fieldname]])
+
+    return results
 
 
 def load_org(data):
@@ -176,8 +359,8 @@ def load_org(data):
     )
     org, created, updated = get_update_or_create(Organization, fields, ['id'])
 
-    updated |= update_subobjects(org, 'links', data.get('links', []))
-    updated |= update_subobjects(org, 'sources', data.get('sources', []))
+    subobjects_updated = update_subobjects(org, 'links', data.get('links', []))
+    subobjects_updated |= update_subobjects(org, 'sources', data.get('sources', []))
 
     memberships = []
     for role in data.get('memberships', []):
@@ -195,20 +378,29 @@ def load_org(data):
                             'role': role.get('role', 'member'),
                             'start_date': role.get('start_date', ''),
                             'end_date': role.get('end_date', '')})
-    updated |= update_subobjects(org, 'memberships', memberships)
+    subobjects_updated |= update_subobjects(org, 'memberships', memberships)
+
+    if subobjects_updated and not (created or updated):
+        bump_updated_at(org)
+    return created, updated or subobjects_updated
+
 
-    return created, updated
+def load_orgs(all_data):
+    return [load_org(data) for data, _ in all_data]
 
 
 def sort_organizations(orgs):
     order = []
     seen = set()
     how_many = len(orgs)
+    # parents that aren't being loaded (e.g. unchanged in an incremental sync) are already in DB
+    loading = set(org['id'] for org, _ in orgs)
 
     while orgs:
         for org, filename in list(orgs):
             if ((org['parent'].startswith('ocd-organization') and org['parent'] in seen) or
-                    not org['parent'].startswith('ocd-organization')):
+                    not org['parent'].startswith('ocd-organization') or
+                    org['parent'] not in loading):
                 seen.add(org['id'])
                 order.append((org, filename))
                 orgs.remove((org, filename))
@@ -239,10 +431,12 @@ def _echo_org_status(org, created, updated):
 
 
 def create_posts(jurisdiction_id, settings):
+    """ returns True if any posts changed """
     from opencivicdata.core.models import Organization, Jurisdiction
 
     division_id = Jurisdiction.objects.get(pk=jurisdiction_id).division_id
     districts = get_districts(settings)
+    posts_updated = False
 
     # create remaining orgs & add posts
     for chamber in districts:
@@ -265,44 +459,108 @@ def create_posts(jurisdiction_id, settings):
                  for label, maximum in districts[chamber].items()]
         updated = update_subobjects(org, 'posts', posts)
         if updated:
+            bump_updated_at(org)
             click.secho(f'updated {org} posts', fg='yellow')
+            posts_updated = True
+
+    if posts_updated:
+        # memberships of a post that was deleted lost it, even in files that haven't changed
+        drop_sync_hashes(jurisdiction_id)
+    return posts_updated
+
+
+def get_file_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def get_hash_key(filename):
+    """ e.g. people/Jane-Smith-<uuid>.yml, what a file's hash is stored under """
+    return '/'.join(filename.split(os.sep)[-2:])
+
+
+def get_sync_hashes(jurisdiction_id, type):
+    from opencivicdata.core.models import Jurisdiction
+    extras = Jurisdiction.objects.get(pk=jurisdiction_id).extras
+    return extras.get(SYNC_HASHES_KEY, {}).get(type, {})
+
+
+def record_sync_hashes(jurisdiction_id, type, hashes):
+    from opencivicdata.core.models import Jurisdiction
+    jurisdiction = Jurisdiction.objects.get(pk=jurisdiction_id)
+    jurisdiction.extras.setdefault(SYNC_HASHES_KEY, {})[type] = hashes
+    jurisdiction.save()
 
 
-def load_directory(files, type, jurisdiction_id, purge):
+def drop_sync_hashes(jurisdiction_id):
+    """ forget the hashes of every type, so that the next load of each parses all its files """
+    from opencivicdata.core.models import Jurisdiction
+    jurisdiction = Jurisdiction.objects.get(pk=jurisdiction_id)
+    if jurisdiction.extras.pop(SYNC_HASHES_KEY, None) is not None:
+        jurisdiction.save()
+
+
+def load_directory(files, type, jurisdiction_id, purge, jobs=1, deleted_ids=None,
+                   force=False):
+    """
+    load files into the database
+
+    if deleted_ids is given this is an incremental load: only those ids are candidates for
+    removal instead of everything in the DB that wasn't in files
+
+    files whose content hash matches the one recorded when they were last loaded are skipped
+    without being parsed, unless force is set or their id is no longer in the database
+    """
     ids = set()
     created_count = 0
     updated_count = 0
 
     if type == 'person':
         from opencivicdata.core.models import Person
-        existing_ids = set(Person.objects.filter(
+        db_ids = set(Person.objects.filter(
             memberships__organization__jurisdiction_id=jurisdiction_id
         ).values_list('id', flat=True))
         ModelCls = Person
-        load_func = load_person
+        load_func = load_people
     elif type == 'organization':
         from opencivicdata.core.models import Organization
-        existing_ids = set(Organization.objects.filter(
+        db_ids = set(Organization.objects.filter(
             jurisdiction_id=jurisdiction_id,
             classification='committee',
         ).values_list('id', flat=True))
         ModelCls = Organization
-        load_func = load_org
+        load_func = load_orgs
     else:
         raise ValueError(type)
 
-    all_data = []
+    existing_ids = db_ids
+    if deleted_ids is not None:
+        existing_ids = db_ids & deleted_ids
+
+    stored_hashes = get_sync_hashes(jurisdiction_id, type)
+    # an incremental load only sees changed files, so keep what is known about the rest
+    hashes = dict(stored_hashes) if deleted_ids is not None else {}
+    file_hashes = {}
     for filename in files:
-        with open(filename) as f:
-            data = yaml.load(f, Loader=Loader)
-            all_data.append((data, filename))
+        key = get_hash_key(filename)
+        sha1 = get_file_hash(filename)
+        stored = stored_hashes.get(key)
+        # a file is only skipped if what it loaded is still there
+        if not force and stored and stored[0] == sha1 and stored[1] in db_ids:
+            ids.add(stored[1])
+            hashes[key] = stored
+        else:
+            file_hashes[filename] = sha1
+    unchanged_count = len(files) - len(file_hashes)
+
+    all_data = list(load_yaml_files(list(file_hashes), jobs=jobs))
 
     if type == 'organization':
         all_data = sort_organizations(all_data)
 
-    for data, filename in all_data:
+    for (data, filename), (created, updated) in zip(all_data, load_func(all_data)):
         ids.add(data['id'])
-        created, updated = load_func(data)
+        hashes[get_hash_key(filename)] = [file_hashes[filename], data['id']]
 
         if created:
             click.secho(f'created {type} from {filename}', fg='cyan', bold=True)
@@ -322,8 +580,133 @@ def load_directory(files, type, jurisdiction_id, purge):
         click.secho(f'{len(missing_ids)} purged', fg='yellow')
         ModelCls.objects.filter(id__in=missing_ids).delete()
 
+    if (missing_ids and purge) or (type == 'person' and created_count):
+        # memberships in other files point at people & committees, so unchanged files can
+        # still load differently now that some were added or removed
+        drop_sync_hashes(jurisdiction_id)
+        stored_hashes = {}
+
+    if deleted_ids:
+        loaded = {get_hash_key(filename) for filename in file_hashes}
+        hashes = {key: value for key, value in hashes.items()
+                  if value[1] not in deleted_ids or key in loaded}
+    if hashes != stored_hashes:
+        record_sync_hashes(jurisdiction_id, type, hashes)
+
     click.secho(f'processed {len(ids)} {type} files, {created_count} created, '
-                f'{updated_count} updated', fg='green')
+                f'{updated_count} updated, {unchanged_count} unchanged', fg='green')
+
+
+def git(*args):
+    return subprocess.run(['git', '-C', REPO_ROOT] + list(args), check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          universal_newlines=True).stdout
+
+
+def get_git_head():
+    try:
+        return git('rev-parse', 'HEAD').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def is_git_clean(directory):
+    try:
+        return not git('status', '--porcelain', '--', directory).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def parse_name_status(output):
+    """ parse `git diff --name-status -z` output into GitChanges of repo-relative paths """
+    changed = []
+    deleted = []
+    pieces = output.split('\0')
+    while len(pieces) > 1:
+        status = pieces.pop(0)
+        if status[0] in 'RC':
+            old, new = pieces.pop(0), pieces.pop(0)
+            if status[0] == 'R':
+                deleted.append(old)
+            changed.append(new)
+        elif status[0] == 'D':
+            deleted.append(pieces.pop(0))
+        else:
+            changed.append(pieces.pop(0))
+    return GitChanges(changed, deleted)
+
+
+def get_git_changes(since, directory):
+    """
+    GitChanges for files under directory between commit `since` and HEAD
+
+    returns None when that can't be answered from history: no previous sync, not a git
+    checkout, a commit missing from a shallow clone, or uncommitted changes in directory
+    """
+    if not since or not is_git_clean(directory):
+        return None
+    try:
+        git('cat-file', '-e', since + '^{commit}')
+        output = git('diff', '--name-status', '-z', '-M', since, 'HEAD', '--', directory)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return parse_name_status(output)
+
+
+def get_deleted_id(since, path):
+    return load_yaml(git('show', f'{since}:{path}'))['id']
+
+
+def get_last_sync(jurisdiction_id):
+    from opencivicdata.core.models import Jurisdiction
+    return Jurisdiction.objects.get(pk=jurisdiction_id).extras.get(SYNC_COMMIT_KEY)
+
+
+def record_sync(jurisdiction_id, commit):
+    from opencivicdata.core.models import Jurisdiction
+    jurisdiction = Jurisdiction.objects.get(pk=jurisdiction_id)
+    jurisdiction.extras[SYNC_COMMIT_KEY] = commit
+    jurisdiction.save()
+
+
+def get_incremental_files(jurisdiction_id, directory):
+    """
+    returns (person_files, committee_files, deleted_person_ids, deleted_committee_ids)
+    for what changed since the last sync, or None if a full sync is needed
+    """
+    since = get_last_sync(jurisdiction_id)
+    changes = get_git_changes(since, directory)
+    if changes is None:
+        return None
+
+    person_files = []
+    committee_files = []
+    deleted_person_ids = set()
+    deleted_committee_ids = set()
+    for path in changes.changed:
+        objtype = os.path.basename(os.path.dirname(path))
+        if objtype in ('people', 'retired'):
+            person_files.append(os.path.join(REPO_ROOT, path))
+        elif objtype == 'organizations':
+            committee_files.append(os.path.join(REPO_ROOT, path))
+    for path in changes.deleted:
+        objtype = os.path.basename(os.path.dirname(path))
+        if objtype in ('people', 'retired'):
+            deleted_person_ids.add(get_deleted_id(since, path))
+        elif objtype == 'organizations':
+            deleted_committee_ids.add(get_deleted_id(since, path))
+
+    click.secho(f'{len(changes.changed)} files changed and {len(changes.deleted)} removed '
+                f'since {since}')
+    return person_files, committee_files, deleted_person_ids, deleted_committee_ids
+
+
+def get_all_files(directory):
+    """ (person files, committee files) in a state's data directory """
+    person_files = (glob.glob(os.path.join(directory, 'people/*.yml')) +
+                    glob.glob(os.path.join(directory, 'retired/*.yml')))
+    committee_files = glob.glob(os.path.join(directory, 'organizations/*.yml'))
+    return person_files, committee_files
 
 
 def init_django():      # pragma: no cover
@@ -355,7 +738,13 @@ def init_django():      # pragma: no cover
               help="Purge all legislators from DB that aren't in YAML.")
 @click.option('--safe/--no-safe', default=False,
               help="Operate in safe mode, no changes will be written to database.")
-def to_database(abbreviations, purge, safe):
+@click.option('-j', '--jobs', default=1,
+              help="Number of processes to parse files with (0 for one per CPU).")
+@click.option('--incremental/--no-incremental', default=False,
+              help="Only load files changed in git since the last sync, when possible.")
+@click.option('--force', is_flag=True,
+              help="Load every file, even those unchanged since they were last loaded.")
+def to_database(abbreviations, purge, safe, jobs, incremental, force):
     """
     Sync YAML files to DB.
     """
@@ -365,15 +754,23 @@ def to_database(abbreviations, purge, safe):
         abbreviations = get_all_abbreviations()
 
     settings = get_settings()
+    head = get_git_head()
 
     for abbr in abbreviations:
         click.secho('==== {} ===='.format(abbr), bold=True)
         directory = get_data_dir(abbr)
         jurisdiction_id = get_jurisdiction_id(abbr)
 
-        person_files = (glob.glob(os.path.join(directory, 'people/*.yml')) +
-                        glob.glob(os.path.join(directory, 'retired/*.yml')))
-        committee_files = glob.glob(os.path.join(directory, 'organizations/*.yml'))
+        files = None
+        if incremental:
+            files = get_incremental_files(jurisdiction_id, directory)
+            if files is None:
+                click.secho('no usable sync history, doing a full sync', fg='yellow')
+        if files:
+            person_files, committee_files, deleted_person_ids, deleted_committee_ids = files
+        else:
+            person_files, committee_files = get_all_files(directory)
+            deleted_person_ids = deleted_committee_ids = None
 
         if safe:
             click.secho('running in safe mode, no changes will be made', fg='magenta')
@@ -382,9 +779,19 @@ def to_database(abbreviations, purge, safe):
 
         try:
             with transaction.atomic():
-                create_posts(jurisdiction_id, state_settings)
-                load_directory(person_files, 'person', jurisdiction_id, purge=purge)
-                load_directory(committee_files, 'organization', jurisdiction_id, purge=purge)
+                if create_posts(jurisdiction_id, state_settings) and files:
+                    # memberships of unchanged files may point at posts that were replaced
+                    click.secho('posts changed, doing a full sync', fg='yellow')
+                    person_files, committee_files = get_all_files(directory)
+                    deleted_person_ids = deleted_committee_ids = None
+                load_directory(person_files, 'person', jurisdiction_id, purge=purge,
+                               jobs=jobs or None, deleted_ids=deleted_person_ids, force=force)
+                load_directory(committee_files, 'organization', jurisdiction_id, purge=purge,
+                               jobs=jobs or None, deleted_ids=deleted_committee_ids,
+                               force=force)
+                # only a clean checkout matches the commit it claims to be
+                if head and is_git_clean(directory):
+                    record_sync(jurisdiction_id, head)
                 if safe:
                     click.secho('ran in safe mode, no changes were made', fg='magenta')
                     raise CancelTransaction()
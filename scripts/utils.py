@@ -1,15 +1,28 @@
 import re
 import os
 import glob
+import json
+import stat
 import uuid
+import pickle
+import shutil
+import hashlib
 import datetime
+import functools
+import multiprocessing
 import yaml
-import yamlordereddictloader
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, namedtuple
+from collections.abc import MutableMapping
 from yaml.representer import Representer
 # set up defaultdict representation
 yaml.add_representer(defaultdict, Representer.represent_dict)
 
+# use libyaml's parser when it is available, it is many times faster than the pure-Python one
+try:
+    from yaml import CSafeLoader as BaseLoader
+except ImportError:     # pragma: no cover
+    from yaml import SafeLoader as BaseLoader
+
 PHONE_RE = re.compile(r'''^
                       \D*(1?)\D*                                # prefix
                       (\d{3})\D*(\d{3})\D*(\d{4}).*?             # main 10 digits
@@ -49,8 +62,32 @@ def get_data_dir(abbr):
     return os.path.join(os.path.dirname(__file__), '../data', abbr)
 
 
+def get_default_data_dir():
+    return os.path.join(os.path.dirname(__file__), '../data')
+
+
 def get_all_abbreviations():
-    return sorted(os.listdir(os.path.join(os.path.dirname(__file__), '../data')))
+    return sorted(os.listdir(get_default_data_dir()))
+
+
+def scan_data_dir(data_dir, objtypes=('people', 'retired', 'organizations')):
+    """ map of path relative to data_dir -> (mtime_ns, size) for every YAML file """
+    found = {}
+    for abbr_entry in os.scandir(data_dir):
+        if not abbr_entry.is_dir():
+            continue
+        for objtype in objtypes:
+            try:
+                entries = os.scandir(os.path.join(abbr_entry.path, objtype))
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.endswith('.yml'):
+                        st = entry.stat()
+                        path = f'{abbr_entry.name}/{objtype}/{entry.name}'
+                        found[path] = (st.st_mtime_ns, st.st_size)
+    return found
 
 
 def get_jurisdiction_id(abbr):
@@ -62,24 +99,688 @@ def get_jurisdiction_id(abbr):
         return f'ocd-jurisdiction/country:us/state:{abbr}/government'
 
 
+def construct_ordered_map(loader, node):
+    data = OrderedDict()
+    yield data
+    data.update(loader.construct_mapping(node))
+
+
+def represent_ordered_dict(dumper, data):
+    return dumper.represent_mapping('tag:yaml.org,2002:map', data.items())
+
+
+class OrderedLoader(BaseLoader):
+    """ safe loader that keeps mapping key order by constructing OrderedDicts """
+
+
+class OrderedDumper(yaml.SafeDumper):
+    """
+    safe dumper that writes OrderedDicts in their key order
+
+    this deliberately uses the pure-Python emitter: libyaml's emitter folds long
+    double-quoted scalars differently, which would rewrite files that haven't changed
+    """
+
+
+OrderedLoader.add_constructor('tag:yaml.org,2002:map', construct_ordered_map)
+OrderedLoader.add_constructor('tag:yaml.org,2002:omap', construct_ordered_map)
+OrderedDumper.add_representer(OrderedDict, represent_ordered_dict)
+
+
+def dump_yaml(obj):
+    if not isinstance(obj, dict) and hasattr(obj, 'to_dict'):
+        obj = obj.to_dict()
+    text = fast_dump_yaml(obj)
+    if text is None:
+        text = yaml.dump(obj, default_flow_style=False, Dumper=OrderedDumper)
+    return text
+
+
+class SlowPath(Exception):
+    """ raised by the fast emitter for anything it doesn't reproduce exactly """
+
+
+# the PyYAML emitter's default line width, plain & single-quoted scalars fold past it
+BEST_WIDTH = 80
+# ASCII text with no YAML indicators (no leading indicator, ': ', ' #' or trailing space)
+SAFE_PLAIN_RE = re.compile(r"^(?!.*: )(?!.* #)[A-Za-z0-9(][A-Za-z0-9 .,;:#()/_&+@=?%~'-]*"
+                           r"[A-Za-z0-9.,;#()/_&+@=?%~'-]$")
+_style_dumper = None
+
+
+@functools.lru_cache(maxsize=65536)
+def get_scalar_style(text):
+    """ '' for plain, "'" for single-quoted, exactly as OrderedDumper would choose for text """
+    global _style_dumper
+    if _style_dumper is None:
+        _style_dumper = OrderedDumper(None)
+    implicit = _style_dumper.resolve(yaml.ScalarNode, text, (True, False)) == \
+        'tag:yaml.org,2002:str'
+    if SAFE_PLAIN_RE.match(text):
+        # Emitter.analyze_scalar is slow and would allow a plain scalar for all of these
+        return '' if implicit else "'"
+    analysis = _style_dumper.analyze_scalar(text)
+    if analysis.multiline or not analysis.allow_single_quoted:
+        # line breaks, non-ASCII & control characters are left to PyYAML
+        raise SlowPath(text)
+    if implicit and analysis.allow_block_plain and not analysis.empty:
+        return ''
+    return "'"
+
+
+def write_folded(out, text, column, indent, quoted):
+    """
+    write a plain or single-quoted scalar starting at column, folding at single spaces once
+    past BEST_WIDTH the way Emitter.write_plain/write_single_quoted do, returns the new column
+    """
+    if quoted:
+        out.append(" '")
+    else:
+        out.append(' ')
+    column += len(out[-1])
+    if column + len(text) + text.count("'") < BEST_WIDTH:
+        # too short to ever fold
+        if quoted:
+            text = text.replace("'", "''") + "'"
+        out.append(text)
+        return column + len(text)
+
+    start = end = 0
+    spaces = False
+    length = len(text)
+    while end <= length:
+        ch = text[end] if end < length else None
+        if spaces:
+            if ch != ' ':
+                if (start + 1 == end and column > BEST_WIDTH and
+                        (not quoted or (start != 0 and end != length))):
+                    out.append('\n' + ' ' * indent)
+                    column = indent
+                else:
+                    out.append(text[start:end])
+                    column += end - start
+                start = end
+        elif ch is None or ch == ' ' or (quoted and ch == "'"):
+            if start < end:
+                out.append(text[start:end])
+                column += end - start
+                start = end
+        if quoted and ch == "'":
+            out.append("''")
+            column += 2
+            start = end + 1
+        spaces = ch == ' '
+        end += 1
+    if quoted:
+        out.append("'")
+        column += 1
+    return column
+
+
+def write_scalar(out, value, column, indent):
+    if isinstance(value, str):
+        write_folded(out, value, column, indent, get_scalar_style(value) == "'")
+    elif value is None:
+        out.append(' null')
+    elif value is True or value is False:
+        out.append(' true' if value else ' false')
+    elif type(value) is int:
+        out.append(f' {value}')
+    else:
+        raise SlowPath(value)
+    out.append('\n')
+
+
+def write_key(out, key, indent, column):
+    """ write 'key:' at column (padding up to indent), returns the new column """
+    if not isinstance(key, str) or not key or len(key) > 120:
+        raise SlowPath(key)
+    if get_scalar_style(key) == "'":
+        key = "'" + key.replace("'", "''") + "'"
+    out.append(' ' * (indent - column) + key + ':')
+    return indent + len(key) + 1
+
+
+def mapping_items(obj, seen):
+    if id(obj) in seen:
+        # a repeated object would be written with an anchor & alias
+        raise SlowPath(obj)
+    seen.add(id(obj))
+    if type(obj) is OrderedDict:
+        return obj.items()
+    elif type(obj) is dict:
+        # SafeDumper sorts plain dicts
+        try:
+            return sorted(obj.items())
+        except TypeError:
+            raise SlowPath(obj)
+    raise SlowPath(obj)
+
+
+def write_mapping(out, obj, indent, seen, column=0):
+    """ write a block mapping at indent, the first key goes on the current line at column """
+    for key, value in mapping_items(obj, seen):
+        column = write_key(out, key, indent, column)
+        if isinstance(value, (list, dict)):
+            if not value:
+                out.append(' []\n' if isinstance(value, list) else ' {}\n')
+            elif isinstance(value, list):
+                out.append('\n')
+                # sequences in mappings aren't indented any further than their key
+                write_sequence(out, value, indent, seen)
+            else:
+                out.append('\n')
+                write_mapping(out, value, indent + 2, seen)
+        else:
+            write_scalar(out, value, column, indent + 2)
+        column = 0
+
+
+def write_sequence(out, seq, indent, seen):
+    if id(seq) in seen:
+        raise SlowPath(seq)
+    seen.add(id(seq))
+    for item in seq:
+        if isinstance(item, dict):
+            if item:
+                out.append(' ' * indent + '- ')
+                write_mapping(out, item, indent + 2, seen, column=indent + 2)
+            else:
+                out.append(' ' * indent + '- {}\n')
+        elif isinstance(item, list):
+            raise SlowPath(item)
+        else:
+            out.append(' ' * indent + '-')
+            write_scalar(out, item, indent + 1, indent + 2)
+
+
+def fast_dump_yaml(obj):
+    """
+    dump_yaml for the shapes data files have (mappings of scalars, mappings & lists of
+    mappings) without going through PyYAML's emitter, output is byte-for-byte identical
+
+    returns None for anything else so the caller can fall back to yaml.dump
+    """
+    if not isinstance(obj, dict) or not obj:
+        return None
+    out = []
+    try:
+        write_mapping(out, obj, 0, set())
+    except SlowPath:
+        return None
+    return ''.join(out)
+
+
+# bump this whenever the parsed representation changes to invalidate old cache entries
+CACHE_VERSION = 1
+
+
+def get_cache_dir(name):
+    cache_dir = os.environ.get('PEOPLE_CACHE_DIR',
+                               os.path.join(os.path.dirname(__file__), '../.cache'))
+    return os.path.join(cache_dir, name)
+
+
+def cache_enabled():
+    return os.environ.get('PEOPLE_CACHE', '1') != '0'
+
+
+def get_cache_entry_path(filename):
+    key = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+    return os.path.join(get_cache_dir('yaml'), key + '.pickle')
+
+
+def read_cache_entry(entry_path):
+    try:
+        with open(entry_path, 'rb') as f:
+            entry = pickle.load(f)
+    except Exception:
+        # missing, truncated or written by an incompatible version: treat as a miss
+        return None
+    if entry.get('version') != CACHE_VERSION:
+        return None
+    return entry
+
+
+def write_cache_entry(entry_path, entry):
+    tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+    except OSError:
+        # the cache is an optimization, a read-only checkout should still work
+        pass
+
+
+def get_file_stamp(filename, content):
+    """ (mtime, size, sha1) triple that a cache entry must match exactly """
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size, hashlib.sha1(content).hexdigest())
+
+
+def load_yaml_file(filename):
+    """ load a YAML file, using the on-disk parse cache when possible """
+    with open(filename, 'rb') as f:
+        content = f.read()
+    if not cache_enabled():
+        return yaml.load(content, Loader=OrderedLoader)
+
+    stamp = get_file_stamp(filename, content)
+    entry_path = get_cache_entry_path(filename)
+    entry = read_cache_entry(entry_path)
+    if entry and entry['stamp'] == stamp:
+        return entry['obj']
+
+    obj = yaml.load(content, Loader=OrderedLoader)
+    write_cache_entry(entry_path, {'version': CACHE_VERSION,
+                                   'filename': os.path.abspath(filename),
+                                   'stamp': stamp,
+                                   'obj': obj})
+    return obj
+
+
 def load_yaml(file_obj):
-    return yaml.load(file_obj, Loader=yamlordereddictloader.SafeLoader)
+    """ parse a stream or string, use load_yaml_file to go through the cache """
+    return yaml.load(file_obj, Loader=OrderedLoader)
 
 
 def iter_objects(abbr, objtype):
     filenames = glob.glob(os.path.join(get_data_dir(abbr), objtype, '*.yml'))
     for filename in filenames:
-        with open(filename) as f:
-            yield load_yaml(f), filename
+        yield load_yaml_file(filename), filename
+
+
+def load_yaml_files(filenames, jobs=1, chunksize=16):
+    """
+    yield (obj, filename) for each of filenames, in order
+
+    with jobs > 1 (or None for one per CPU) files are parsed in a pool of worker processes,
+    results are still streamed back in the order they were requested
+    """
+    filenames = list(filenames)
+    if jobs == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield load_yaml_file(filename), filename
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        yield from zip(pool.imap(load_yaml_file, filenames, chunksize), filenames)
+
+
+# a top-level key in the block-style YAML dump_yaml writes, anything else at column 0
+# (comments, document markers, flow mappings, complex keys) makes LazyPerson parse it all
+TOP_LEVEL_KEY_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*):(?: |$)')
+HEADER_KEYS = ('id', 'name', 'roles')
+
+
+def split_top_level(text):
+    """
+    split a block-style YAML mapping into {key: text of just that key's entry}
+
+    returns None if text isn't laid out the way dump_yaml writes files
+    """
+    segments = OrderedDict()
+    key = None
+    for line in text.splitlines(keepends=True):
+        if not line.strip() or line[0] in ' -':
+            if key is None:
+                return None
+            segments[key].append(line)
+            continue
+        match = TOP_LEVEL_KEY_RE.match(line)
+        if not match or match.group(1) in segments:
+            return None
+        key = match.group(1)
+        segments[key] = [line]
+    return OrderedDict((key, ''.join(lines)) for key, lines in segments.items())
+
+
+class LazyPerson(MutableMapping):
+    """
+    stand-in for the dict load_yaml returns that only parses the top-level keys it is asked for
+
+    a scan that only needs e.g. id, name & roles never builds contact_details, links or
+    sources; any write loads the whole document from the text read at first, values that
+    were already handed out are kept so changes made to them aren't lost
+    """
+
+    def __init__(self, filename, text=None):
+        self.filename = filename
+        if text is None:
+            with open(filename, encoding='utf8') as f:
+                text = f.read()
+        self._segments = split_top_level(text)
+        self._parsed = {}
+        # a file that can't be split has nothing to be lazy about
+        self._full = None if self._segments is not None else load_yaml(text)
+
+    def __getstate__(self):
+        # only parsed values are sent between processes, not the text of the whole file
+        state = self.__dict__.copy()
+        if self._segments is not None:
+            state['_segments'] = OrderedDict.fromkeys(self._segments)
+        return state
+
+    def _load_segment(self, key):
+        if key not in self._parsed:
+            if self._segments[key] is None:
+                return self.to_dict()[key]
+            self._parsed[key] = yaml.load(self._segments[key], Loader=OrderedLoader)[key]
+        return self._parsed[key]
+
+    def to_dict(self):
+        if self._full is None:
+            if None not in self._segments.values():
+                full = load_yaml(''.join(self._segments.values()))
+            else:
+                # the text stayed behind in another process, see the file as this one does
+                full = FileTransaction.load_current(self.filename)
+            for key, value in self._parsed.items():
+                full[key] = value
+            self._full = full
+            self._segments = self._parsed = None
+        return self._full
+
+    @property
+    def is_loaded(self):
+        return self._full is not None
+
+    def __getitem__(self, key):
+        if self._segments is None:
+            return self.to_dict()[key]
+        elif key in self._segments:
+            return self._load_segment(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.to_dict()[key] = value
+
+    def __delitem__(self, key):
+        del self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self._segments if self._segments is not None else self.to_dict())
+
+    def __len__(self):
+        return len(self._segments if self._segments is not None else self.to_dict())
+
+    def __contains__(self, key):
+        return key in (self._segments if self._segments is not None else self.to_dict())
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def represent_lazy_person(dumper, data):
+    return represent_ordered_dict(dumper, data.to_dict())
+
+
+OrderedDumper.add_representer(LazyPerson, represent_lazy_person)
+
+
+def load_lazy_file(filename, keys=HEADER_KEYS):
+    """ LazyPerson for filename, with keys already parsed """
+    obj = LazyPerson(filename)
+    for key in keys:
+        obj.get(key)
+    return obj
+
+
+def load_lazy_files(filenames, jobs=1, keys=HEADER_KEYS, chunksize=16):
+    """ like load_yaml_files, but yields LazyPerson objects with just keys parsed """
+    filenames = list(filenames)
+    load = functools.partial(load_lazy_file, keys=keys)
+    if jobs == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield load(filename), filename
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        yield from zip(pool.imap(load, filenames, chunksize), filenames)
+
+
+def iter_objects_parallel(abbreviations, objtypes, jobs=1, lazy=False, keys=HEADER_KEYS):
+    """
+    iter_objects across several states & object types at once, parsed in jobs processes
+    (None for one per CPU) as in load_yaml_files
+
+    results are ordered by state, then object type, then filename, with lazy=True they are
+    LazyPerson objects with only keys parsed
+    """
+    filenames = []
+    for abbr in abbreviations:
+        for objtype in objtypes:
+            filenames.extend(sorted(glob.glob(os.path.join(get_data_dir(abbr), objtype, '*.yml'))))
+    if lazy:
+        return load_lazy_files(filenames, jobs=jobs, keys=keys)
+    return load_yaml_files(filenames, jobs=jobs)
+
+
+def write_if_changed(filename, content):
+    """
+    atomically replace filename with content (bytes), unless it already has exactly that content
+
+    returns True if the file was written
+    """
+    try:
+        with open(filename, 'rb') as f:
+            if f.read() == content:
+                return False
+        mode = stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        mode = None
+
+    tmp_filename = f'{filename}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_filename, 'wb') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    return True
 
 
 def dump_obj(obj, *, output_dir=None, filename=None):
+    """ write obj to YAML if it differs from what is on disk, returns True if it was written """
     if output_dir:
         filename = os.path.join(output_dir, get_filename(obj))
     if not filename:
         raise ValueError('must provide output_dir or filename parameter')
-    with open(filename, 'w') as f:
-        yaml.dump(obj, f, default_flow_style=False, Dumper=yamlordereddictloader.SafeDumper)
+    return write_if_changed(filename, dump_yaml(obj).encode('utf8'))
+
+
+def fsync_path(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:     # pragma: no cover
+        return
+    try:
+        os.fsync(fd)
+    except OSError:     # pragma: no cover
+        # some platforms/filesystems can't fsync directories
+        pass
+    finally:
+        os.close(fd)
+
+
+class FileTransaction:
+    """
+    buffer writes, moves & removals of files and apply them all at once
+
+    reads through the transaction (load/read/exists) see pending changes, so a batch tool
+    can edit the same file several times before anything hits disk.
+
+    used as a context manager changes are committed if the block finishes and discarded if
+    it raises. commit() journals its progress, if it is interrupted FileTransaction.recover()
+    puts every file back the way it was.
+    """
+    DELETED = None
+    # transactions whose with block is running, innermost last
+    active = []
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        # absolute path -> new bytes, or DELETED
+        self.pending = OrderedDict()
+
+    def __enter__(self):
+        self.active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.active.remove(self)
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    @classmethod
+    def load_current(cls, filename):
+        """ load filename as of the innermost active transaction that changes it """
+        for txn in reversed(cls.active):
+            if os.path.abspath(filename) in txn.pending:
+                return txn.load(filename)
+        return load_yaml_file(filename)
+
+    @staticmethod
+    def get_journal_dir():
+        return get_cache_dir('journal')
+
+    def read(self, filename):
+        """ current bytes of filename as of this transaction, None if it doesn't exist """
+        path = os.path.abspath(filename)
+        if path in self.pending:
+            return self.pending[path]
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, filename):
+        return self.read(filename) is not None
+
+    def load(self, filename):
+        path = os.path.abspath(filename)
+        if path not in self.pending:
+            return load_yaml_file(path)
+        if self.pending[path] is self.DELETED:
+            raise FileNotFoundError(filename)
+        return yaml.load(self.pending[path], Loader=OrderedLoader)
+
+    def write(self, obj, filename):
+        """ stage obj to be dumped to filename, returns True if that changes the file """
+        content = dump_yaml(obj).encode('utf8')
+        if self.read(filename) == content:
+            return False
+        self.pending[os.path.abspath(filename)] = content
+        return True
+
+    def move(self, filename, new_filename):
+        content = self.read(filename)
+        if content is None:
+            raise FileNotFoundError(filename)
+        self.pending[os.path.abspath(new_filename)] = content
+        self.pending[os.path.abspath(filename)] = self.DELETED
+
+    def remove(self, filename):
+        if not self.exists(filename):
+            raise FileNotFoundError(filename)
+        self.pending[os.path.abspath(filename)] = self.DELETED
+
+    def rollback(self):
+        """ discard pending changes """
+        self.pending.clear()
+
+    def commit(self):
+        """ apply pending changes, returns the list of paths that were changed on disk """
+        entries = []
+        contents = {}
+        for path, content in self.pending.items():
+            try:
+                with open(path, 'rb') as f:
+                    existing = f.read()
+            except FileNotFoundError:
+                existing = None
+            if content != existing:
+                contents[path] = content
+                entries.append({'path': path,
+                                'tmp': None if content is None else f'{path}.{self.id}.tmp',
+                                'backup': None if existing is None else f'{path}.{self.id}.bak',
+                                })
+        self.pending.clear()
+        if not entries:
+            return []
+
+        # the journal goes first, so that recover() can clean up after a crash at any point,
+        # undo only touches the .tmp & .bak files that were actually created
+        journal_filename = os.path.join(self.get_journal_dir(), f'{self.id}.json')
+        os.makedirs(self.get_journal_dir(), exist_ok=True)
+        with open(journal_filename, 'w') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        try:
+            # stage all new content next to its destination, then fsync it in one pass
+            for entry in entries:
+                if entry['tmp']:
+                    os.makedirs(os.path.dirname(entry['path']), exist_ok=True)
+                    with open(entry['tmp'], 'wb') as f:
+                        f.write(contents[entry['path']])
+            for entry in entries:
+                if entry['tmp']:
+                    fsync_path(entry['tmp'])
+                if entry['backup']:
+                    try:
+                        os.link(entry['path'], entry['backup'])
+                    except OSError:     # pragma: no cover
+                        shutil.copy2(entry['path'], entry['backup'])
+
+            for entry in entries:
+                if entry['tmp']:
+                    os.replace(entry['tmp'], entry['path'])
+                else:
+                    os.remove(entry['path'])
+            for directory in sorted(set(os.path.dirname(e['path']) for e in entries)):
+                fsync_path(directory)
+        except BaseException:
+            self.undo(entries)
+            os.remove(journal_filename)
+            raise
+
+        # removing the journal is the commit point, backups are just garbage after that
+        os.remove(journal_filename)
+        for entry in entries:
+            if entry['backup']:
+                os.remove(entry['backup'])
+        return [e['path'] for e in entries]
+
+    @staticmethod
+    def undo(entries):
+        for entry in reversed(entries):
+            if entry['backup'] and os.path.exists(entry['backup']):
+                os.replace(entry['backup'], entry['path'])
+            elif not entry['backup'] and os.path.exists(entry['path']):
+                os.remove(entry['path'])
+            if entry['tmp'] and os.path.exists(entry['tmp']):
+                os.remove(entry['tmp'])
+
+    @classmethod
+    def recover(cls):
+        """ roll back any commit that was interrupted, returns the number rolled back """
+        recovered = 0
+        for journal_filename in glob.glob(os.path.join(cls.get_journal_dir(), '*.json')):
+            with open(journal_filename) as f:
+                entries = json.load(f)
+            cls.undo(entries)
+            os.remove(journal_filename)
+            recovered += 1
+        return recovered
 
 
 def get_filename(obj):
@@ -90,10 +791,57 @@ def get_filename(obj):
     return f'{name}-{id}.yml'
 
 
+FILENAME_RE = re.compile(r'^(?P<name>.*)-(?P<uuid>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                         r'[0-9a-f]{4}-[0-9a-f]{12})\.yml$')
+ID_PREFIXES = {'people': 'ocd-person', 'retired': 'ocd-person',
+               'organizations': 'ocd-organization'}
+ObjectMetadata = namedtuple('ObjectMetadata', 'id name abbr objtype filename')
+
+
+def parse_filename(filename, objtype='people'):
+    """
+    inverse of get_filename: (id, display name) for a data filename
+
+    the name can only be approximate since get_filename drops punctuation,
+    raises ValueError if filename isn't in the get_filename format
+    """
+    match = FILENAME_RE.match(os.path.basename(filename))
+    if not match:
+        raise ValueError(f'{filename} is not named NAME-UUID.yml')
+    name = ' '.join(match.group('name').split('-'))
+    return f'{ID_PREFIXES[objtype]}/{match.group("uuid")}', name
+
+
+def scan_metadata(abbreviations=None, objtypes=('people', 'retired', 'organizations')):
+    """
+    yield ObjectMetadata for data files straight from their directory entries, without
+    opening them
+
+    files that aren't named like get_filename would name them are yielded with id=None,
+    the id-in-filename check in lint_yaml.py flags files named after the wrong id
+    """
+    if abbreviations is None:
+        abbreviations = get_all_abbreviations()
+    for abbr in abbreviations:
+        for objtype in objtypes:
+            try:
+                entries = os.scandir(os.path.join(get_data_dir(abbr), objtype))
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if not entry.name.endswith('.yml'):
+                        continue
+                    try:
+                        id, name = parse_filename(entry.name, objtype)
+                    except ValueError:
+                        id = name = None
+                    yield ObjectMetadata(id, name, abbr, objtype, entry.path)
+
+
 def get_settings():
     settings_file = os.path.join(os.path.dirname(__file__), '../settings.yml')
-    with open(settings_file) as f:
-        return load_yaml(f)
+    return load_yaml_file(settings_file)
 
 
 def role_is_active(role):
@@ -113,7 +861,125 @@ def get_districts(settings):
         elif isinstance(seats, list):
             expected[key] = {str(s): 1 for s in seats}
         elif isinstance(seats, dict):
-            expected[key] = seats
+            # a copy, callers adjust the counts for vacancies
+            expected[key] = dict(seats)
         else:   # pragma: no cover
             raise ValueError(seats)
     return expected
+
+
+def normalize_name(name):
+    """ lowercase & strip punctuation so that 'Smith, Jr.' and 'smith jr' compare equal """
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', name)).strip().lower()
+
+
+DataEntry = namedtuple('DataEntry', 'obj filename abbr objtype')
+
+
+class DataRepository:
+    """
+    load the data tree once and index it for O(1) lookups
+
+    lookups return DataEntry tuples so callers have the filename as well as the object,
+    with compact=True objects are read-only records.Person/Organization instead of dicts
+
+    a file whose id was already loaded is left out of the indexes, duplicates maps each such
+    id to every file that has it so that callers can report them all at once
+    """
+
+    def __init__(self, abbreviations=None, objtypes=('people', 'retired', 'organizations'),
+                 jobs=1, compact=False, filenames=None):
+        self.entries = []
+        self.by_id = {}
+        self.by_name = defaultdict(list)
+        # (jurisdiction_id, chamber, district) -> people with an active role in that seat
+        self.by_seat = defaultdict(list)
+        # (scheme, identifier) -> people, from both ids & other_identifiers
+        self.by_identifier = defaultdict(list)
+        self.duplicates = {}
+
+        if compact:
+            # imported here since records registers itself with OrderedDumper on import
+            from records import to_record
+        if filenames is not None:
+            # just these files, e.g. ones found by scan_metadata without parsing the tree
+            objects = load_yaml_files(filenames, jobs=jobs)
+        else:
+            if abbreviations is None:
+                abbreviations = get_all_abbreviations()
+            objects = iter_objects_parallel(abbreviations, objtypes, jobs=jobs)
+        for obj, filename in objects:
+            self.add(to_record(obj) if compact else obj, filename)
+
+    def add(self, obj, filename):
+        objtype_dir = os.path.dirname(os.path.abspath(filename))
+        abbr = os.path.basename(os.path.dirname(objtype_dir))
+        entry = DataEntry(obj, filename, abbr, os.path.basename(objtype_dir))
+
+        if obj['id'] in self.by_id:
+            self.duplicates.setdefault(obj['id'], [self.by_id[obj['id']].filename])
+            self.duplicates[obj['id']].append(filename)
+            return None
+        self.entries.append(entry)
+        self.by_id[obj['id']] = entry
+        self.by_name[normalize_name(obj['name'])].append(entry)
+        if entry.objtype == 'organizations':
+            return entry
+
+        for role in obj.get('roles', []):
+            if role_is_active(role):
+                # districts are strings in the data, but may be given as numbers to lookups
+                seat = (role['jurisdiction'], role['type'], str(role.get('district')))
+                self.by_seat[seat].append(entry)
+        for scheme, value in obj.get('ids', {}).items():
+            self.by_identifier[(scheme, value)].append(entry)
+        for oid in obj.get('other_identifiers', []):
+            self.by_identifier[(oid['scheme'], oid['identifier'])].append(entry)
+        return entry
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, id):
+        return id in self.by_id
+
+    def get(self, id):
+        """ entry by ocd-person or ocd-organization id, KeyError if unknown """
+        return self.by_id[id]
+
+    def find_by_name(self, name):
+        return list(self.by_name.get(normalize_name(name), []))
+
+    def find_by_seat(self, jurisdiction, chamber, district):
+        """ active holders of a seat, jurisdiction may be an id or a state abbreviation """
+        if not jurisdiction.startswith('ocd-jurisdiction/'):
+            jurisdiction = get_jurisdiction_id(jurisdiction)
+        return list(self.by_seat.get((jurisdiction, chamber, str(district)), []))
+
+    def find_by_identifier(self, scheme, identifier):
+        return list(self.by_identifier.get((scheme, identifier), []))
+
+    def filter(self, abbr=None, objtype=None, predicate=None):
+        for entry in self.entries:
+            if abbr and entry.abbr != abbr:
+                continue
+            if objtype and entry.objtype != objtype:
+                continue
+            if predicate and not predicate(entry.obj):
+                continue
+            yield entry
+
+    def people(self, abbr=None, retired=None):
+        if retired is None:
+            objtypes = ('people', 'retired')
+        else:
+            objtypes = ('retired',) if retired else ('people',)
+        for entry in self.filter(abbr=abbr):
+            if entry.objtype in objtypes:
+                yield entry
+
+    def organizations(self, abbr=None):
+        return self.filter(abbr=abbr, objtype='organizations')
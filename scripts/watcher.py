@@ -0,0 +1,133 @@
+"""
+Wait for YAML files in a set of directories to change.
+
+InotifyWatcher uses Linux's inotify through ctypes, everywhere else (or if inotify can't be
+set up) PollingWatcher compares directory listings, mtimes and sizes.
+"""
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Watcher:
+    """
+    base class: wait() blocks until at least one file changes and returns the changed paths
+
+    changes that arrive within `settle` seconds of each other are returned together, so an
+    editor's write-to-temp-then-rename save is a single change
+    """
+
+    def __init__(self, directories, suffix='.yml', settle=0.05):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.suffix = suffix
+        self.settle = settle
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    def __init__(self, directories, suffix='.yml', settle=0.05):
+        super().__init__(directories, suffix, settle)
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.paths = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'cannot watch {directory}')
+            self.paths[wd] = directory
+
+    def close(self):
+        os.close(self.fd)
+
+    def read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name.endswith(self.suffix) and wd in self.paths:
+                changed.add(os.path.join(self.paths[wd], name))
+        return changed
+
+    def wait(self, timeout=None):
+        changed = set()
+        if select.select([self.fd], [], [], timeout)[0]:
+            changed |= self.read_events()
+            while select.select([self.fd], [], [], self.settle)[0]:
+                changed |= self.read_events()
+        return changed
+
+
+class PollingWatcher(Watcher):
+    def __init__(self, directories, suffix='.yml', settle=0.05, interval=0.25):
+        super().__init__(directories, suffix, settle)
+        self.interval = interval
+        self.stats = self.scan()
+
+    def scan(self):
+        stats = {}
+        for directory in self.directories:
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix):
+                        stat = entry.stat()
+                        stats[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stats = self.scan()
+            changed = {path for path in stats.keys() | self.stats.keys()
+                       if stats.get(path) != self.stats.get(path)}
+            self.stats = stats
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            time.sleep(self.interval)
+
+
+def get_watcher(directories, suffix='.yml'):
+    """ an InotifyWatcher if possible, otherwise a PollingWatcher """
+    try:
+        return InotifyWatcher(directories, suffix)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(directories, suffix)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+import os
+import glob
+import click
+from utils import (get_all_abbreviations, get_cache_dir, get_data_dir, get_file_stamp,
+                   read_cache_entry, load_yaml_file)
+
+
+def prune_cache():
+    """ remove cache entries for files that were deleted or changed, returns count removed """
+    removed = 0
+    for entry_path in glob.glob(os.path.join(get_cache_dir('yaml'), '*.pickle')):
+        entry = read_cache_entry(entry_path)
+        if entry:
+            try:
+                with open(entry['filename'], 'rb') as f:
+                    stale = get_file_stamp(entry['filename'], f.read()) != entry['stamp']
+            except FileNotFoundError:
+                stale = True
+        else:
+            stale = True
+        if stale:
+            os.remove(entry_path)
+            removed += 1
+    return removed
+
+
+def clear_cache():
+    removed = 0
+    for entry_path in glob.glob(os.path.join(get_cache_dir('yaml'), '*.pickle')):
+        os.remove(entry_path)
+        removed += 1
+    return removed
+
+
+def rebuild_cache(abbreviations):
+    count = 0
+    for abbr in abbreviations:
+        for objtype in ('people', 'retired', 'organizations'):
+            for filename in glob.glob(os.path.join(get_data_dir(abbr), objtype, '*.yml')):
+                load_yaml_file(filename)
+                count += 1
+    return count
+
+
+@click.command()
+@click.argument('abbreviations', nargs=-1)
+@click.option('--prune', is_flag=True, help='Remove entries for deleted or changed files.')
+@click.option('--clear', is_flag=True, help='Remove all entries.')
+@click.option('--rebuild', is_flag=True, help='Parse all files and refresh their entries.')
+def yaml_cache(abbreviations, prune, clear, rebuild):
+    """
+        Manage the on-disk cache of parsed YAML files.
+
+        <ABBR> can be provided to restrict --rebuild to select states.
+    """
+    if clear:
+        click.secho(f'removed {clear_cache()} entries', fg='yellow')
+    elif prune:
+        click.secho(f'pruned {prune_cache()} stale entries', fg='yellow')
+
+    if rebuild:
+        if not abbreviations:
+            abbreviations = get_all_abbreviations()
+        click.secho(f'cached {rebuild_cache(abbreviations)} files', fg='green')
+
+
+if __name__ == '__main__':
+    yaml_cache()